@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+Benchmark the JSON and SQLite StateManager backends.
+
+Each backend is filled with N keys, then timed on the operations a single
+CLI invocation performs against an existing state store:
+
+    cold read   open the store in a fresh process and read one key
+    write       change one key and persist it
+    cache hit   read one cached value from an already open store
+
+Usage:
+    python benchmarks/state_backends.py [N ...]    (default: 10 1000 100000)
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rapidctl.bootstrap import state as json_state
+from rapidctl.bootstrap.sqlite_state import SqliteStateManager
+
+SIZES = (10, 1_000, 100_000)
+REPEATS = 5
+
+
+def json_backend(directory: Path):
+    path = directory / "state.json"
+
+    def open_store():
+        # Drop the per-process store so the next manager parses the file again
+        json_state._stores.clear()
+        return json_state.StateManager(state_file=path)
+
+    def persist(manager):
+        manager.flush()
+
+    return open_store, persist
+
+
+def sqlite_backend(directory: Path):
+    path = directory / "state.db"
+    managers = []
+
+    def open_store():
+        for manager in managers:
+            manager.close()
+        managers.append(SqliteStateManager(db_file=path, legacy_state_file=directory / "none.json"))
+        return managers[-1]
+
+    def persist(manager):
+        pass # Committed on write
+
+    return open_store, persist
+
+
+def populate(open_store, persist, size: int) -> None:
+    manager = open_store()
+    with manager.transaction():
+        for i in range(size):
+            if i % 2:
+                manager.set_cache(f"key_{i}", {"id": f"sha256:{i:064x}", "tags": [f"repo:{i}"]}, ttl=3600)
+            else:
+                manager.set_state(f"key_{i}", {"value": i, "note": "x" * 32})
+    persist(manager)
+
+
+def median_ms(fn) -> float:
+    samples = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def run(size: int, backend) -> dict:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        open_store, persist = backend(Path(temp_dir))
+        populate(open_store, persist, size)
+
+        cold = median_ms(lambda: open_store().get_state("key_0"))
+
+        manager = open_store()
+        manager.get_state("key_0")
+
+        def write():
+            manager.set_state("key_0", {"value": time.time()})
+            persist(manager)
+
+        written = median_ms(write)
+        hit = median_ms(lambda: manager.get_cache("key_1"))
+        open_store() # Release the last SQLite connection before cleanup
+    return {"cold read": cold, "write": written, "cache hit": hit}
+
+
+def main(sizes) -> None:
+    print(f"{'keys':>8}  {'backend':<8} {'cold read':>12} {'write':>12} {'cache hit':>12}")
+    for size in sizes:
+        for name, backend in (("json", json_backend), ("sqlite", sqlite_backend)):
+            result = run(size, backend)
+            print(f"{size:>8}  {name:<8} "
+                  + " ".join(f"{result[op]:>9.3f} ms" for op in ("cold read", "write", "cache hit")))
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Benchmark sorting image tags with VersionParser.
+
+Sorts N shuffled tags (mostly timestamps, some semantic versions and
+custom tags, as in a repo with a nightly build history) three ways, then
+times the VersionIndex operations that replace sorting at startup:
+
+    cmp_to_key   pairwise VersionParser.compare, as list_local_versions used to
+    key (cold)   key=VersionParser.sort_key with an empty parse cache
+    key (warm)   key=VersionParser.sort_key with every tag already parsed
+    index +1     restore a persisted index and bisect one new tag into it
+    newest       restore a persisted index and read its newest tag
+
+Usage:
+    python benchmarks/version_sort.py [N ...]    (default: 10000)
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+from functools import cmp_to_key
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rapidctl.utils.version import Version, VersionIndex, VersionParser
+
+SIZES = (10_000,)
+REPEATS = 5
+
+
+def make_tags(size: int) -> list:
+    rng = random.Random(size)
+    tags = [str(1_700_000_000 + i * 86_400) for i in range(size - size // 10)]
+    tags += [f"{rng.randrange(5)}.{rng.randrange(20)}.{rng.randrange(50)}" for _ in range(size // 10 - 3)]
+    tags += ["latest", "stable", "dev"]
+    rng.shuffle(tags)
+    return tags
+
+
+def median_ms(fn, setup=lambda: None) -> float:
+    samples = []
+    for _ in range(REPEATS):
+        setup()
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def clear_caches() -> None:
+    Version.parse.cache_clear()
+
+
+def main(sizes) -> None:
+    columns = ("cmp_to_key", "key (cold)", "key (warm)", "index +1", "newest")
+    print(f"{'tags':>8}  " + " ".join(f"{name:>12}" for name in columns))
+    for size in sizes:
+        tags = make_tags(size)
+        by_cmp = median_ms(lambda: sorted(tags, key=cmp_to_key(VersionParser.compare), reverse=True),
+                           setup=clear_caches)
+        cold = median_ms(lambda: sorted(tags, key=VersionParser.sort_key, reverse=True), setup=clear_caches)
+        warm = median_ms(lambda: sorted(tags, key=VersionParser.sort_key, reverse=True))
+
+        # Both start from a fresh process's view: an index as persisted, nothing parsed
+        stored = list(VersionIndex(tags))
+        added = median_ms(lambda: VersionIndex(stored, presorted=True).updated(stored + ["9.9.9"]),
+                          setup=clear_caches)
+        newest = median_ms(lambda: VersionIndex(stored, presorted=True).newest(), setup=clear_caches)
+        print(f"{size:>8}  " + " ".join(f"{ms:>9.3f} ms" for ms in (by_cmp, cold, warm, added, newest)))
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
@@ -8,6 +8,7 @@ import json
 import time
 
 from rapidctl.bootstrap.state import StateManager
+from rapidctl.errors import PodmanActionError
 
 class CtlClient:
     """
@@ -19,11 +20,44 @@ class CtlClient:
     """
     def __init__(self, state_manager: Optional[StateManager] = None):
         self.container_repo: Optional[str] = None
+        # An exact tag, or a constraint such as '^1.4', '~2.1.0', '>=1.2,<2'
+        # or 'latest-timestamp' resolved against the available versions
         self.baseline_version: str = "1.0.0"
+        # ((repo, baseline), tag) of the last constraint resolved, reused for
+        # the rest of the invocation
+        self._resolved: Optional[tuple] = None
         self.client_version: str = "0.0.1"
         self.image_id: Optional[str] = None
         self.command_path: str = "/opt/rapidctl/cmd/"
         self.cli: Optional[Any] = None
+
+        # Opt-in warm session container: commands run via exec in a long-lived
+        # container instead of a fresh one per invocation
+        self.session_mode: bool = os.environ.get("RAPIDCTL_SESSION", "") not in ("", "0")
+        self.session_idle_timeout: int = 600
+
+        # Opt-in direct exec: hand one-off commands to the podman binary with
+        # os.execvp so output and the TTY never pass through Python
+        self.exec_mode: bool = os.environ.get("RAPIDCTL_EXEC", "") not in ("", "0")
+
+        # Seconds between checks for a newer local container version
+        self.update_check_interval: int = rapidctl.cli.tasks.UPDATE_CHECK_INTERVAL
+
+        # Opt-in remote check: also look for newer tags in the container
+        # repo's registry, not only among images already pulled
+        self.remote_update_check: bool = os.environ.get("RAPIDCTL_REMOTE_CHECK", "") not in ("", "0")
+        # Minimum seconds between tag-list requests, per registry host
+        self.registry_rate_limits: Dict[str, float] = {}
+        # Opt-in prefetch: pull a newer version found by the update check in
+        # a detached low-priority process, so apply-update needs no download
+        self.prefetch_updates: bool = os.environ.get("RAPIDCTL_PREFETCH", "") not in ("", "0")
+
+        # Image garbage collection (`gc`): besides the pinned version, keep the
+        # newest gc_keep_versions and anything run within gc_keep_days
+        self.gc_keep_versions: int = rapidctl.cli.tasks.GC_KEEP_VERSIONS
+        self.gc_keep_days: int = rapidctl.cli.tasks.GC_KEEP_DAYS
+        # Opt-in automatic collection, at most daily in a detached process
+        self.auto_gc: bool = os.environ.get("RAPIDCTL_AUTO_GC", "") not in ("", "0")
         
         # Pluggable state manager
         self.state_manager = state_manager or StateManager()
@@ -32,14 +66,18 @@ class CtlClient:
         self._load_persisted_version()
     
     def check_for_updates(self) -> Optional[str]:
-        """Check if a newer container version exists locally."""
+        """Check if a newer container version exists locally, or in the registry if enabled."""
         import rapidctl.cli.actions as actions
         
         if not self.cli:
-            self.connect()
+            self.connect(lazy=True)
             
         try:
-            newer = actions.find_newer_version(self.cli, self.container_repo, self.baseline_version)
+            if self.remote_update_check:
+                rapidctl.cli.tasks.get_registry_client(self.cli).rate_limits.update(self.registry_rate_limits)
+            newer = actions.find_newer_version(
+                self.cli, self.container_repo, self.resolved_version, remote=self.remote_update_check
+            )
             return newer
         except Exception:
             return None
@@ -53,6 +91,50 @@ class CtlClient:
             if pinned:
                 self.baseline_version = pinned
     
+    @property
+    def resolved_version(self) -> str:
+        """
+        The exact tag to run: baseline_version itself, or the newest tag
+        matching it when it is a version constraint.
+
+        Constraints resolve against local images (and the registry when
+        remote_update_check is set, or when nothing local matches). The
+        result is cached until the local image store changes, and kept in
+        memory for the rest of the invocation.
+
+        Raises:
+            PodmanActionError: If no version matches the constraint
+        """
+        if not rapidctl.cli.tasks.is_version_constraint(self.baseline_version):
+            return self.baseline_version
+
+        key = (self.container_repo, self.baseline_version)
+        if self._resolved is None or self._resolved[0] != key:
+            self._resolved = (key, self._resolve_constraint())
+        resolved = self._resolved[1]
+        if not resolved:
+            raise PodmanActionError(f"No version of {self.container_repo} matches '{self.baseline_version}'")
+        return resolved
+
+    def _resolve_constraint(self) -> Optional[str]:
+        """Resolve the baseline constraint, trying the registry when nothing local matches."""
+        import rapidctl.cli.actions as actions
+        if not self.cli:
+            self.connect(lazy=True)
+
+        resolved = actions.resolve_version_constraint(
+            self.cli, self.container_repo, self.baseline_version, self.state_manager, remote=self.remote_update_check
+        )
+        if not resolved and not self.remote_update_check:
+            resolved = actions.resolve_version_constraint(
+                self.cli, self.container_repo, self.baseline_version, self.state_manager, remote=True
+            )
+        return resolved
+
+    def forget_resolved_version(self) -> None:
+        """Resolve a constraint baseline afresh on next use, e.g. for a new invocation."""
+        self._resolved = None
+
     @property
     def container_version(self):
         """
@@ -61,10 +143,24 @@ class CtlClient:
          Returns:
             str: Aggregrated version of the container repo path and version
         """
-        return self._container_validator("%s:%s" % (self.container_repo, self.baseline_version))
+        return self._container_validator("%s:%s" % (self.container_repo, self.resolved_version))
 
     def set_version(self, version: str) -> None:
-        """Update the baseline version with validation."""
+        """
+        Update the baseline version with validation.
+
+        Constraints are kept as written once they parse; invalid ones are
+        ignored. Exact tags are stripped of characters a tag can't hold.
+        """
+        self.forget_resolved_version()
+        if rapidctl.cli.tasks.is_version_constraint(version.strip()):
+            try:
+                constraint = rapidctl.cli.tasks.parse_version_constraint(version)
+            except ValueError:
+                return
+            self.baseline_version = constraint.spec
+            return
+
         # Validate that the version string is safe
         safe_version = re.sub(r'[^a-zA-Z0-9._-]', '', version)
         if safe_version:
@@ -79,14 +175,20 @@ class CtlClient:
         if self.container_repo:
             self.state_manager.set_state(f"version_{self.container_repo}", self.baseline_version)
 
-    def connect(self):
+    def connect(self, lazy: bool = False):
         """
         Connect to Podman and return the active session.
+
+        Args:
+            lazy: Defer the actual connection (and the podman import) until
+                the session first needs the API
         """
+        self.forget_resolved_version()
         if self.cli is None:
             from rapidctl.cli import PodmanCLI
-            self.cli = PodmanCLI()
-            self.cli._connect_to_podman()
+            self.cli = PodmanCLI(state_manager=self.state_manager)
+            if not lazy:
+                self.cli._connect_to_podman()
         return self.cli
 
     def _container_validator(self, container_image):
@@ -0,0 +1,413 @@
+import contextlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from rapidctl.bootstrap.state import (
+    CACHE_ATIME_RESOLUTION, CACHE_MAX_BYTES, CACHE_MAX_ENTRIES, CACHE_SWEEP_INTERVAL, STATE_LOCK_TIMEOUT,
+    _CacheStats, _configured_ttl
+)
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the schema changes; stored in PRAGMA user_version
+SCHEMA_VERSION = 4
+
+# Cache entries and the cache's own bookkeeping live in tables of their
+# own, so no state key can collide with them
+_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    fresh_until REAL,
+    accessed_at REAL
+);
+CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+""" + _CACHE_SCHEMA
+
+# Prefix of cache rows kept in the entries table before schema version 4,
+# and of cache entries in a legacy state.json
+_LEGACY_CACHE_PREFIX = "cache_"
+
+# Meta row recording when the cache was last swept, by any process
+_LAST_SWEEP_KEY = "last_cache_sweep"
+
+
+def _statements(script: str) -> List[str]:
+    # executescript() would commit early, so statements run one by one
+    return [statement for statement in script.strip().split(";") if statement.strip()]
+
+
+# Statements bringing a database at the keyed version up to the next one
+_MIGRATIONS = {
+    1: ["ALTER TABLE entries ADD COLUMN fresh_until REAL"],
+    2: ["ALTER TABLE entries ADD COLUMN accessed_at REAL"],
+    3: _statements(_CACHE_SCHEMA) + [
+        "INSERT OR REPLACE INTO cache (key, value, expires_at, fresh_until, accessed_at) "
+        f"SELECT substr(key, {len(_LEGACY_CACHE_PREFIX) + 1}), value, expires_at, fresh_until, accessed_at "
+        "FROM entries WHERE expires_at IS NOT NULL",
+        f"INSERT OR REPLACE INTO meta (key, value) SELECT '{_LAST_SWEEP_KEY}', value FROM entries "
+        "WHERE key = '_last_cache_sweep'",
+        "DELETE FROM entries WHERE expires_at IS NOT NULL OR key = '_last_cache_sweep'",
+        "DROP INDEX IF EXISTS entries_expires_at",
+    ],
+}
+
+_INSERT_STATE = "INSERT OR REPLACE INTO entries (key, value) VALUES (?, ?)"
+_INSERT_CACHE = "INSERT OR REPLACE INTO cache (key, value, expires_at, fresh_until, accessed_at) VALUES (?, ?, ?, ?, ?)"
+
+
+class SqliteStateManager:
+    """
+    StateManager backed by SQLite, for state that outgrows a single JSON file.
+
+    Each key is its own row, so a change writes one row instead of the whole
+    file. WAL mode lets readers in other processes carry on while one writes.
+    Cache entries have a table of their own, apart from state keys, and
+    their expiry is kept in an indexed column, so expired entries are found
+    and purged without reading any values. Cache writes also evict the
+    least recently used entries past the size bounds, at most once per
+    CACHE_SWEEP_INTERVAL. An existing state.json is imported the first time
+    the database is opened.
+    """
+
+    def __init__(self, db_file: Optional[Path] = None, legacy_state_file: Optional[Path] = None,
+                 cache_ttls: Optional[Dict[str, int]] = None,
+                 cache_max_entries: int = CACHE_MAX_ENTRIES, cache_max_bytes: int = CACHE_MAX_BYTES):
+        """
+        Initialize the state manager.
+
+        Args:
+            db_file: Path to the SQLite database. Defaults to ~/.rapidctl/state.db
+            legacy_state_file: JSON state to migrate from. Defaults to state.json
+                next to the database
+            cache_ttls: TTLs in seconds by cache key or key prefix, overriding
+                the defaults callers pass to set_cache()
+            cache_max_entries: Most cache entries kept before LRU eviction
+            cache_max_bytes: Most cache bytes kept before LRU eviction
+        """
+        self.db_file: Path = db_file or Path.home() / ".rapidctl" / "state.db"
+        self.legacy_state_file: Path = legacy_state_file or self.db_file.with_name("state.json")
+        self.cache_ttls: Dict[str, int] = dict(cache_ttls or {})
+        self.cache_max_entries = cache_max_entries
+        self.cache_max_bytes = cache_max_bytes
+        self._stats = _CacheStats()
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._depth = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database on first use, creating and migrating it if needed."""
+        if self._conn is None:
+            self.db_file.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                self.db_file,
+                timeout=STATE_LOCK_TIMEOUT,
+                isolation_level=None, # Autocommit; transaction() issues BEGIN itself
+                check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn = conn
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                self._initialize()
+            self.purge_expired()
+        return self._conn
+
+    def _initialize(self) -> None:
+        """Create the schema and import the legacy JSON state, once."""
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have finished initializing while we waited
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version == 0:
+                for statement in _statements(_SCHEMA):
+                    conn.execute(statement)
+                self._migrate_legacy_state()
+            else:
+                for step in range(version, SCHEMA_VERSION):
+                    for statement in _MIGRATIONS[step]:
+                        conn.execute(statement)
+            if version < SCHEMA_VERSION:
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _migrate_legacy_state(self) -> None:
+        """Copy every live entry from the JSON state file into the database."""
+        if not self.legacy_state_file.exists():
+            return
+        try:
+            with open(self.legacy_state_file, 'r') as f:
+                legacy = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Failed to read {self.legacy_state_file} for migration: {e}")
+            return
+        if not isinstance(legacy, dict):
+            return
+
+        now = time.time()
+        state, cache = [], []
+        for key, value in legacy.items():
+            if key.startswith(_LEGACY_CACHE_PREFIX) and isinstance(value, dict) and "timestamp" in value:
+                expires_at = value.get("timestamp", 0) + value.get("ttl", 300)
+                if expires_at > now:
+                    cache.append((key[len(_LEGACY_CACHE_PREFIX):], json.dumps(value.get("data")),
+                                  expires_at, expires_at, now))
+            else:
+                state.append((key, json.dumps(value)))
+        self._conn.executemany(_INSERT_STATE, state)
+        self._conn.executemany(_INSERT_CACHE, cache)
+        logger.info(f"Migrated {len(state) + len(cache)} entries from {self.legacy_state_file}")
+
+    def _get_cache_entry(self, key: str) -> Optional[tuple]:
+        """The live cache row for key as (value, fresh_until), or None; marks it used."""
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connection()
+                row = conn.execute(
+                    "SELECT value, COALESCE(fresh_until, expires_at), accessed_at FROM cache "
+                    "WHERE key = ? AND expires_at > ?",
+                    (key, now)
+                ).fetchone()
+                if row and now - (row[2] or 0) > CACHE_ATIME_RESOLUTION:
+                    conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to read state from {self.db_file}: {e}")
+                return None
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def _get(self, table: str, key: str) -> Any:
+        """A value from the entries or meta table, or None."""
+        with self._lock:
+            try:
+                row = self._connection().execute(f"SELECT value FROM {table} WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to read state from {self.db_file}: {e}")
+                return None
+        return json.loads(row[0]) if row else None
+
+    def _write(self, statement: str, params: tuple) -> None:
+        with self._lock:
+            try:
+                self._connection().execute(statement, params)
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to write state to {self.db_file}: {e}")
+
+    def get_state(self, key: str) -> Any:
+        """
+        Get a value from the state.
+
+        Args:
+            key: The state key
+
+        Returns:
+            Any: The stored value, or None if not found or on error
+        """
+        return self._get("entries", key)
+
+    def set_state(self, key: str, value: Any) -> None:
+        """
+        Set a value in the state.
+
+        Args:
+            key: The state key
+            value: The data to store (must be JSON serializable)
+        """
+        self._write(_INSERT_STATE, (key, json.dumps(value)))
+
+    def delete_state(self, key: str) -> None:
+        """
+        Remove a value from the state.
+
+        Args:
+            key: The state key
+        """
+        self._write("DELETE FROM entries WHERE key = ?", (key,))
+
+    def get_cache(self, key: str, refresh: Optional[Callable[[], Any]] = None,
+                  allow_stale: bool = False) -> Any:
+        """
+        Get a cached value if it has not expired.
+
+        Args:
+            key: The cache key
+            refresh: Called on a background thread when a stale value is
+                served; it should rebuild the entry with set_cache()
+            allow_stale: Serve a value past its TTL but within its grace
+                window without refreshing it
+
+        Returns:
+            Any: The cached data, or None if missing or expired
+        """
+        return self._stats.serve(key, self._get_cache_entry(key), refresh, allow_stale)
+
+    def set_cache(self, key: str, data: Any, ttl: int = 300, grace: int = 0) -> None:
+        """
+        Set a cached value with a time-to-live.
+
+        Args:
+            key: The cache key
+            data: The data to cache
+            ttl: Time to live in seconds (default: 300), unless cache_ttls
+                configures one for this key
+            grace: Seconds after the TTL during which the stale value can
+                still be served while it is refreshed
+        """
+        now = time.time()
+        fresh_until = now + _configured_ttl(self.cache_ttls, key, ttl)
+        self._write(_INSERT_CACHE, (key, json.dumps(data), fresh_until + grace, fresh_until, now))
+        self._maybe_sweep()
+
+    def clear_cache(self, key: str) -> None:
+        """
+        Drop a cached value so the next lookup is a miss.
+
+        Args:
+            key: The cache key
+        """
+        self._write("DELETE FROM cache WHERE key = ?", (key,))
+
+    def cache_stats(self) -> Dict[str, int]:
+        """
+        Cache counters for this manager.
+
+        Returns:
+            dict: Number of hits, misses, stale values served and background
+                refreshes started
+        """
+        return self._stats.snapshot()
+
+    def purge_expired(self) -> int:
+        """
+        Delete expired cache entries; runs each time the database is opened.
+
+        Returns:
+            int: Number of entries removed
+        """
+        with self._lock:
+            try:
+                cursor = self._connection().execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+                return cursor.rowcount
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to purge expired state from {self.db_file}: {e}")
+                return 0
+
+    def cache_usage(self) -> Dict[str, int]:
+        """
+        Size of the cache in the database.
+
+        Returns:
+            dict: Number of entries, their total bytes and how many have expired
+        """
+        with self._lock:
+            try:
+                count, size, expired = self._connection().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(value AS BLOB))), 0), "
+                    "COALESCE(SUM(expires_at <= ?), 0) FROM cache",
+                    (time.time(),)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to read state from {self.db_file}: {e}")
+                return {"entries": 0, "bytes": 0, "expired": 0}
+        return {"entries": count, "bytes": size, "expired": expired}
+
+    def prune_cache(self) -> Dict[str, int]:
+        """
+        Remove expired cache entries, then evict the least recently used
+        ones until the cache is within its bounds.
+
+        Returns:
+            dict: Entries expired and evicted, and the entries and bytes left
+        """
+        with self._lock:
+            try:
+                with self.transaction():
+                    conn = self._connection()
+                    now = time.time()
+                    expired = conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,)).rowcount
+                    rows = conn.execute(
+                        "SELECT key, LENGTH(CAST(value AS BLOB)) FROM cache ORDER BY COALESCE(accessed_at, 0)"
+                    ).fetchall()
+                    count = len(rows)
+                    total = sum(size for _, size in rows)
+                    evict = []
+                    for key, size in rows:
+                        if count <= self.cache_max_entries and total <= self.cache_max_bytes:
+                            break
+                        evict.append((key,))
+                        count -= 1
+                        total -= size
+                    conn.executemany("DELETE FROM cache WHERE key = ?", evict)
+                    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                 (_LAST_SWEEP_KEY, json.dumps(now)))
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to prune cache in {self.db_file}: {e}")
+                return {"expired": 0, "evicted": 0, **self.cache_usage()}
+        return {"expired": expired, "evicted": len(evict), "entries": count, "bytes": total}
+
+    def _maybe_sweep(self) -> None:
+        """Prune if no process has done so within CACHE_SWEEP_INTERVAL."""
+        last = self._get("meta", _LAST_SWEEP_KEY)
+        if not isinstance(last, (int, float)) or time.time() - last >= CACHE_SWEEP_INTERVAL:
+            self.prune_cache()
+
+    def flush(self) -> None:
+        """Writes are committed as they happen; kept for interface parity."""
+
+    def reload(self) -> None:
+        """Reads always see committed data; kept for interface parity."""
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator["SqliteStateManager"]:
+        """
+        Batch several changes into a single SQLite transaction.
+
+        The write lock is taken up front, so read-modify-write inside the
+        block is safe across processes. Changes are rolled back if the
+        block raises.
+        """
+        with self._lock:
+            conn = self._connection()
+            outermost = self._depth == 0
+            if outermost:
+                conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                if outermost:
+                    conn.execute("ROLLBACK")
+                raise
+            else:
+                if outermost:
+                    conn.execute("COMMIT")
+            finally:
+                self._depth -= 1
+
+    def close(self) -> None:
+        """Close the database connection; it is reopened on next use."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
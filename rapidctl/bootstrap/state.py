@@ -1,107 +1,663 @@
+import atexit
+import contextlib
+import hashlib
 import json
 import logging
+import os
+import tempfile
+import threading
 import time
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Callable, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError: # Not available on Windows; writes stay atomic but unlocked
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
+# Marks a key deleted in the pending buffer
+_DELETED = object()
+
+# Prefix of cache entries stored in the state file by earlier versions
+LEGACY_CACHE_PREFIX = "cache_"
+
+# Default lifetime of negative entries, which record that something is absent
+NEGATIVE_CACHE_TTL = 30
+
+# Per-process cache counters reported by cache_stats()
+CACHE_COUNTERS = ("hit", "miss", "stale", "refresh")
+
+# Default bounds on the cache; least recently used entries are evicted past them
+CACHE_MAX_ENTRIES = 2000
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Minimum gap between opportunistic expiry sweeps triggered by cache writes
+CACHE_SWEEP_INTERVAL = 3600
+# Reads refresh an entry's last-used time at most this often
+CACHE_ATIME_RESOLUTION = 60
+
+# Seconds to wait for another process to release the state file lock
+STATE_LOCK_TIMEOUT = 5.0
+STATE_LOCK_POLL_INTERVAL = 0.01
+
+
+class StateLockTimeout(Exception):
+    """Raised when another process holds the state file lock past STATE_LOCK_TIMEOUT."""
+    pass
+
+
+class _FileLock:
+    """
+    Advisory, reentrant lock on a sidecar file shared by every process.
+
+    The lock lives on its own file because the state file itself is replaced
+    on every write. Callers must hold the owning store's thread lock.
+    """
+
+    def __init__(self, path: Path, timeout: float = STATE_LOCK_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._fd: Optional[int] = None
+        self._depth = 0
+
+    @contextlib.contextmanager
+    def held(self) -> Iterator[None]:
+        """
+        Hold the lock for the block, waiting up to the timeout for it.
+
+        Raises:
+            StateLockTimeout: If another process still holds it after the timeout
+        """
+        if self._depth == 0:
+            self._acquire()
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self._release()
+
+    def _acquire(self) -> None:
+        if fcntl is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        except OSError as e:
+            logger.warning(f"Failed to open state lock {self.path}: {e}")
+            return
+
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._fd = fd
+                return
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    raise StateLockTimeout(f"Timed out waiting for state lock {self.path}")
+                time.sleep(STATE_LOCK_POLL_INTERVAL)
+
+    def _release(self) -> None:
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+def _atomic_write(path: Path, text: str, mtime: Optional[float] = None) -> None:
+    """
+    Write a file via a temp file and rename, so readers never see a partial
+    file. mtime, if given, is set on the file before it becomes visible.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        if mtime is not None:
+            os.utime(temp_path, (time.time(), mtime))
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(temp_path)
+        raise
+
+
+def _configured_ttl(cache_ttls: Dict[str, int], key: str, default: float) -> float:
+    """
+    The TTL configured for a cache key: an exact match, else the longest
+    configured prefix (e.g. 'subcommands_'), else the caller's default.
+    """
+    if key in cache_ttls:
+        return cache_ttls[key]
+    prefixes = [name for name in cache_ttls if key.startswith(name)]
+    return cache_ttls[max(prefixes, key=len)] if prefixes else default
+
+
+class _CacheStats:
+    """
+    Cache counters and background refreshes, shared by both state backends.
+
+    An entry is fresh until its TTL passes, then stale until its grace
+    window ends, then gone. Stale entries are only served to callers that
+    accept them; passing a refresh callable also starts one background
+    refresh per key, so the next reader gets fresh data.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys(CACHE_COUNTERS, 0)
+        self._refreshing = set()
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.counts[name] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.counts)
+
+    def serve(self, key: str, entry: Optional[tuple], refresh: Optional[Callable[[], Any]],
+              allow_stale: bool) -> Any:
+        """Decide what a lookup returns given the stored (data, fresh_until) entry."""
+        if entry is None:
+            self.count("miss")
+            return None
+        data, fresh_until = entry
+        if fresh_until > time.time():
+            self.count("hit")
+            return data
+        if refresh is None and not allow_stale:
+            self.count("miss")
+            return None
+        self.count("stale")
+        if refresh is not None:
+            self.refresh(key, refresh)
+        return data
+
+    def refresh(self, key: str, refresh: Callable[[], Any]) -> None:
+        """
+        Run refresh on a daemon thread unless one is already running for key.
+        A refresh cut short by process exit leaves the stale entry in place.
+        """
+        with self.lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            self.counts["refresh"] += 1
+
+        def run():
+            try:
+                refresh()
+            except Exception as e:
+                logger.warning(f"Background refresh of cache entry {key} failed: {e}")
+            finally:
+                with self.lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name=f"rapidctl-refresh-{key}", daemon=True).start()
+
+
+class _CacheStore:
+    """
+    Cache entries kept apart from durable state, one compact file per key.
+
+    Files are sharded by a hash of the key, and each file's mtime holds the
+    time the entry stops being servable (its TTL plus any grace window), so
+    an expired or missing entry is detected with a single stat and never
+    deserialized. Parsed payloads are remembered per process and reused
+    while the file on disk is unchanged.
+
+    The atime records when an entry was last used. Writes sweep expired
+    entries at most once per CACHE_SWEEP_INTERVAL, then evict the least
+    recently used ones until the cache is within its bounds.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.lock = threading.Lock()
+        self.stats = _CacheStats()
+        self._parsed: Dict[str, tuple] = {}
+
+    def path_for(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return self.root / digest[:2] / digest
+
+    def get(self, key: str) -> Optional[tuple]:
+        """The live entry for key as (data, fresh_until), or None."""
+        path = self.path_for(key)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if stat.st_mtime <= time.time():
+            return None
+
+        version = (stat.st_ino, stat.st_mtime_ns)
+        if time.time() - stat.st_atime > CACHE_ATIME_RESOLUTION:
+            self._touch(path, stat)
+
+        with self.lock:
+            parsed = self._parsed.get(key)
+        if parsed and parsed[0] == version:
+            return parsed[1]
+
+        try:
+            with open(path, 'r') as f:
+                payload = json.load(f)
+            # Entries written without a grace window carry no fresh_until
+            entry = (payload.get("data"), payload.get("fresh_until", stat.st_mtime))
+        except (json.JSONDecodeError, OSError, AttributeError) as e:
+            logger.warning(f"Failed to read cache entry {path}: {e}")
+            return None
+        with self.lock:
+            self._parsed[key] = (version, entry)
+        return entry
+
+    @staticmethod
+    def _touch(path: Path, stat: os.stat_result) -> None:
+        """Mark an entry used now, keeping its mtime (the expiry) unchanged."""
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            # Only touch the file that was checked, not one that replaced it since
+            current = os.fstat(fd)
+            if (current.st_ino, current.st_mtime_ns) == (stat.st_ino, stat.st_mtime_ns):
+                target = fd if os.utime in os.supports_fd else path
+                os.utime(target, ns=(time.time_ns(), current.st_mtime_ns))
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def set(self, key: str, data: Any, ttl: float, grace: float = 0) -> None:
+        path = self.path_for(key)
+        fresh_until = time.time() + ttl
+        payload = json.dumps({"key": key, "data": data, "fresh_until": fresh_until}, separators=(",", ":"))
+        with self.lock:
+            self._parsed.pop(key, None)
+        try:
+            _atomic_write(path, payload, mtime=fresh_until + grace)
+        except OSError as e:
+            logger.warning(f"Failed to write cache entry {path}: {e}")
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            self._parsed.pop(key, None)
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path_for(key))
+
+    def _entries(self) -> Iterator[os.DirEntry]:
+        """Every entry file, removing temp files left behind by crashed writers."""
+        try:
+            shards = [shard for shard in os.scandir(self.root) if shard.is_dir() and len(shard.name) == 2]
+        except OSError:
+            return
+        stale_before = time.time() - CACHE_SWEEP_INTERVAL
+        for shard in shards:
+            with contextlib.suppress(OSError), os.scandir(shard.path) as files:
+                for entry in files:
+                    if not entry.name.startswith("."):
+                        yield entry
+                    elif entry.stat().st_mtime < stale_before:
+                        with contextlib.suppress(OSError):
+                            os.unlink(entry.path)
+
+    def usage(self) -> Dict[str, int]:
+        """Number of entries, their total size and how many have expired."""
+        now = time.time()
+        usage = {"entries": 0, "bytes": 0, "expired": 0}
+        for entry in self._entries():
+            with contextlib.suppress(OSError):
+                stat = entry.stat()
+                usage["entries"] += 1
+                usage["bytes"] += stat.st_size
+                usage["expired"] += stat.st_mtime <= now
+        return usage
+
+    def sweep(self, max_entries: int, max_bytes: int) -> Dict[str, int]:
+        """Remove expired entries, then least recently used ones past the bounds."""
+        now = time.time()
+        live = []
+        expired = 0
+        for entry in self._entries():
+            with contextlib.suppress(OSError):
+                stat = entry.stat()
+                if stat.st_mtime <= now:
+                    os.unlink(entry.path)
+                    expired += 1
+                else:
+                    live.append((stat.st_atime, stat.st_size, entry.path))
+
+        live.sort()
+        count = len(live)
+        total = sum(size for _, size, _ in live)
+        evicted = 0
+        for _, size, path in live:
+            if count <= max_entries and total <= max_bytes:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+            count -= 1
+            total -= size
+            evicted += 1
+        return {"expired": expired, "evicted": evicted, "entries": count, "bytes": total}
+
+    def maybe_sweep(self, max_entries: int, max_bytes: int) -> None:
+        """Sweep if no process has done so within CACHE_SWEEP_INTERVAL."""
+        marker = self.root / ".last-sweep"
+        try:
+            if time.time() - marker.stat().st_mtime < CACHE_SWEEP_INTERVAL:
+                return
+        except OSError:
+            pass
+        try:
+            marker.touch()
+            self.sweep(max_entries, max_bytes)
+        except OSError as e:
+            logger.warning(f"Failed to sweep cache {self.root}: {e}")
+
+
+class _StateStore:
+    """
+    In-memory copy of one state file, shared by every StateManager on that path.
+
+    The file is parsed once, on first access. Mutations are applied in memory
+    and remembered as pending until flush(), which re-reads the file under
+    the cross-process lock and merges only the pending keys into it, so keys
+    written meanwhile by other processes are kept.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.file_lock = _FileLock(path.with_name(path.name + ".lock"))
+        self.cache = _CacheStore(path.with_name(f"{path.stem}.cache"))
+        self.data: Optional[Dict[str, Any]] = None
+        self.pending: Dict[str, Any] = {}
+        self.depth = 0
+
+    def _read_file(self, quarantine: bool = False) -> Dict[str, Any]:
+        """
+        Parse the state file. With quarantine, an unreadable file is moved
+        aside before it is overwritten, instead of being silently lost.
+        """
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+            return state if isinstance(state, dict) else {}
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Failed to read state from {self.path}: {e}")
+            if quarantine and isinstance(e, json.JSONDecodeError):
+                corrupt_path = self.path.with_name(self.path.name + ".corrupt")
+                with contextlib.suppress(OSError):
+                    os.replace(self.path, corrupt_path)
+                    logger.warning(f"Moved unreadable state file to {corrupt_path}")
+            return {}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The in-memory state, loading it from disk on first use."""
+        if self.data is None:
+            self.data = self._read_file()
+            for key, value in self.pending.items():
+                self._apply(self.data, key, value)
+            # Caches used to live in the state file; drop them so it stays small
+            for key in [k for k in self.data if k.startswith(LEGACY_CACHE_PREFIX)]:
+                del self.data[key]
+                self.pending[key] = _DELETED
+        return self.data
+
+    @staticmethod
+    def _apply(state: Dict[str, Any], key: str, value: Any) -> None:
+        if value is _DELETED:
+            state.pop(key, None)
+        else:
+            state[key] = value
+
+    def mutate(self, key: str, value: Any) -> None:
+        """Apply a change in memory and buffer it for the next flush."""
+        with self.lock:
+            self._apply(self.snapshot(), key, value)
+            self.pending[key] = value
+
+    def flush(self) -> None:
+        """Merge pending changes into the file in a single atomic, locked write."""
+        with self.lock:
+            if not self.pending:
+                return
+            try:
+                with self.file_lock.held():
+                    state = self._read_file(quarantine=True)
+                    for key, value in self.pending.items():
+                        self._apply(state, key, value)
+                    if self._write(state):
+                        self.pending.clear()
+                        self.data = state
+            except StateLockTimeout as e:
+                # A hung holder must not wedge every tool, but writing without
+                # the lock could undo its changes; retry on the next flush
+                logger.warning(f"{e}; keeping changes buffered")
+
+    def reload(self) -> None:
+        """Drop the in-memory copy so the next read sees the file again."""
+        with self.lock:
+            self.data = None
+
+    def _write(self, state: Dict[str, Any]) -> bool:
+        """Write the full state atomically."""
+        try:
+            _atomic_write(self.path, json.dumps(state, indent=4))
+            return True
+        except OSError as e:
+            logger.warning(f"Failed to write state to {self.path}: {e}")
+            return False
+
+
+_stores: Dict[Path, _StateStore] = {}
+_stores_lock = threading.Lock()
+
+
+def _store_for(path: Path) -> _StateStore:
+    """The shared store for a state file path."""
+    key = path.absolute()
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = _StateStore(key)
+        return store
+
+
+def flush_all() -> None:
+    """Flush every state file with pending changes; runs at interpreter exit."""
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.flush()
+
+
+atexit.register(flush_all)
+
+
 class StateManager:
     """
     Manages persistent state and cache data for rapidctl.
     Pluggable by design: defaults to ~/.rapidctl/state.json, but can be
     overridden for testing or multiple profiles.
+
+    The file is loaded once per process and changes are buffered in memory.
+    They are written at exit, on flush(), or when the outermost transaction()
+    block ends. Caches are kept out of the state file, one file per key
+    under <state file stem>.cache/ next to it, and written immediately.
     """
 
-    def __init__(self, state_file: Optional[Path] = None):
+    def __init__(self, state_file: Optional[Path] = None, cache_ttls: Optional[Dict[str, int]] = None,
+                 cache_max_entries: int = CACHE_MAX_ENTRIES, cache_max_bytes: int = CACHE_MAX_BYTES):
         """
         Initialize the state manager.
-        
+
         Args:
             state_file: Path to the JSON state file. Defaults to ~/.rapidctl/state.json
+            cache_ttls: TTLs in seconds by cache key or key prefix, overriding
+                the defaults callers pass to set_cache()
+            cache_max_entries: Most cache entries kept before LRU eviction
+            cache_max_bytes: Most cache bytes kept before LRU eviction
         """
         self.state_file: Path = state_file or Path.home() / ".rapidctl" / "state.json"
+        self.cache_ttls: Dict[str, int] = dict(cache_ttls or {})
+        self.cache_max_entries = cache_max_entries
+        self.cache_max_bytes = cache_max_bytes
+        self._store = _store_for(self.state_file)
+        self.cache_dir: Path = self._store.cache.root
 
     def get_state(self, key: str) -> Any:
         """
-        Get a value from the state file.
-        
+        Get a value from the state.
+
         Args:
             key: The state key
-            
+
         Returns:
             Any: The stored value, or None if not found or on error
         """
-        if not self.state_file.exists():
-            return None
-        
-        try:
-            with open(self.state_file, 'r') as f:
-                state = json.load(f)
-                return state.get(key)
-        except (json.JSONDecodeError, OSError) as e:
-            logger.warning(f"Failed to read state from {self.state_file}: {e}")
-            return None
+        with self._store.lock:
+            return self._store.snapshot().get(key)
 
     def set_state(self, key: str, value: Any) -> None:
         """
-        Set a value in the state file.
-        
+        Set a value in the state.
+
         Args:
             key: The state key
             value: The data to store (must be JSON serializable)
         """
-        self.state_file.parent.mkdir(parents=True, exist_ok=True)
-        state = {}
-        
-        if self.state_file.exists():
+        self._store.mutate(key, value)
+
+    def delete_state(self, key: str) -> None:
+        """
+        Remove a value from the state.
+
+        Args:
+            key: The state key
+        """
+        with self._store.lock:
+            if key in self._store.snapshot():
+                self._store.mutate(key, _DELETED)
+
+    def flush(self) -> None:
+        """Write buffered changes to the state file now."""
+        self._store.flush()
+
+    def reload(self) -> None:
+        """
+        Re-read the state file on next access, picking up changes made by
+        other processes. Buffered changes are kept and still win.
+        """
+        self._store.reload()
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator["StateManager"]:
+        """
+        Batch several changes into a single atomic write.
+
+        The block holds the cross-process lock and starts from a fresh read
+        of the file, so read-modify-write inside it is safe against other
+        threads and processes. The outermost block flushes when it exits.
+        If another process holds the lock past STATE_LOCK_TIMEOUT, the block
+        runs on the in-memory state and its changes stay buffered instead.
+        """
+        store = self._store
+        with store.lock, contextlib.ExitStack() as held:
+            outermost = store.depth == 0
+            locked = True
+            if outermost:
+                try:
+                    held.enter_context(store.file_lock.held())
+                    store.reload()
+                except StateLockTimeout as e:
+                    logger.warning(f"{e}; keeping the transaction's changes buffered")
+                    locked = False
+            store.depth += 1
             try:
-                with open(self.state_file, 'r') as f:
-                    state = json.load(f)
-            except (json.JSONDecodeError, OSError) as e:
-                logger.warning(f"Failed to load existing state file, overwriting: {e}")
-                # We intentionally don't fail here and just overwrite with empty state dict
-                pass
-        
-        state[key] = value
-        
-        try:
-            with open(self.state_file, 'w') as f:
-                json.dump(state, f, indent=4)
-        except OSError as e:
-            logger.warning(f"Failed to write state to {self.state_file}: {e}")
+                yield self
+            finally:
+                store.depth -= 1
+                if outermost and locked:
+                    store.flush()
 
-    def get_cache(self, key: str) -> Any:
+    def get_cache(self, key: str, refresh: Optional[Callable[[], Any]] = None,
+                  allow_stale: bool = False) -> Any:
         """
         Get a cached value if it has not expired.
-        
+
         Args:
             key: The cache key
-            
+            refresh: Called on a background thread when a stale value is
+                served; it should rebuild the entry with set_cache()
+            allow_stale: Serve a value past its TTL but within its grace
+                window without refreshing it
+
         Returns:
             Any: The cached data, or None if missing or expired
         """
-        cache_data = self.get_state(f"cache_{key}")
-        if cache_data and isinstance(cache_data, dict):
-            timestamp = cache_data.get("timestamp", 0)
-            ttl = cache_data.get("ttl", 300) # Default 5 mins
-            
-            if time.time() - timestamp < ttl:
-                return cache_data.get("data")
-        return None
+        return self._store.cache.stats.serve(key, self._store.cache.get(key), refresh, allow_stale)
 
-    def set_cache(self, key: str, data: Any, ttl: int = 300) -> None:
+    def set_cache(self, key: str, data: Any, ttl: int = 300, grace: int = 0) -> None:
         """
         Set a cached value with a time-to-live.
-        
+
         Args:
             key: The cache key
             data: The data to cache
-            ttl: Time to live in seconds (default: 300)
-        """
-        cache_data = {
-            "timestamp": time.time(),
-            "ttl": ttl,
-            "data": data
-        }
-        self.set_state(f"cache_{key}", cache_data)
+            ttl: Time to live in seconds (default: 300), unless cache_ttls
+                configures one for this key
+            grace: Seconds after the TTL during which the stale value can
+                still be served while it is refreshed
+        """
+        self._store.cache.set(key, data, _configured_ttl(self.cache_ttls, key, ttl), grace)
+        self._store.cache.maybe_sweep(self.cache_max_entries, self.cache_max_bytes)
+
+    def clear_cache(self, key: str) -> None:
+        """
+        Drop a cached value so the next lookup is a miss.
+
+        Args:
+            key: The cache key
+        """
+        self._store.cache.delete(key)
+
+    def cache_stats(self) -> Dict[str, int]:
+        """
+        Cache counters for this process.
+
+        Returns:
+            dict: Number of hits, misses, stale values served and background
+                refreshes started
+        """
+        return self._store.cache.stats.snapshot()
+
+    def cache_usage(self) -> Dict[str, int]:
+        """
+        Size of the cache on disk.
+
+        Returns:
+            dict: Number of entries, their total bytes and how many have expired
+        """
+        return self._store.cache.usage()
+
+    def prune_cache(self) -> Dict[str, int]:
+        """
+        Remove expired cache entries, then evict the least recently used
+        ones until the cache is within its bounds.
+
+        Returns:
+            dict: Entries expired and evicted, and the entries and bytes left
+        """
+        return self._store.cache.sweep(self.cache_max_entries, self.cache_max_bytes)
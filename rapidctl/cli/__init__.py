@@ -5,19 +5,49 @@ import sys
 import json
 import os
 from typing import List, Optional, Dict, Any
-import podman
 import re
 
+from rapidctl.cli.inventory import ImageInventory
+from rapidctl.cli.registry import RegistryClient
+from rapidctl.utils import profile
+
+# Log drivers podman can read container output back from; the podman
+# library checks for the first two, k8s-file is podman's own default
+LOG_DRIVERS_WITH_LOGS = ("json-file", "journald", "k8s-file")
+
 
 class PodmanCLI:
     """A CLI tool for interacting with Podman containers using the API."""
 
-    def __init__(self):
-        self.client = None
+    def __init__(self, state_manager=None):
+        # The podman package and its HTTP stack are only imported on first
+        # use of the client, so cache-served invocations never load them
+        self._client = None
         self.auth_configs = {}
+        self.socket_path: Optional[str] = None
+        self.state_manager = state_manager
+        # Image list snapshot shared by every lookup in this invocation,
+        # backed by the persistent image cache when a state manager is set
+        self.inventory = ImageInventory(self, state_manager=state_manager)
+        # Remote tag lookups, sharing the credentials cached by login()
+        self.registry = RegistryClient(state_manager=state_manager, auth_configs=self.auth_configs)
+
+    @property
+    def client(self):
+        """The podman API client, connecting on first access."""
+        if self._client is None:
+            self._connect_to_podman()
+        return self._client
+
+    @client.setter
+    def client(self, value) -> None:
+        self._client = value
+
+    def _resolve_socket(self) -> str:
+        """Resolve the podman socket from the environment or the platform connector."""
+        if self.socket_path:
+            return self.socket_path
 
-    def _connect_to_podman(self) -> None:
-        """Connect to the podman socket using platform-specific connector."""
         # Try to get socket from environment first
         socket_path = os.environ.get("PODMAN_SOCKET")
         
@@ -25,7 +55,8 @@ class PodmanCLI:
         if not socket_path:
             try:
                 from rapidctl.bootstrap.connectors import detect_socket
-                socket_path = detect_socket()
+                with profile.phase("connector.detect"):
+                    socket_path = detect_socket()
                 if not socket_path:
                     raise PodmanAPIError(
                         "Could not detect Podman socket. "
@@ -34,12 +65,22 @@ class PodmanCLI:
                     )
             except ImportError as e:
                 raise PodmanAPIError(f"Failed to import connector: {str(e)}")
+
+        self.socket_path = socket_path
+        return socket_path
+
+    def _connect_to_podman(self) -> None:
+        """Connect to the podman socket using platform-specific connector."""
+        socket_path = self._resolve_socket()
         
         try:
-            self.client = podman.client.PodmanClient(base_url=socket_path)
+            with profile.phase("podman.connect"):
+                import podman
+                self.client = podman.client.PodmanClient(base_url=socket_path)
         except Exception as e:
             raise PodmanAPIError(f"Failed to connect to Podman API at {socket_path}: {str(e)}")
 
+    @profile.timed("podman.list_images")
     def list_images(self):
         """List container images"""
         try:
@@ -47,6 +88,101 @@ class PodmanCLI:
         except Exception as e:
             raise PodmanAPIError(f"Failed to list images: {str(e)}")
 
+    def image_store_fingerprint(self) -> Optional[str]:
+        """
+        Cheap fingerprint of the local image store.
+
+        Podman rewrites its image metadata file whenever an image is pulled,
+        tagged, untagged or removed, so its mtime and size change with the
+        store. The file location is looked up once per socket and remembered
+        in the state manager.
+
+        Returns:
+            Optional[str]: Fingerprint string, or None if the store can't be
+            observed from this host (e.g. a remote Podman machine)
+        """
+        if not self.state_manager:
+            return None
+
+        try:
+            socket_path = self._resolve_socket()
+        except PodmanAPIError:
+            return None
+
+        store = self.state_manager.get_state("image_store")
+        if isinstance(store, dict) and store.get("socket") == socket_path:
+            metadata_path = store.get("path")
+        else:
+            metadata_path = self._inspect_image_store(socket_path)["path"]
+
+        if not metadata_path:
+            return None
+
+        try:
+            stat = os.stat(metadata_path)
+        except OSError:
+            return None
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    def events_available(self) -> bool:
+        """
+        Whether Podman keeps an events log that can be queried for past
+        image changes. Looked up once per socket like the image store.
+        """
+        if not self.state_manager:
+            return False
+
+        try:
+            socket_path = self._resolve_socket()
+        except PodmanAPIError:
+            return False
+
+        store = self.state_manager.get_state("image_store")
+        if not (isinstance(store, dict) and store.get("socket") == socket_path and "events" in store):
+            store = self._inspect_image_store(socket_path)
+        return bool(store["events"])
+
+    def _inspect_image_store(self, socket_path: str) -> Dict[str, Any]:
+        """
+        Ask Podman where its image metadata lives, if it is on this host, and
+        whether it logs events, then remember both in the state manager.
+        """
+        store = {"socket": socket_path, "path": None, "events": False}
+        try:
+            info = self.client.info()
+            metadata_path = os.path.join(
+                info["store"]["graphRoot"], f"{info['store']['graphDriverName']}-images", "images.json"
+            )
+            store["path"] = metadata_path if os.path.exists(metadata_path) else None
+            store["events"] = info.get("host", {}).get("eventLogger", "none") != "none"
+        except Exception:
+            pass
+        self.state_manager.set_state("image_store", store)
+        return store
+
+    @profile.timed("podman.events")
+    def image_events(self, since: int, until: int) -> List[Dict[str, Any]]:
+        """Image events logged by Podman between two unix timestamps, oldest first."""
+        try:
+            return list(self.client.events(since=since, until=until, filters={"type": "image"}, decode=True))
+        except Exception as e:
+            raise PodmanAPIError(f"Failed to read events: {str(e)}")
+
+    def stream_image_events(self, since: int):
+        """Follow image events from a unix timestamp on; blocks until the stream ends."""
+        try:
+            yield from self.client.events(since=since, filters={"type": "image"}, decode=True)
+        except Exception as e:
+            raise PodmanAPIError(f"Events stream failed: {str(e)}")
+
+    def get_image(self, image_name: str):
+        """Get a local image by ID or reference."""
+        try:
+            return self.client.images.get(image_name)
+        except Exception as e:
+            raise PodmanAPIError(f"Failed to get image: {str(e)}")
+
+    @profile.timed("podman.pull_image")
     def pull_image(self, image_name: str) -> Dict[str, Any]:
         """Pull an image from a registry."""
         try:
@@ -86,6 +222,9 @@ class PodmanCLI:
         
             # Get the pulled image
             image = self.client.images.get(image_name)
+
+            # The image store changed, so the current snapshot is stale
+            self.inventory.invalidate(image_tag=image_name)
         
             return {
                 "Id": image.id,
@@ -99,6 +238,13 @@ class PodmanCLI:
                 raise PodmanAuthError(f"Authentication required for {image_name}: {str(e)}")
             raise PodmanAPIError(f"Failed to pull image: {str(e)}")
 
+    def export_image(self, image_name: str):
+        """Stream an image as a docker-archive tarball, in byte chunks."""
+        try:
+            return self.client.images.get(image_name).save()
+        except Exception as e:
+            raise PodmanAPIError(f"Failed to export image: {str(e)}")
+
     def login(self, username, password, registry):
         """Authenticate with a registry."""
         try:
@@ -113,28 +259,158 @@ class PodmanCLI:
         except Exception as e:
             raise PodmanAPIError(f"Failed to login to {registry}: {str(e)}")
 
+    @profile.timed("container.create")
+    def create_container(self, image_name: str, command: List[str]):
+        """Create, but do not start, a container for a one-off command."""
+        try:
+            from podman.errors import ImageNotFound
+            try:
+                return self.client.containers.create(image=image_name, command=command)
+            except ImageNotFound:
+                self.client.images.pull(image_name, policy="missing")
+                return self.client.containers.create(image=image_name, command=command)
+        except Exception as e:
+            raise self._run_error(e, command)
+
     def run_container(self, image_name: str, command: List[str], stream: bool = True) -> Any:
-        """Run a command in a new container."""
+        """
+        Run a command in a new container and remove it afterwards.
+
+        Follows the same steps as the podman library's containers.run(),
+        spelled out so each one can be timed when profiling.
+        """
+        container = self.create_container(image_name, command)
+        return self.run_created_container(container, image_name, command, stream)
+
+    def run_created_container(self, container, image_name: str, command: List[str],
+                              stream: bool = True) -> Any:
+        """Start a container from create_container(), wait for it and remove it."""
+        try:
+            from podman.errors import ContainerError
+
+            with profile.phase("container.start"):
+                container.start()
+
+            # Other log drivers (e.g. none, passthrough) keep nothing to read
+            # back, so only the exit code is reported
+            log_config = (container.attrs or {}).get("HostConfig", {}).get("LogConfig", {})
+            readable = log_config.get("Type") in LOG_DRIVERS_WITH_LOGS
+
+            with profile.phase("container.wait"):
+                logs = container.logs(stdout=True, stderr=False, stream=True, follow=True) if readable else iter([])
+                exit_status = container.wait()
+
+            if exit_status != 0:
+                logs = container.logs(stdout=False, stderr=True) if readable else None
+                container.remove()
+                raise ContainerError(container, exit_status, command, image_name, logs)
+
+            container.remove()
+            return logs if stream else b"".join(logs)
+        except Exception as e:
+            raise self._run_error(e, command)
+
+    def _run_error(self, e: Exception, command: List[str]) -> PodmanAPIError:
+        """Translate a container run failure into a PodmanAPIError."""
+        error_msg = str(e)
+        # Detect OCI command not found errors
+        if "not found in $PATH" in error_msg or "OCI runtime attempted to invoke a command that was not found" in error_msg:
+            # Try to extract the command name for a better message
+            import re
+            cmd_search = re.search(r'executable file `([^`]+)`', error_msg)
+            missing_cmd = cmd_search.group(1) if cmd_search else command[0]
+            return PodmanAPIError(
+                f"Command not found inside container: {missing_cmd}\n"
+                "Please verify the command exists at the expected path within the container image."
+            )
+        return PodmanAPIError(f"Failed to run command in container: {error_msg}")
+
+    def get_container(self, name_or_id: str):
+        """Get a container by name or ID, or None if it does not exist."""
+        from podman.errors import NotFound
+        try:
+            return self.client.containers.get(name_or_id)
+        except NotFound:
+            return None
+        except Exception as e:
+            raise PodmanAPIError(f"Failed to get container: {str(e)}")
+
+    def create_session_container(self, image_name: str, name: str, labels: Dict[str, str]):
+        """Create and start a long-lived, idle container to exec commands in."""
+        try:
+            container = self.client.containers.create(
+                image_name,
+                name=name,
+                labels=labels,
+                entrypoint=["sh", "-c"],
+                command=["trap 'exit 0' TERM; while :; do sleep 3600 & wait $!; done"]
+            )
+            container.start()
+            return container
+        except Exception as e:
+            raise PodmanAPIError(f"Failed to create session container: {str(e)}")
+
+    def list_session_containers(self, label: str) -> List[Any]:
+        """List all containers (running or not) carrying the given label."""
+        try:
+            return self.client.containers.list(all=True, filters={"label": [label]})
+        except Exception as e:
+            raise PodmanAPIError(f"Failed to list session containers: {str(e)}")
+
+    def remove_container(self, container_id: str, force: bool = True) -> None:
+        """Remove a container, stopping it first when forced."""
+        try:
+            self.client.containers.get(container_id).remove(force=force)
+        except Exception as e:
+            raise PodmanAPIError(f"Failed to remove container: {str(e)}")
+
+    def remove_image(self, image_name: str) -> None:
+        """
+        Remove a local image by tag. An image that carries other tags is
+        only untagged; one still used by a container is refused.
+        """
         try:
-            return self.client.containers.run(
-                image_name, 
-                command=command, 
-                remove=True, 
-                stream=stream
+            self.client.images.remove(image_name)
+        except Exception as e:
+            raise PodmanAPIError(f"Failed to remove image {image_name}: {str(e)}")
+        finally:
+            self.inventory.invalidate()
+
+    @profile.timed("container.exec")
+    def start_exec(self, container_id: str, cmd: List[str]):
+        """
+        Start a command in a running container and stream its output.
+
+        Returns:
+            tuple: (exec ID, iterator of stdout/stderr byte chunks)
+        """
+        try:
+            response = self.client.api.post(
+                f"/containers/{container_id}/exec",
+                data=json.dumps({"AttachStdout": True, "AttachStderr": True, "Cmd": cmd, "Tty": False})
+            )
+            response.raise_for_status()
+            exec_id = response.json()["Id"]
+
+            start = self.client.api.post(
+                f"/exec/{exec_id}/start",
+                data=json.dumps({"Detach": False, "Tty": False}),
+                stream=True
             )
+            start.raise_for_status()
+            from podman import api
+            return exec_id, api.stream_frames(start)
+        except Exception as e:
+            raise PodmanAPIError(f"Failed to execute command in container: {str(e)}")
+
+    def exec_exit_code(self, exec_id: str) -> Optional[int]:
+        """Get the exit code of a finished exec session."""
+        try:
+            response = self.client.api.get(f"/exec/{exec_id}/json")
+            response.raise_for_status()
+            return response.json().get("ExitCode")
         except Exception as e:
-            error_msg = str(e)
-            # Detect OCI command not found errors
-            if "not found in $PATH" in error_msg or "OCI runtime attempted to invoke a command that was not found" in error_msg:
-                # Try to extract the command name for a better message
-                import re
-                cmd_search = re.search(r'executable file `([^`]+)`', error_msg)
-                missing_cmd = cmd_search.group(1) if cmd_search else command[0]
-                raise PodmanAPIError(
-                    f"Command not found inside container: {missing_cmd}\n"
-                    "Please verify the command exists at the expected path within the container image."
-                )
-            raise PodmanAPIError(f"Failed to run command in container: {error_msg}")
+            raise PodmanAPIError(f"Failed to inspect exec session: {str(e)}")
 
     def list_containers(self, all_containers: bool = False) -> List[Dict[str, Any]]:
         """List containers."""
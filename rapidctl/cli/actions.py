@@ -1,6 +1,7 @@
+import sys
 import rapidctl.cli.tasks
 from typing import List, Optional
-from functools import cmp_to_key
+from rapidctl.utils import profile
 
 def find_container(podman_session, container):
     """
@@ -34,27 +35,24 @@ def pull_container(podman_session, container):
 
 def list_local_versions(podman_session, repo: str) -> List[str]:
     """Action to list all local versions for a repo, sorted from newest to oldest."""
-    tags = rapidctl.cli.tasks.get_local_image_tags(podman_session, repo)
-    
-    # Sort tags using the VersionParser via task compare_versions
-    sorted_tags = sorted(
-        tags, 
-        key=cmp_to_key(rapidctl.cli.tasks.compare_versions),
-        reverse=True
-    )
-    
-    return sorted_tags
+    return rapidctl.cli.tasks.get_version_index(podman_session, repo).descending()
 
 
-def find_newer_version(podman_session, repo: str, current_version: str) -> Optional[str]:
-    """Action to find the newest available local version that is newer than current."""
-    all_versions = list_local_versions(podman_session, repo)
-    
-    if not all_versions:
+def find_newer_version(podman_session, repo: str, current_version: str, remote: bool = False) -> Optional[str]:
+    """
+    Action to find the newest available version that is newer than current.
+
+    Only local tags are considered unless remote is set, in which case the
+    repo's tags in its registry are merged into the local version order.
+    """
+    index = rapidctl.cli.tasks.get_version_index(podman_session, repo)
+    if remote:
+        index = index.updated([*index, *rapidctl.cli.tasks.get_remote_tags(podman_session, repo)])
+    newest = index.newest()
+
+    if not newest:
         return None
-        
-    newest = all_versions[0]
-    
+
     # Compare with current
     if rapidctl.cli.tasks.compare_versions(newest, current_version) > 0:
         return newest
@@ -62,6 +60,34 @@ def find_newer_version(podman_session, repo: str, current_version: str) -> Optio
     return None
 
 
+def resolve_version_constraint(podman_session, repo: str, spec: str, state_manager=None,
+                               remote: bool = False) -> Optional[str]:
+    """
+    Action to resolve a version constraint such as '^1.4' to the newest matching tag.
+
+    The result is cached per constraint until the local image store
+    changes, so a wrapper tracking a release line doesn't re-resolve on
+    every start. With remote, the repo's registry tags are considered too.
+
+    Returns:
+        Optional[str]: The matching tag, or None if no version matches
+    """
+    fingerprint = podman_session.image_store_fingerprint()
+    resolved = rapidctl.cli.tasks.get_resolved_version(state_manager, repo, spec, fingerprint)
+    if resolved:
+        return resolved
+
+    constraint = rapidctl.cli.tasks.parse_version_constraint(spec)
+    index = rapidctl.cli.tasks.get_version_index(podman_session, repo)
+    if remote:
+        index = index.updated([*index, *rapidctl.cli.tasks.get_remote_tags(podman_session, repo)])
+
+    resolved = constraint.resolve(index)
+    if resolved:
+        rapidctl.cli.tasks.cache_resolved_version(state_manager, repo, spec, fingerprint, resolved, remote=remote)
+    return resolved
+
+
 def ensure_version(podman_session, repo: str, version: str):
     """Action to ensure a specific version exists locally, pulling if necessary."""
     full_image_ref = f"{repo}:{version}"
@@ -78,23 +104,168 @@ def ensure_version(podman_session, repo: str, version: str):
     return image_id
 
 
-def apply_latest_available(podman_session, repo: str, current_version: str) -> str:
+def apply_latest_available(podman_session, repo: str, current_version: str, remote: bool = False,
+                           state_manager=None) -> str:
     """
-    Action to find the latest local version, update baseline_version,
-    and persist the choice to disk.
+    Action to find the latest version, update baseline_version,
+    and persist the choice to disk, in the tool's state_manager. A remote
+    version is pulled the next time the tool runs.
     
     Returns the version that was applied.
     """
-    newer = find_newer_version(podman_session, repo, current_version)
+    newer = find_newer_version(podman_session, repo, current_version, remote=remote)
     
     if newer:
         # Persist the choice to disk so it's sticky across executions
-        rapidctl.cli.tasks.write_version_state(repo, newer)
+        rapidctl.cli.tasks.write_version_state(repo, newer, state_manager=state_manager)
         return newer
         
     return current_version
 
 
+def start_prefetch(podman_session, repo: str, version: str) -> bool:
+    """
+    Action to pull a newer version in a detached, low-priority process so
+    that pinning it later needs no download.
+
+    Nothing is started if the version is already local or another
+    prefetch for the repo holds its lock.
+
+    Returns:
+        bool: True if a prefetch process was started
+    """
+    if find_container(podman_session, f"{repo}:{version}"):
+        return False
+
+    argv = rapidctl.cli.tasks.build_prefetch_argv(version)
+    if not argv:
+        return False
+
+    # Only a cheap pre-check; the prefetch process takes the lock itself
+    fd = rapidctl.cli.tasks.acquire_file_lock(rapidctl.cli.tasks.prefetch_lock_path(repo))
+    if fd is None:
+        return False
+    rapidctl.cli.tasks.release_file_lock(fd)
+
+    rapidctl.cli.tasks.spawn_detached(argv)
+    return True
+
+
+def prefetch_version(podman_session, repo: str, version: str, state_manager) -> bool:
+    """
+    Action run by the prefetch process: pull a version under the repo's
+    prefetch lock and record the outcome in state.
+
+    Returns:
+        bool: True if the version is now local
+    """
+    lock_path = rapidctl.cli.tasks.prefetch_lock_path(repo)
+    fd = rapidctl.cli.tasks.acquire_file_lock(lock_path)
+    if fd is None:
+        return False
+
+    try:
+        rapidctl.cli.tasks.record_prefetch(state_manager, repo, version, "running")
+        try:
+            image_id = ensure_version(podman_session, repo, version)
+        except Exception:
+            rapidctl.cli.tasks.record_prefetch(state_manager, repo, version, "failed")
+            raise
+        rapidctl.cli.tasks.record_prefetch(state_manager, repo, version, "done", image_id=image_id)
+        return True
+    finally:
+        rapidctl.cli.tasks.release_file_lock(fd)
+
+
+def reclaimable_bytes(images: List[dict], image_tags: List[str]) -> int:
+    """
+    Action to total the size of the images that would be left without a
+    tag once the given tags are removed. Layers shared with images that
+    stay aren't freed, so this is an upper bound.
+    """
+    doomed = set(image_tags)
+    return sum(
+        image.get("size") or 0 for image in images
+        if image["tags"] and set(image["tags"]) <= doomed
+    )
+
+
+def plan_image_gc(podman_session, repo: str, state_manager, keep_versions: int, keep_days: float,
+                  protected=()) -> dict:
+    """
+    Action to work out which local versions of a repo garbage collection removes.
+
+    Returns:
+        dict: {"versions": tags to remove, newest first, "bytes": space their removal frees at most}
+    """
+    tasks = rapidctl.cli.tasks
+    usage = tasks.get_image_usage(state_manager, repo)
+    versions = tasks.select_gc_versions(
+        list_local_versions(podman_session, repo), usage, keep_versions, keep_days, protected
+    )
+    images = tasks.get_image_inventory(podman_session).images
+    return {"versions": versions, "bytes": reclaimable_bytes(images, [f"{repo}:{v}" for v in versions])}
+
+
+def collect_garbage(podman_session, repo: str, state_manager, keep_versions: int, keep_days: float,
+                    protected=()) -> Optional[dict]:
+    """
+    Action to remove the local versions of a repo the retention policy lets
+    go, under the repo's gc lock, and record the outcome in state.
+
+    Versions still used by a container are left in place and reported as failed.
+
+    Returns:
+        Optional[dict]: The recorded result (removed, bytes, failed), or
+        None if another collection for the repo holds the lock
+    """
+    from rapidctl.errors import PodmanAPIError
+    tasks = rapidctl.cli.tasks
+
+    fd = tasks.acquire_file_lock(tasks.gc_lock_path(repo))
+    if fd is None:
+        return None
+
+    try:
+        plan = plan_image_gc(podman_session, repo, state_manager, keep_versions, keep_days, protected)
+        # Sized from the list as it was before removals invalidate it
+        images = tasks.get_image_inventory(podman_session).images
+        removed, failed = [], []
+        for version in plan["versions"]:
+            try:
+                tasks.remove_image(podman_session, f"{repo}:{version}")
+                removed.append(version)
+            except PodmanAPIError:
+                failed.append(version)
+
+        reclaimed = reclaimable_bytes(images, [f"{repo}:{v}" for v in removed])
+        tasks.record_gc(state_manager, repo, removed, reclaimed, failed)
+        return tasks.get_last_gc(state_manager, repo)
+    finally:
+        tasks.release_file_lock(fd)
+
+
+def start_gc(podman_session, repo: str) -> bool:
+    """
+    Action to run garbage collection for a repo in a detached, low-priority process.
+
+    Returns:
+        bool: True if a collection process was started
+    """
+    argv = rapidctl.cli.tasks.build_gc_argv()
+    if not argv:
+        return False
+
+    # Only a cheap pre-check; the collection process takes the lock itself
+    fd = rapidctl.cli.tasks.acquire_file_lock(rapidctl.cli.tasks.gc_lock_path(repo))
+    if fd is None:
+        return False
+    rapidctl.cli.tasks.release_file_lock(fd)
+
+    rapidctl.cli.tasks.spawn_detached(argv)
+    return True
+
+
 def authenticate_to_registry(podman_session, image_name: str):
     """
     Action to prompt user for credentials and log in to the registry.
@@ -106,6 +277,10 @@ def authenticate_to_registry(podman_session, image_name: str):
     # Extract registry from image name
     import rapidctl.cli.tasks as tasks
     registry = tasks.extract_registry(image_name)
+
+    # A daemon can't prompt on the client's terminal; the client reruns the invocation itself
+    if "rapidctl.cli.daemon" in sys.modules:
+        sys.modules["rapidctl.cli.daemon"].require_local_process(f"login to {registry}")
             
     print(f"\n--- Registry Authentication Required for {registry} ---")
     username = input(f"Username: ")
@@ -120,46 +295,233 @@ def authenticate_to_registry(podman_session, image_name: str):
         return False
 
 
-def run_container_command(podman_session, image_name: str, command_path: str, args: List[str]):
+def prepare_container_command(podman_session, image_name: str, command_path: str, args: List[str]):
+    """
+    Action to create, but not start, the container that will run a command.
+    Lets container setup overlap with subcommand validation.
+    """
+    full_command = rapidctl.cli.tasks.build_container_command(command_path, args)
+    return podman_session.create_container(image_name, full_command)
+
+
+def discard_container(podman_session, container) -> None:
+    """Action to remove a prepared container that will not be run."""
+    podman_session.remove_container(container.id)
+
+
+def exec_container_argv(podman_session, image_name: str, full_command: List[str]) -> Optional[List[str]]:
+    """
+    Action to build the `podman run` argv the rest of the invocation is handed to.
+    The image is passed by its locally resolved ID so podman skips name
+    resolution. Returns None when the podman binary is missing or the
+    process is a daemon serving a forwarded request, which can't exec.
+    """
+    tasks = rapidctl.cli.tasks
+
+    podman_bin = tasks.find_podman_binary()
+    if not podman_bin:
+        return None
+    if "rapidctl.cli.daemon" in sys.modules and sys.modules["rapidctl.cli.daemon"].current_request():
+        return None
+
+    image_id = tasks.local_search(podman_session, image_name)
+    image_ref = image_id.split(":", 1)[-1] if image_id else image_name
+    return tasks.build_podman_run_argv(podman_bin, image_ref, full_command)
+
+
+def run_container_command(podman_session, image_name: str, command_path: str, args: List[str],
+                          container=None, exec_podman: bool = False):
     """
     Action to execute a command within a container.
-    Constructs the full path to the executable and runs it.
+    Constructs the full path to the executable and runs it, in `container`
+    when one was already created for this command. With exec_podman it
+    returns the `podman run` argv to replace the process with where
+    possible, so output never passes through Python; the caller execs it
+    with tasks.exec_podman() once the rest of the invocation has finished.
     """
-    import os
-    
     if not args:
         print("No command provided to execute.")
-        return
+        return None
 
-    # Subcommand is the first argument
-    sub_command = args[0]
-    
-    # Construct full path to the command inside the container
-    full_command_path = os.path.join(command_path, sub_command)
-    
-    # Combine with remaining arguments
-    full_command = [full_command_path] + args[1:]
+    full_command = rapidctl.cli.tasks.build_container_command(command_path, args)
+
+    if exec_podman and container is None:
+        argv = exec_container_argv(podman_session, image_name, full_command)
+        if argv:
+            profile.mark("container.exec_podman")
+            return argv
     
     # Run the container and stream output locally
-    output_stream = podman_session.run_container(image_name, full_command, stream=True)
+    if container is not None:
+        output_stream = podman_session.run_created_container(container, image_name, full_command, stream=True)
+    else:
+        output_stream = podman_session.run_container(image_name, full_command, stream=True)
+    first = True
     for line in output_stream:
+        if first:
+            profile.mark("container.first_byte")
+            first = False
         if isinstance(line, bytes):
             print(line.decode('utf-8'), end='')
         else:
             print(line, end='')
+    profile.mark("container.exit")
+
 
+def ensure_session_container(podman_session, image_name: str) -> str:
+    """
+    Action to get the warm session container for an image, creating it if needed.
+    A session container running a different image version is replaced.
 
-def get_container_subcommands(podman_session, image_name: str, command_path: str) -> dict:
+    Returns the container ID.
+    """
+    tasks = rapidctl.cli.tasks
+    name = tasks.session_container_name(image_name)
+
+    container = podman_session.get_container(name)
+    if container is not None:
+        if container.labels.get(tasks.SESSION_IMAGE_LABEL) == image_name and container.status == "running":
+            return container.id
+        podman_session.remove_container(container.id)
+
+    container = podman_session.create_session_container(
+        image_name,
+        name,
+        {tasks.SESSION_LABEL: "true", tasks.SESSION_IMAGE_LABEL: image_name}
+    )
+    return container.id
+
+
+def reap_idle_sessions(podman_session, state_manager, idle_timeout: int) -> List[str]:
+    """
+    Action to remove session containers that have been idle longer than idle_timeout.
+    Sweeps at most once per SESSION_SWEEP_INTERVAL; returns the names removed.
+    """
+    import time
+    tasks = rapidctl.cli.tasks
+
+    if not state_manager:
+        return []
+
+    now = time.time()
+    last_sweep = state_manager.get_state("session_sweep") or 0
+    if now - last_sweep < tasks.SESSION_SWEEP_INTERVAL:
+        return []
+    state_manager.set_state("session_sweep", now)
+    # Pick up the last-used times other invocations have written since this one started
+    state_manager.reload()
+
+    reaped = []
+    for container in podman_session.list_session_containers(tasks.SESSION_LABEL):
+        last_used = tasks.get_session_last_used(state_manager, container.name)
+        if last_used is None:
+            # Unknown to this state file; start its idle clock now
+            tasks.touch_session(state_manager, container.name)
+        elif now - last_used > idle_timeout:
+            podman_session.remove_container(container.id)
+            state_manager.delete_state(f"session_{container.name}")
+            reaped.append(container.name)
+    return reaped
+
+
+def run_session_command(podman_session, image_name: str, command_path: str, args: List[str],
+                        state_manager=None, idle_timeout: int = 600, container_id: Optional[str] = None):
+    """
+    Action to execute a command in the warm session container for an image.
+    Only the first command pays for container startup; later ones use exec.
+    Pass container_id when the session container was already ensured.
+    """
+    from rapidctl.errors import PodmanAPIError
+    tasks = rapidctl.cli.tasks
+
+    if not args:
+        print("No command provided to execute.")
+        return
+
+    reap_idle_sessions(podman_session, state_manager, idle_timeout)
+    if container_id is None:
+        container_id = ensure_session_container(podman_session, image_name)
+
+    # Written through before the command starts, so a sweep in another
+    # invocation never takes the session for idle while it runs
+    session_name = tasks.session_container_name(image_name)
+    tasks.touch_session(state_manager, session_name, flush=True)
+
+    full_command = tasks.build_container_command(command_path, args)
+    exec_id, output_stream = podman_session.start_exec(container_id, full_command)
+    first = True
+    for chunk in output_stream:
+        if first:
+            profile.mark("container.first_byte")
+            first = False
+        print(chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk, end='')
+    profile.mark("container.exit")
+
+    tasks.touch_session(state_manager, session_name)
+
+    exit_code = podman_session.exec_exit_code(exec_id)
+    if exit_code:
+        raise PodmanAPIError(f"Command exited with status {exit_code}")
+
+
+def get_cached_container_subcommands(podman_session, image_name: str, command_path: str,
+                                    state_manager=None) -> Optional[dict]:
+    """
+    Action to get subcommands from the cache only, never starting discovery.
+    Returns None when the image is not present locally or nothing is cached.
+    """
+    if not state_manager:
+        return None
+    image_id = rapidctl.cli.tasks.local_search(podman_session, image_name)
+    return rapidctl.cli.tasks.get_cached_subcommands(state_manager, image_id, command_path)
+
+
+@profile.timed("subcommands")
+def get_container_subcommands(podman_session, image_name: str, command_path: str, state_manager=None) -> dict:
+    """
+    Action to get available subcommands and their descriptions.
+    Serves the map from the cache keyed by the local image ID when possible,
+    so only the first lookup for an image starts a container.
+    """
+    image_id = rapidctl.cli.tasks.local_search(podman_session, image_name) if state_manager else None
+
+    cached = rapidctl.cli.tasks.get_cached_subcommands(state_manager, image_id, command_path)
+    if cached is not None:
+        return cached
+
+    commands = discover_container_subcommands(podman_session, image_name, command_path)
+
+    # Empty results usually mean discovery failed, so they are not cached
+    if commands:
+        rapidctl.cli.tasks.cache_subcommands(state_manager, image_id, command_path, commands)
+    return commands
+
+
+def discover_container_subcommands(podman_session, image_name: str, command_path: str) -> dict:
     """
     Action to discover available subcommands and their descriptions.
     Tries to read commands.json from the parent directory of command_path,
-    falling back to listing files.
+    falling back to listing files. Both are read from the image filesystem
+    first, and only run in a container if that is not possible.
     """
     import os
-    import json
     
     base_path = os.path.dirname(command_path.rstrip('/'))
     json_path = os.path.join(base_path, "commands.json")
+
+    try:
+        raw, listing = rapidctl.cli.tasks.read_image_paths(
+            podman_session,
+            image_name,
+            json_path,
+            command_path
+        )
+        if raw:
+            return rapidctl.cli.tasks.parse_commands_metadata(raw.decode('utf-8'))
+        if listing:
+            return {cmd: "" for cmd in listing}
+    except Exception:
+        pass # Fallback to running the lookups in a container
     
     try:
         output = rapidctl.cli.tasks.run_command_capture(
@@ -168,11 +530,7 @@ def get_container_subcommands(podman_session, image_name: str, command_path: str
             ["cat", json_path]
         )
         if output:
-            metadata = json.loads("\n".join(output))
-            result = {}
-            for cmd, info in metadata.items():
-                result[cmd] = info.get("summary", "")
-            return result
+            return rapidctl.cli.tasks.parse_commands_metadata("\n".join(output))
     except Exception:
         pass # Fallback to ls -1
         
@@ -187,11 +545,12 @@ def get_container_subcommands(podman_session, image_name: str, command_path: str
         print(f"Warning: Could not discover subcommands in container: {e}")
         return {}
 
-def display_available_commands(podman_session, container_version, command_path, header: str) -> None:
+def display_available_commands(podman_session, container_version, command_path, header: str,
+                               state_manager=None) -> None:
     """Action to discover and print available commands for a container."""
     from rapidctl.cli.tasks import format_command_list
     
-    available_cmds = get_container_subcommands(podman_session, container_version, command_path)
+    available_cmds = get_container_subcommands(podman_session, container_version, command_path, state_manager)
     print(header)
     if available_cmds:
         print(format_command_list(available_cmds))
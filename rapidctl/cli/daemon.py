@@ -0,0 +1,429 @@
+"""
+Resident per-user daemon serving CLI invocations over a local unix socket.
+
+The daemon keeps the PodmanCLI connection, image inventory, subcommand
+cache and warm session containers alive between invocations. The CLI
+wrapper forwards argv and its rapidctl settings to it and relays the
+output back, falling back to the in-process path when no daemon is
+listening, or for invocations that need the terminal or stdin.
+
+Protocol: the client sends one JSON line with the request; the daemon
+replies with JSON lines of output frames followed by an exit frame.
+"""
+
+import contextvars
+import hashlib
+import io
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Environment that decides which Podman the daemon talks to; requests
+# disagreeing with the daemon on these are run in-process instead
+CONNECTION_ENV = ("PODMAN_SOCKET",)
+# Prefix of the settings a CtlClient reads from the environment when it is
+# built. Only these are forwarded; they too must match the daemon's own.
+SETTINGS_ENV_PREFIX = "RAPIDCTL_"
+# Settings applied per request rather than fixed when the daemon started
+PER_REQUEST_ENV = ("RAPIDCTL_PROFILE",)
+
+
+class LocalProcessRequired(SystemExit):
+    """
+    Raised while serving a forwarded request that needs the client's own
+    terminal, such as a registry login prompt. The daemon answers with a
+    fallback frame and the client reruns the invocation in-process. Like
+    sys.exit(), it passes through handlers of ordinary errors.
+    """
+
+
+class _RequestContext:
+    """The forwarded request being served, and the streams its output goes to."""
+
+    def __init__(self, data: Dict[str, Any], stdout, stderr):
+        self.data = data
+        self.stdout = stdout
+        self.stderr = stderr
+
+
+# A context variable rather than a thread-local, so pipeline workers started
+# while serving a request keep writing to that request's client
+_request: contextvars.ContextVar = contextvars.ContextVar("rapidctl_request", default=None)
+
+
+def socket_path(client_obj) -> Path:
+    """
+    Per-user daemon socket path for a tool, keyed by its container repo.
+
+    Returns:
+        Path: Socket inside XDG_RUNTIME_DIR, or ~/.rapidctl/run as a fallback
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    base = Path(runtime_dir) / "rapidctl" if runtime_dir else Path.home() / ".rapidctl" / "run"
+    # Hash the repo to keep the path well inside the unix socket length limit
+    digest = hashlib.sha256(str(client_obj.container_repo).encode()).hexdigest()[:16]
+    return base / f"{digest}.sock"
+
+
+def current_request() -> Optional[Dict[str, Any]]:
+    """The request being served in this context, or None outside the daemon."""
+    context = _request.get()
+    return context.data if context else None
+
+
+def require_local_process(reason: str) -> None:
+    """Hand the request being served back to its client; does nothing outside the daemon."""
+    if current_request() is not None:
+        raise LocalProcessRequired(reason)
+
+
+def forwarded_env(env) -> Dict[str, str]:
+    """The part of an environment that a forwarded request carries."""
+    return {
+        name: value for name, value in env.items()
+        if name in CONNECTION_ENV or name.startswith(SETTINGS_ENV_PREFIX)
+    }
+
+
+def _settings_differ(env: Dict[str, str]) -> bool:
+    """Whether a request's environment disagrees with the settings the daemon runs with."""
+    ours = forwarded_env(os.environ)
+    names = (set(env) | set(ours)) - set(PER_REQUEST_ENV)
+    return any(env.get(name) != ours.get(name) for name in names)
+
+
+def getenv(name: str, default: Optional[str] = None) -> Optional[str]:
+    """Read an environment variable from the forwarded request, or the process env."""
+    request = current_request()
+    if request is not None:
+        return request.get("env", {}).get(name, default)
+    return os.environ.get(name, default)
+
+
+class _FrameWriter(io.TextIOBase):
+    """Text stream that sends each write to the client as an output frame."""
+
+    def __init__(self, wfile, name: str, lock: threading.Lock):
+        self._wfile = wfile
+        self._name = name
+        self._lock = lock
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: str) -> int:
+        if data:
+            _send(self._wfile, {"stream": self._name, "data": data}, self._lock)
+        return len(data)
+
+
+class _ThreadRouter(io.TextIOBase):
+    """
+    Stand-in for sys.stdout / sys.stderr that routes writes per request.
+    Code serving a request writes to that request's client; anything else
+    writes to the daemon's own stream.
+    """
+
+    def __init__(self, default, name: str):
+        self._default = default
+        self._name = name
+
+    def _target(self):
+        context = _request.get()
+        return getattr(context, self._name) if context else self._default
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: str) -> int:
+        return self._target().write(data)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+
+class _SkipShown(io.TextIOBase):
+    """
+    Stand-in for sys.stdout / sys.stderr while an invocation the daemon
+    handed back is rerun in-process. Output repeating what the daemon
+    already showed is dropped; from the first difference on, everything
+    is written.
+    """
+
+    def __init__(self, stream, shown: str):
+        self._stream = stream
+        self._shown = shown
+
+    def writable(self) -> bool:
+        return True
+
+    def isatty(self) -> bool:
+        return self._stream.isatty()
+
+    def fileno(self) -> int:
+        return self._stream.fileno()
+
+    def write(self, data: str) -> int:
+        if not self._shown:
+            return self._stream.write(data)
+        matched = len(os.path.commonprefix([self._shown, data]))
+        if matched == len(data):
+            self._shown = self._shown[matched:]
+            return len(data)
+        self._shown = ""
+        self._stream.write(data[matched:])
+        return len(data)
+
+    def flush(self) -> None:
+        self._stream.flush()
+
+
+def _send(wfile, frame: Dict[str, Any], lock: Optional[threading.Lock] = None) -> None:
+    """Write one JSON frame to a socket file."""
+    payload = (json.dumps(frame) + "\n").encode('utf-8')
+    if lock:
+        with lock:
+            wfile.write(payload)
+            wfile.flush()
+    else:
+        wfile.write(payload)
+        wfile.flush()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Serve one forwarded CLI invocation."""
+
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line:
+            return
+        request = json.loads(line)
+
+        if request.get("control") == "stop":
+            _send(self.wfile, {"exit": 0})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+
+        if _settings_differ(request.get("env", {})):
+            _send(self.wfile, {"fallback": True})
+            return
+
+        lock = threading.Lock()
+        token = _request.set(_RequestContext(
+            request,
+            _FrameWriter(self.wfile, "stdout", lock),
+            _FrameWriter(self.wfile, "stderr", lock),
+        ))
+        try:
+            code = self.server.run_invocation(request.get("argv", []))
+        except LocalProcessRequired:
+            _send(self.wfile, {"fallback": True}, lock)
+            return
+        finally:
+            _request.reset(token)
+        _send(self.wfile, {"exit": code}, lock)
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded unix socket server holding one tool's warm CLI state."""
+
+    daemon_threads = True
+
+    def __init__(self, path: Path, client_obj):
+        self.client_obj = client_obj
+        self.cli = client_obj.cli or client_obj.connect()
+        super().__init__(str(path), _RequestHandler)
+
+    def run_invocation(self, argv: List[str]) -> int:
+        """Run one invocation in-process and return its exit code."""
+        from rapidctl.cli import main
+        from rapidctl.utils import profile
+
+        profile.start(getenv("RAPIDCTL_PROFILE"))
+        try:
+            return self._run(main, argv)
+        finally:
+            profile.finish()
+
+    def _run(self, main, argv: List[str]) -> int:
+        """Run main.run(), translating SystemExit and errors into an exit code."""
+        # While the events listener runs the snapshot is already current;
+        # otherwise re-validate the fingerprinted persistent cache, which is
+        # cheap and picks up changes made outside the daemon
+        if not self.cli.inventory.watching:
+            self.cli.inventory.invalidate(persisted=False)
+        state_manager = self.client_obj.state_manager
+        state_manager.reload()
+        self.client_obj.forget_resolved_version()
+        try:
+            main.run(self.client_obj, self.cli, argv)
+        except LocalProcessRequired:
+            raise
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                return e.code or 0
+            print(e.code, file=sys.stderr)
+            return 1
+        except Exception as e:
+            print(f"CRITICAL ERROR: {e}")
+            return 1
+        finally:
+            # The daemon may be killed rather than exit, so never leave state buffered
+            state_manager.flush()
+        return 0
+
+
+def _reap_sessions(server: DaemonServer, stop: threading.Event) -> None:
+    """Periodically remove idle session containers while the daemon runs."""
+    import rapidctl.cli.actions as actions
+    from rapidctl.cli.tasks import SESSION_SWEEP_INTERVAL
+
+    client_obj = server.client_obj
+    while not stop.wait(SESSION_SWEEP_INTERVAL):
+        try:
+            actions.reap_idle_sessions(server.cli, client_obj.state_manager, client_obj.session_idle_timeout)
+        except Exception:
+            pass # Best effort; the next sweep retries
+
+
+def run_daemon(client_obj, path: Optional[Path] = None) -> None:
+    """
+    Serve CLI invocations for a tool until stopped.
+
+    Args:
+        client_obj: Configured CtlClient for the tool
+        path: Socket path override, defaults to socket_path(client_obj)
+    """
+    path = path or socket_path(client_obj)
+    path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+    if path.exists():
+        path.unlink()
+
+    # The socket is created owner-only by bind() itself, leaving no window
+    # in which another user could connect before its mode is set
+    umask = os.umask(0o077)
+    try:
+        server = DaemonServer(path, client_obj)
+    finally:
+        os.umask(umask)
+
+    original_stdout, original_stderr = sys.stdout, sys.stderr
+    sys.stdout = _ThreadRouter(original_stdout, "stdout")
+    sys.stderr = _ThreadRouter(original_stderr, "stderr")
+
+    stop = threading.Event()
+    server.cli.inventory.watch()
+    if client_obj.session_mode:
+        threading.Thread(target=_reap_sessions, args=(server, stop), daemon=True).start()
+
+    print(f"rapidctl daemon listening on {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.cli.inventory.stop_watching()
+        server.server_close()
+        sys.stdout, sys.stderr = original_stdout, original_stderr
+        if path.exists():
+            path.unlink()
+
+
+def _connect(path: Path) -> Optional[socket.socket]:
+    """Connect to a daemon socket, or None if no daemon is listening."""
+    if not path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def _stdin_has_input() -> bool:
+    """Whether stdin is a pipe, file or socket the command might read from."""
+    try:
+        mode = os.fstat(sys.stdin.fileno()).st_mode
+    except (AttributeError, OSError, ValueError):
+        return False
+    return stat.S_ISFIFO(mode) or stat.S_ISREG(mode) or stat.S_ISSOCK(mode)
+
+
+def needs_local_process(client_obj) -> bool:
+    """
+    Whether an invocation must run in the invoking process: the daemon
+    never sees the client's stdin, and can't hand its terminal to podman.
+    """
+    if _stdin_has_input():
+        return True
+    return bool(client_obj.exec_mode) and sys.stdin.isatty()
+
+
+def forward(client_obj, argv: List[str], path: Optional[Path] = None) -> Optional[int]:
+    """
+    Forward an invocation to the tool's daemon and relay its output.
+
+    Args:
+        client_obj: Configured CtlClient for the tool
+        argv: Arguments after the program name
+        path: Socket path override, defaults to socket_path(client_obj)
+
+    Returns:
+        Optional[int]: The exit code, or None if the caller should run the
+        invocation in-process (no daemon, it needs stdin or the terminal, or
+        the daemon declined it)
+    """
+    if needs_local_process(client_obj):
+        return None
+    sock = _connect(path or socket_path(client_obj))
+    if sock is None:
+        return None
+
+    request = {"argv": argv, "env": forwarded_env(os.environ)}
+    shown = {"stdout": "", "stderr": ""}
+    with sock, sock.makefile('rwb') as stream:
+        try:
+            _send(stream, request)
+            for line in stream:
+                frame = json.loads(line)
+                if frame.get("fallback"):
+                    # Handed back part way, e.g. for a login prompt during a
+                    # pull: the rerun doesn't show the same output again
+                    sys.stdout = _SkipShown(sys.stdout, shown["stdout"])
+                    sys.stderr = _SkipShown(sys.stderr, shown["stderr"])
+                    return None
+                if "exit" in frame:
+                    return frame["exit"]
+                name = "stderr" if frame.get("stream") == "stderr" else "stdout"
+                data = frame.get("data", "")
+                shown[name] += data
+                target = getattr(sys, name)
+                target.write(data)
+                target.flush()
+        except (OSError, ValueError):
+            pass
+
+    if not any(shown.values()):
+        return None
+    print("✗ Lost connection to the rapidctl daemon.", file=sys.stderr)
+    return 1
+
+
+def stop(client_obj, path: Optional[Path] = None) -> bool:
+    """Ask a running daemon to shut down; returns False if none was running."""
+    sock = _connect(path or socket_path(client_obj))
+    if sock is None:
+        return False
+    with sock, sock.makefile('rwb') as stream:
+        _send(stream, {"control": "stop"})
+        stream.readline()
+    return True
@@ -0,0 +1,473 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from rapidctl.bootstrap.state import NEGATIVE_CACHE_TTL
+from rapidctl.errors import PodmanAPIError
+from rapidctl.utils.version import VersionIndex
+
+logger = logging.getLogger(__name__)
+
+# Cache lifetime when the image store can't be fingerprinted
+IMAGE_CACHE_TTL = 300
+# Cache lifetime when a store fingerprint guards against stale data
+FINGERPRINTED_IMAGE_CACHE_TTL = 86400
+# Seconds past its TTL an image list is still served while it is refreshed
+IMAGE_CACHE_GRACE = 3600
+# Lifetime of the record that a tag was missing from a full image listing
+ABSENT_IMAGE_CACHE_TTL = NEGATIVE_CACHE_TTL
+
+# Seconds of events replayed before the last sync, to tolerate clock skew
+# with the Podman host; applying an event twice is harmless
+EVENT_CLOCK_SKEW = 5
+# Seconds to wait before reconnecting a dropped events stream
+EVENT_RETRY_INTERVAL = 5
+
+# Format of the persisted version indexes; bump it whenever version ordering
+# changes so indexes sorted by an older release are rebuilt rather than bisected
+VERSION_INDEX_FORMAT = 1
+
+# Image event actions by their effect on the image list
+_ADDING_ACTIONS = {"pull", "tag", "load", "import"}
+_REMOVING_ACTIONS = {"remove", "delete"}
+_IGNORED_ACTIONS = {"push", "save", "mount", "unmount", "exists", "cleanup"}
+
+
+def absent_image_key(image_tag: str) -> str:
+    """Cache key of the negative entry recording that image_tag is not local."""
+    return f"image_absent_{image_tag}"
+
+
+def split_image_tag(image_tag: str) -> Tuple[str, str]:
+    """
+    Split a full image reference into its repository and tag parts.
+
+    Args:
+        image_tag: Image reference such as 'registry:5000/repo/image:1.0'
+
+    Returns:
+        tuple: (repository, tag), with the tag defaulting to 'latest'
+    """
+    repo, sep, tag = image_tag.rpartition(':')
+    # A colon before the last '/' belongs to a registry port, not a tag
+    if not sep or '/' in tag:
+        return image_tag, "latest"
+    return repo, tag
+
+
+def summarize_image(img) -> Dict[str, Any]:
+    """
+    Reduce a podman image object to a plain, JSON serializable dict.
+
+    Args:
+        img: Image object as returned by PodmanCLI.list_images()
+
+    Returns:
+        dict: id, short_id, tags, created and size of the image
+    """
+    attrs = getattr(img, "attrs", None)
+    if not isinstance(attrs, dict):
+        attrs = {}
+
+    return {
+        "id": img.id,
+        "short_id": getattr(img, 'short_id', img.id[:12] if img.id else ''),
+        "tags": list(getattr(img, 'tags', None) or []),
+        "created": attrs.get("Created"),
+        "size": attrs.get("Size"),
+    }
+
+
+def _normalize_id(image_id: str) -> str:
+    return image_id[len("sha256:"):] if image_id.startswith("sha256:") else image_id
+
+
+def apply_image_events(entries: List[Dict[str, Any]], events: Iterable[Dict[str, Any]],
+                       lookup: Callable[[str], Optional[Dict[str, Any]]]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Apply Podman image events to a list of image entries.
+
+    Untag and remove events are applied directly. Images that were pulled,
+    tagged, loaded or imported are looked up once each, after every event
+    has been applied, so a burst of changes to one image costs one call.
+
+    Args:
+        entries: Image summary dicts to start from; left unmodified
+        events: Decoded events from Podman, oldest first
+        lookup: Returns the summary dict for an image ID or reference,
+            or None if it can't be found
+
+    Returns:
+        Optional[list]: The updated entries, or None if an event could not
+        be applied and the list has to be fetched in full
+    """
+    by_id = {_normalize_id(entry["id"]): dict(entry, tags=list(entry.get("tags") or [])) for entry in entries}
+    changed: Dict[str, None] = {}
+
+    for event in events:
+        action = event.get("Action") or event.get("status")
+        actor = event.get("Actor") or {}
+        image_id = _normalize_id(actor.get("ID") or event.get("id") or "")
+        name = (actor.get("Attributes") or {}).get("name")
+
+        if action in _IGNORED_ACTIONS:
+            continue
+        if action in _REMOVING_ACTIONS:
+            by_id.pop(image_id, None)
+            changed.pop(image_id, None)
+        elif action == "untag" or action in _ADDING_ACTIONS:
+            # A tag belongs to one image, so it moves off whichever image held it
+            if name:
+                for entry in by_id.values():
+                    if name in entry["tags"]:
+                        entry["tags"].remove(name)
+            if action != "untag":
+                changed[image_id or name] = None
+        else:
+            return None
+
+    for ref in changed:
+        if not ref:
+            return None
+        summary = lookup(ref)
+        if summary is None:
+            return None
+        by_id[_normalize_id(summary["id"])] = summary
+    return list(by_id.values())
+
+
+class ImageInventory:
+    """
+    Snapshot of the local image store shared by every phase of one invocation.
+
+    The image list is fetched from Podman at most once and indexed by full
+    tag and by repository. Anything that changes the image store (such as
+    pulling an image) must call invalidate() so the next lookup refetches.
+
+    With a state manager the list is also kept in the persistent
+    'podman_images' cache, which is reused across invocations for as long
+    as the image store fingerprint is unchanged. Once its TTL passes the
+    list is still served for a grace window while a background refresh
+    brings it up to date.
+
+    Outdated lists are caught up from the Podman events log where it is
+    available, applying only the images that changed since the last sync
+    instead of listing every image again. Long-running processes (the
+    daemon and MCP server) can also watch() the events stream to keep the
+    snapshot current as changes happen.
+
+    Each repository's tags are also kept in a VersionIndex sorted by
+    version, persisted with the image list. When the image list changes
+    only the tags that were added or removed are bisected into it, so the
+    index is not re-sorted on every invocation.
+    """
+
+    def __init__(self, podman_session, state_manager=None):
+        """
+        Initialize an empty inventory.
+
+        Args:
+            podman_session: PodmanCLI instance used to list images on demand
+            state_manager: Optional StateManager backing the persistent cache
+        """
+        self.podman_session = podman_session
+        self.state_manager = state_manager
+        self._images: Optional[List[Dict[str, Any]]] = None
+        # Guards loading when several threads share a session (e.g. the daemon)
+        self._lock = threading.RLock()
+        self._by_tag: Dict[str, Dict[str, Any]] = {}
+        self._by_repo: Dict[str, List[str]] = {}
+        # Kept across invalidate() as the base the next snapshot is diffed against
+        self._versions: Optional[Dict[str, VersionIndex]] = None
+        # Set while watch() is connected to the events stream
+        self.watching = False
+        self._stop_watching = threading.Event()
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the image list has been fetched for this invocation."""
+        return self._images is not None
+
+    @property
+    def images(self) -> List[Dict[str, Any]]:
+        """All local images as summary dicts, fetching them on first access."""
+        self._ensure_loaded()
+        return self._images
+
+    def _ensure_loaded(self) -> None:
+        """Fetch and index the image list if this inventory has no snapshot yet."""
+        if self._images is not None:
+            return
+
+        with self._lock:
+            if self._images is not None:
+                return
+            entries = self._load_cached()
+            if entries is None:
+                entries = self._refresh()
+            self._index(entries)
+
+    def _load_cached(self) -> Optional[List[Dict[str, Any]]]:
+        """Return the persisted image list if it still matches the image store."""
+        if not self.state_manager:
+            return None
+
+        # The stored fingerprint is '' for an unobservable store and missing once invalidated.
+        # Check it first so a list known to be outdated is not refreshed twice.
+        stored = self.state_manager.get_cache("podman_images_fingerprint", allow_stale=True)
+        if stored is None:
+            return None
+        fingerprint = self.podman_session.image_store_fingerprint()
+        if fingerprint is not None and fingerprint != stored:
+            return None
+
+        cached = self.state_manager.get_cache("podman_images", refresh=self._refresh)
+        return cached if isinstance(cached, list) else None
+
+    def _refresh(self) -> List[Dict[str, Any]]:
+        """Bring the persisted image list up to date, from the events log when possible."""
+        entries = self._catch_up()
+        return entries if entries is not None else self._fetch()
+
+    def _catch_up(self) -> Optional[List[Dict[str, Any]]]:
+        """Apply the events logged since the persisted list was synced, if possible."""
+        if not self.state_manager:
+            return None
+        base = self.state_manager.get_cache("podman_images", allow_stale=True)
+        synced = self.state_manager.get_cache("podman_images_synced", allow_stale=True)
+        if not isinstance(base, list) or not isinstance(synced, (int, float)):
+            return None
+        if not self.podman_session.events_available():
+            return None
+
+        fingerprint = self.podman_session.image_store_fingerprint()
+        # Events are always streamed; an 'until' not in the future has the
+        # server close the stream at once. Events later in this second are
+        # replayed next time, since catch-up starts EVENT_CLOCK_SKEW earlier.
+        until = int(time.time())
+        try:
+            events = self.podman_session.image_events(since=int(synced) - EVENT_CLOCK_SKEW, until=until)
+        except PodmanAPIError as e:
+            logger.debug(f"Falling back to a full image listing: {e}")
+            return None
+
+        entries = apply_image_events(base, events, self._lookup)
+        if entries is not None:
+            self._persist(entries, fingerprint, until)
+        return entries
+
+    def _lookup(self, ref: str) -> Optional[Dict[str, Any]]:
+        """Summary of a single image, or None if it can't be found."""
+        try:
+            return summarize_image(self.podman_session.get_image(ref))
+        except PodmanAPIError:
+            return None
+
+    def _fetch(self) -> List[Dict[str, Any]]:
+        """List images from Podman and refresh the persistent cache."""
+        # Fingerprint before listing so changes made mid-listing invalidate next time
+        fingerprint = self.podman_session.image_store_fingerprint() if self.state_manager else None
+        synced = time.time()
+        entries = [summarize_image(img) for img in self.podman_session.list_images()]
+        self._persist(entries, fingerprint, synced)
+        return entries
+
+    def _persist(self, entries: List[Dict[str, Any]], fingerprint: Optional[str], synced: float) -> None:
+        """Store the image list with the fingerprint and time it was taken at."""
+        if not self.state_manager:
+            return
+        ttl = FINGERPRINTED_IMAGE_CACHE_TTL if fingerprint else IMAGE_CACHE_TTL
+        # Each cache entry is its own atomic file. The fingerprint is what marks
+        # the list valid, so it goes last: an interrupted persist leaves the
+        # old one, which the store no longer matches, and the list is redone.
+        self.state_manager.set_cache("podman_images", entries, ttl=ttl, grace=IMAGE_CACHE_GRACE)
+        self.state_manager.set_cache("podman_images_synced", synced, ttl=ttl, grace=IMAGE_CACHE_GRACE)
+        self.state_manager.set_cache("podman_images_fingerprint", fingerprint or "", ttl=ttl,
+                                     grace=IMAGE_CACHE_GRACE)
+
+    def watch(self) -> threading.Thread:
+        """
+        Follow the Podman events stream on a daemon thread, applying each
+        image change to the snapshot and the persisted list as it happens.
+
+        Returns:
+            threading.Thread: The listener thread; stop it with stop_watching()
+        """
+        self._stop_watching.clear()
+        thread = threading.Thread(target=self._follow_events, name="rapidctl-image-events", daemon=True)
+        thread.start()
+        return thread
+
+    def stop_watching(self) -> None:
+        """Stop the events listener once its current event has been handled."""
+        self._stop_watching.set()
+
+    def _follow_events(self) -> None:
+        while not self._stop_watching.is_set():
+            started = int(time.time())
+            try:
+                # Catch up first, then replay from before it so nothing in between is missed
+                with self._lock:
+                    self._index(self._refresh())
+                self.watching = True
+                for event in self.podman_session.stream_image_events(since=started - EVENT_CLOCK_SKEW):
+                    if self._stop_watching.is_set():
+                        break
+                    self._apply_live_event(event)
+            except Exception as e:
+                logger.warning(f"Image events stream interrupted: {e}")
+            finally:
+                self.watching = False
+            self._stop_watching.wait(EVENT_RETRY_INTERVAL)
+
+    def _apply_live_event(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            entries = None
+            if self._images is not None:
+                entries = apply_image_events(self._images, [event], self._lookup)
+            if entries is None:
+                entries = self._refresh()
+            else:
+                fingerprint = self.podman_session.image_store_fingerprint() if self.state_manager else None
+                self._persist(entries, fingerprint, event.get("time") or time.time())
+            self._index(entries)
+
+    def _index(self, entries: List[Dict[str, Any]]) -> None:
+        """Build the tag and repository indexes for a list of image entries."""
+        by_tag: Dict[str, Dict[str, Any]] = {}
+        by_repo: Dict[str, List[str]] = {}
+
+        for entry in entries:
+            for image_tag in entry.get("tags") or []:
+                by_tag[image_tag] = entry
+                repo, tag = split_image_tag(image_tag)
+                by_repo.setdefault(repo, []).append(tag)
+
+        # Deduplicate per-repo tags while keeping first-seen order
+        self._by_repo = {repo: list(dict.fromkeys(tags)) for repo, tags in by_repo.items()}
+        self._by_tag = by_tag
+        self._versions = self._update_versions(self._by_repo)
+        self._images = entries
+
+    def _update_versions(self, by_repo: Dict[str, List[str]]) -> Dict[str, VersionIndex]:
+        """Bring the per-repo version indexes in line with by_repo, persisting any change."""
+        base = self._versions if self._versions is not None else self._load_versions()
+        versions = {}
+        for repo, tags in by_repo.items():
+            previous = base.get(repo)
+            versions[repo] = previous.updated(tags) if previous is not None else VersionIndex(tags)
+
+        changed = versions.keys() != base.keys() or any(versions[repo] is not base[repo] for repo in versions)
+        if changed and self.state_manager:
+            self.state_manager.set_cache(
+                "podman_version_index",
+                {"format": VERSION_INDEX_FORMAT, "repos": {repo: list(index) for repo, index in versions.items()}},
+                ttl=FINGERPRINTED_IMAGE_CACHE_TTL, grace=IMAGE_CACHE_GRACE
+            )
+        return versions
+
+    def _load_versions(self) -> Dict[str, VersionIndex]:
+        """The persisted version indexes, or none if there are no usable ones."""
+        if not self.state_manager:
+            return {}
+        stored = self.state_manager.get_cache("podman_version_index", allow_stale=True)
+        if not isinstance(stored, dict) or stored.get("format") != VERSION_INDEX_FORMAT:
+            return {}
+        return {repo: VersionIndex(tags, presorted=True) for repo, tags in stored["repos"].items()}
+
+    def find(self, image_tag: str) -> Optional[str]:
+        """
+        Look up a local image by its full tag.
+
+        Args:
+            image_tag: Full image reference, e.g. 'docker.io/org/tool:1.0.0'
+
+        Returns:
+            Optional[str]: The image ID if present locally, else None
+        """
+        if self._images is None and self._known_absent(image_tag):
+            return None
+        self._ensure_loaded()
+        entry = self._by_tag.get(image_tag)
+        if entry is None and self.state_manager:
+            # Spares pull and retry loops, and the next invocations, another listing
+            stored = self.state_manager.get_cache("podman_images_fingerprint", allow_stale=True)
+            if stored is not None:
+                self.state_manager.set_cache(absent_image_key(image_tag), stored, ttl=ABSENT_IMAGE_CACHE_TTL)
+        return entry["id"] if entry else None
+
+    def _known_absent(self, image_tag: str) -> bool:
+        """
+        Whether a recent listing showed the tag missing from the image store
+        as it still is. The record is tied to the persisted list's
+        fingerprint, so invalidate() or any change to the store voids it.
+        """
+        if not self.state_manager:
+            return False
+        recorded = self.state_manager.get_cache(absent_image_key(image_tag))
+        if recorded is None:
+            return False
+        stored = self.state_manager.get_cache("podman_images_fingerprint", allow_stale=True)
+        if stored != recorded:
+            return False
+        fingerprint = self.podman_session.image_store_fingerprint()
+        return fingerprint is None or fingerprint == stored
+
+    def entry(self, image_tag: str) -> Optional[Dict[str, Any]]:
+        """
+        Summary of a local image by its full tag.
+
+        Returns:
+            Optional[dict]: id, short_id, tags, created and size, or None if not local
+        """
+        self._ensure_loaded()
+        return self._by_tag.get(image_tag)
+
+    def tags_for_repo(self, repo: str) -> List[str]:
+        """
+        Return the tag parts of every local image belonging to a repository.
+
+        Args:
+            repo: Repository path without a tag
+
+        Returns:
+            List[str]: Tags in the order they were first seen
+        """
+        self._ensure_loaded()
+        return list(self._by_repo.get(repo, []))
+
+    def versions_for_repo(self, repo: str) -> VersionIndex:
+        """
+        Return the version index of a repository's local tags.
+
+        Args:
+            repo: Repository path without a tag
+
+        Returns:
+            VersionIndex: The repository's tags sorted by version, empty
+            if it has no local images
+        """
+        self._ensure_loaded()
+        return self._versions.get(repo) or VersionIndex()
+
+    def invalidate(self, persisted: bool = True, image_tag: Optional[str] = None) -> None:
+        """
+        Drop the snapshot so the next lookup fetches a fresh image list.
+
+        Args:
+            persisted: Also mark the persisted copy outdated, so the next
+                lookup catches it up. Pass False to only re-validate the
+                persistent cache on the next lookup.
+            image_tag: A tag that has just been added, whose negative
+                entry is dropped as well
+        """
+        if persisted and self.state_manager:
+            # The list itself is kept as the base for catching up from events
+            self.state_manager.clear_cache("podman_images_fingerprint")
+        if image_tag and self.state_manager:
+            self.state_manager.clear_cache(absent_image_key(image_tag))
+        with self._lock:
+            self._images = None
+            self._by_tag = {}
+            self._by_repo = {}
@@ -1,34 +1,246 @@
+import logging
+import os
 import sys
+import threading
+import time
+from typing import List, Optional
 from rapidctl.cli import PodmanCLI
 import rapidctl.cli.actions as actions
+import rapidctl.cli.tasks as tasks
+from rapidctl.cli.pipeline import Pipeline
+from rapidctl.utils import profile
 
-def _check_and_notify_updates(client_obj) -> None:
+logger = logging.getLogger(__name__)
+
+# Reserved commands that must run in the invoking process, never the daemon
+LOCAL_ONLY_COMMANDS = (tasks.DAEMON_FLAG, "mcp", tasks.PREFETCH_FLAG)
+# Reserved commands that get no update check or notices: servers own stdout,
+# and gc mostly runs detached with its output discarded, where printing the
+# gc result would mark it reported unseen
+QUIET_COMMANDS = LOCAL_ONLY_COMMANDS + ("gc",)
+
+def _fresh_update_check(client_obj) -> Optional[dict]:
+    """The last update check for the current baseline, if it is within the check interval."""
+    last = tasks.get_last_update_check(client_obj.state_manager, client_obj.container_repo)
+    if not last or last.get("baseline") != client_obj.baseline_version:
+        return None
+    if time.time() - last.get("timestamp", 0) >= client_obj.update_check_interval:
+        return None
+    return last
+
+def _run_update_check(client_obj) -> None:
     newer = client_obj.check_for_updates()
+    tasks.record_update_check(
+        client_obj.state_manager, client_obj.container_repo, client_obj.baseline_version, newer
+    )
+    if newer and client_obj.prefetch_updates:
+        try:
+            actions.start_prefetch(client_obj.cli, client_obj.container_repo, newer)
+        except Exception as e:
+            logger.debug(f"Could not start prefetch of {newer}: {e}")
+    # Housekeeping rides on the background check so it never delays a command
+    if client_obj.auto_gc:
+        _maybe_start_gc(client_obj)
+
+def _maybe_start_gc(client_obj) -> None:
+    """Start a detached garbage collection if the last one is older than GC_INTERVAL."""
+    last = tasks.get_last_gc(client_obj.state_manager, client_obj.container_repo)
+    if last and time.time() - last.get("timestamp", 0) < tasks.GC_INTERVAL:
+        return
+    try:
+        actions.start_gc(client_obj.cli, client_obj.container_repo)
+    except Exception as e:
+        logger.debug(f"Could not start image garbage collection: {e}")
+
+@profile.timed("update_check")
+def _start_update_check(client_obj) -> Optional[threading.Thread]:
+    """
+    Start the update check in the background if one is due.
+
+    Returns:
+        Optional[threading.Thread]: The running check, or None if the last result is still fresh
+    """
+    if _fresh_update_check(client_obj):
+        return None
+    thread = threading.Thread(target=_run_update_check, args=(client_obj,), daemon=True)
+    thread.start()
+    return thread
+
+def _notify_updates(client_obj, check: Optional[threading.Thread]) -> None:
+    """Print the update notice after the command, never waiting on a check still running."""
+    if check is not None and check.is_alive():
+        return
+    last = _fresh_update_check(client_obj)
+    newer = last.get("newer") if last else None
     if newer:
-        print(f"--- Newer container version found: {newer} (Current: {client_obj.baseline_version}) ---")
+        current = client_obj.baseline_version
+        if tasks.is_version_constraint(current):
+            try:
+                current = f"{client_obj.resolved_version} ({current})"
+            except Exception:
+                pass # Fall back to the constraint alone
+        print(f"--- Newer container version found: {newer} (Current: {current}) ---")
         print(f"--- You can pin this version to your environment by running apply-update ---")
 
+def _gc_summary(repo: str, record: dict) -> str:
+    summary = (f"Removed {len(record['removed'])} old version(s) of {repo}, "
+               f"reclaiming {tasks.format_size(record['bytes'])}")
+    if record.get("failed"):
+        summary += f"; kept {', '.join(record['failed'])} (still in use)"
+    return summary
+
+def _notify_gc(client_obj) -> None:
+    """Report a background garbage collection's result once, after the command."""
+    record = tasks.get_last_gc(client_obj.state_manager, client_obj.container_repo)
+    if not record or record.get("reported") or not (record.get("removed") or record.get("failed")):
+        return
+    print(f"--- {_gc_summary(client_obj.container_repo, record)} ---")
+    tasks.mark_gc_reported(client_obj.state_manager, client_obj.container_repo)
+
+def _gc_protected_versions(client_obj) -> set:
+    """Versions garbage collection never removes: the pinned, running and prefetched ones."""
+    repo = client_obj.container_repo
+    protected = {client_obj.baseline_version, tasks.read_version_state(repo, client_obj.state_manager)}
+    try:
+        protected.add(client_obj.resolved_version)
+    except Exception as e:
+        logger.debug(f"Could not resolve {client_obj.baseline_version} for gc: {e}")
+    prefetched = tasks.get_prefetch(client_obj.state_manager, repo)
+    if prefetched:
+        protected.add(prefetched.get("version"))
+    protected.discard(None)
+    return protected
+
+def _handle_gc_command(client_obj, cli, args) -> None:
+    """
+    Remove old local versions: `gc` removes them in the background,
+    `gc --wait` in the foreground and `gc --dry-run` only lists them.
+    """
+    repo = client_obj.container_repo
+    state_manager = client_obj.state_manager
+    policy = (client_obj.gc_keep_versions, client_obj.gc_keep_days, _gc_protected_versions(client_obj))
+
+    if "--background" in args:
+        # Started detached by `gc` or the automatic policy; reported on the next run
+        tasks.lower_priority()
+        actions.collect_garbage(cli, repo, state_manager, *policy)
+        return
+
+    plan = actions.plan_image_gc(cli, repo, state_manager, *policy)
+    if not plan["versions"]:
+        print(f"Nothing to remove for {repo}.")
+        return
+    print(f"{'Would remove' if '--dry-run' in args else 'Removing'} {len(plan['versions'])} old version(s) "
+          f"of {repo}: {', '.join(plan['versions'])} (up to {tasks.format_size(plan['bytes'])})")
+    if "--dry-run" in args:
+        return
+
+    if "--wait" not in args and actions.start_gc(cli, repo):
+        print("Removal continues in the background; the space reclaimed is reported on your next run.")
+        return
+    record = actions.collect_garbage(cli, repo, state_manager, *policy)
+    if record is None:
+        print(f"A garbage collection for {repo} is already running.")
+        return
+    tasks.mark_gc_reported(state_manager, repo)
+    print(f"✓ {_gc_summary(repo, record)}.")
+
+def _handle_cache_command(client_obj, args) -> None:
+    """Report on or prune the persistent cache: `cache stats` or `cache prune`."""
+    state_manager = client_obj.state_manager
+    action = args[0] if args else "stats"
+
+    if action == "stats":
+        usage = tasks.get_cache_usage(state_manager)
+        print(f"Cache entries: {usage['entries']} of {state_manager.cache_max_entries} "
+              f"({usage['expired']} expired)")
+        print(f"Cache size: {tasks.format_size(usage['bytes'])} of {tasks.format_size(state_manager.cache_max_bytes)}")
+        counts = state_manager.cache_stats()
+        print(f"Lookups this process: {counts['hit']} hits, {counts['miss']} misses, "
+              f"{counts['stale']} stale, {counts['refresh']} background refreshes")
+    elif action == "prune":
+        result = tasks.prune_cache(state_manager)
+        print(f"✓ Removed {result['expired']} expired and {result['evicted']} least recently used entries; "
+              f"{result['entries']} entries ({tasks.format_size(result['bytes'])}) remain.")
+    else:
+        print(f"Unknown cache command: {action}. Use 'cache stats' or 'cache prune'.")
+        sys.exit(1)
+
 def _handle_reserved_commands(client_obj, cli, sub_command) -> bool:
     if not sub_command:
         return False
         
+    from rapidctl.errors import PodmanActionError
+
     cmd = sub_command[0]
+    if cmd == "--version":
+        print(f"Client version: {client_obj.client_version}")
+        try:
+            print(f"Container version: {client_obj.container_version}")
+        except PodmanActionError:
+            # A constraint nothing matches yet
+            print(f"Container version: {client_obj.container_repo}:{client_obj.baseline_version} (unresolved)")
+        return True
+
     if cmd == "apply-update":
         print(f"Applying update to latest version...")
-        new_v = actions.apply_latest_available(cli, client_obj.container_repo, client_obj.baseline_version)
-        if new_v != client_obj.baseline_version:
-            print(f"✓ Version {new_v} is now pinned as your default.")
+        try:
+            current = client_obj.resolved_version
+        except PodmanActionError as e:
+            print(f"✗ Error: {e}")
+            sys.exit(1)
+        new_v = actions.apply_latest_available(cli, client_obj.container_repo, current,
+                                               remote=client_obj.remote_update_check,
+                                               state_manager=client_obj.state_manager)
+        if new_v != current:
+            prefetched = tasks.get_prefetch(client_obj.state_manager, client_obj.container_repo)
+            if prefetched and prefetched.get("version") == new_v and prefetched.get("status") == "done":
+                print(f"✓ Version {new_v} is now pinned as your default (already pulled in the background).")
+            else:
+                print(f"✓ Version {new_v} is now pinned as your default.")
         else:
-            print("No newer local version found to apply.")
+            print("No newer version found to apply.")
+        return True
+
+    if cmd == tasks.PREFETCH_FLAG:
+        # Started detached by the update check; pulls without competing with the user
+        tasks.lower_priority()
+        version = sub_command[1] if len(sub_command) > 1 else ""
+        image_ref = tasks.sanitize_container_image(f"{client_obj.container_repo}:{version}") if version else None
+        if not image_ref or not image_ref.endswith(f":{version}"):
+            print(f"Usage: {tasks.PREFETCH_FLAG} <version>")
+            sys.exit(1)
+        if not actions.prefetch_version(cli, client_obj.container_repo, version, client_obj.state_manager):
+            print(f"A prefetch for {client_obj.container_repo} is already running.")
+        return True
+
+    if cmd == "cache":
+        _handle_cache_command(client_obj, sub_command[1:])
+        return True
+
+    if cmd == "gc":
+        _handle_gc_command(client_obj, cli, sub_command[1:])
         return True
         
     if cmd == "mcp":
         from rapidctl.cli.mcp import run_mcp_server
         run_mcp_server(client_obj)
         return True
+
+    if cmd == tasks.DAEMON_FLAG:
+        from rapidctl.cli import daemon
+        if sub_command[1:] == ["stop"]:
+            if daemon.stop(client_obj):
+                print("✓ Daemon stopped.")
+            else:
+                print("No daemon is running.")
+        else:
+            daemon.run_daemon(client_obj)
+        return True
         
     return False
 
+@profile.timed("image.ensure")
 def _ensure_container_image(client_obj, cli):
     from rapidctl.errors import PodmanAuthError
     
@@ -39,12 +251,14 @@ def _ensure_container_image(client_obj, cli):
             print(f"Container {client_obj.container_version} not found locally. Pulling...")
             new_image = actions.pull_container(cli, client_obj.container_version)
             print("✓ Pull successful")
+            _record_image_use(client_obj)
             return new_image
         except PodmanAuthError:
             if actions.authenticate_to_registry(cli, client_obj.container_version):
                 print(f"Retrying pull for {client_obj.container_version}...")
                 new_image = actions.pull_container(cli, client_obj.container_version)
                 print("✓ Pull successful")
+                _record_image_use(client_obj)
                 return new_image
             else:
                 print("✗ Authentication failed. Cannot proceed.")
@@ -53,34 +267,91 @@ def _ensure_container_image(client_obj, cli):
             print(f"✗ Failed to obtain container: {e}")
             raise
 
+    _record_image_use(client_obj)
     return container_image
 
-def _dispatch_subcommand(client_obj, cli, sub_command) -> None:
+def _record_image_use(client_obj) -> None:
+    """Note that the running version was used, for the gc retention policy."""
+    if client_obj.container_repo:
+        tasks.record_image_use(client_obj.state_manager, client_obj.container_repo, client_obj.resolved_version)
+
+def _prepare_container(client_obj, cli, sub_command, stages, image):
+    """Start setting up the container for a command as soon as its image is confirmed."""
+    def prepare():
+        image.result()
+        if client_obj.session_mode:
+            return actions.ensure_session_container(cli, client_obj.container_version)
+        return actions.prepare_container_command(
+            cli, client_obj.container_version, client_obj.command_path, sub_command
+        )
+
+    # Session containers stay warm for the next command, so only one-off ones are undone
+    cleanup = None if client_obj.session_mode else lambda container: actions.discard_container(cli, container)
+    return stages.submit(prepare, cleanup=cleanup)
+
+def _dispatch_subcommand(client_obj, cli, sub_command, stages=None, image=None) -> Optional[List[str]]:
+    """
+    Validate and run the requested subcommand.
+
+    From run(), `image` is the image ensure phase still running on `stages`:
+    anything that needs the image waits for it, everything else overlaps it.
+
+    Returns:
+        Optional[List[str]]: In exec mode, the `podman run` argv to replace
+        the process with once the invocation has wound down
+    """
+    def wait_for_image():
+        if image is not None:
+            image.result()
+
     if not sub_command:
+        wait_for_image()
         actions.display_available_commands(
             cli, 
             client_obj.container_version, 
             client_obj.command_path,
-            f"Ready: {client_obj.container_version} (No subcommand provided)\nAvailable commands:"
+            f"Ready: {client_obj.container_version} (No subcommand provided)\nAvailable commands:",
+            client_obj.state_manager
         )
         return
 
     requested_cmd = sub_command[0]
     
     if requested_cmd in ('--help', '-h'):
+        wait_for_image()
         actions.display_available_commands(
             cli, 
             client_obj.container_version, 
             client_obj.command_path,
-            f"Available commands for {client_obj.container_version}:"
+            f"Available commands for {client_obj.container_version}:",
+            client_obj.state_manager
         )
         sys.exit(0)
-        
-    available_cmds = actions.get_container_subcommands(
-        cli, 
-        client_obj.container_version, 
-        client_obj.command_path
-    )
+
+    # A process about to exec podman has no use for a pre-created container
+    exec_podman = client_obj.exec_mode and not client_obj.session_mode
+    prepared = None
+    if stages and not exec_podman:
+        prepared = _prepare_container(client_obj, cli, sub_command, stages, image)
+
+    # Served from the per-image cache, so validation and suggestions are in
+    # memory and usually done before the image check finishes
+    available_cmds = None
+    if image is not None:
+        available_cmds = actions.get_cached_container_subcommands(
+            cli,
+            client_obj.container_version,
+            client_obj.command_path,
+            client_obj.state_manager
+        )
+    if available_cmds is None:
+        wait_for_image()
+        available_cmds = actions.get_container_subcommands(
+            cli, 
+            client_obj.container_version, 
+            client_obj.command_path,
+            client_obj.state_manager
+        )
         
     if len(sub_command) == 2 and sub_command[1] in ('--help', '-h') and requested_cmd in available_cmds:
         summary = available_cmds.get(requested_cmd)
@@ -101,36 +372,96 @@ def _dispatch_subcommand(client_obj, cli, sub_command) -> None:
         sys.exit(1)
         
     try:
-        actions.run_container_command(
-            cli, 
-            client_obj.container_version, 
-            client_obj.command_path, 
-            sub_command
-        )
+        container = stages.take(prepared) if prepared else None
+        if client_obj.session_mode:
+            actions.run_session_command(
+                cli,
+                client_obj.container_version,
+                client_obj.command_path,
+                sub_command,
+                client_obj.state_manager,
+                client_obj.session_idle_timeout,
+                container_id=container
+            )
+        else:
+            return actions.run_container_command(
+                cli, 
+                client_obj.container_version, 
+                client_obj.command_path, 
+                sub_command,
+                container=container,
+                exec_podman=exec_podman
+            )
     except Exception as e:
         print(f"Error executing command: {e}")
         sys.exit(1)
 
+def _forward_to_daemon(client_obj, sub_command) -> None:
+    """Hand the invocation to a running daemon, exiting with its result if it took it."""
+    if os.environ.get("RAPIDCTL_NO_DAEMON"):
+        return
+    if sub_command and sub_command[0] in LOCAL_ONLY_COMMANDS:
+        return
+
+    from rapidctl.cli import daemon
+    with profile.phase("daemon.forward"):
+        code = daemon.forward(client_obj, sub_command)
+    if code is not None:
+        sys.exit(code)
+
 def main(client_obj):
     """Main entry point for the CLI tool."""
-    cli = client_obj.cli
-    if cli is None:
-        cli = client_obj.connect()
-
     sub_command = sys.argv[1:]
 
-    _check_and_notify_updates(client_obj)
+    profile.start(os.environ.get("RAPIDCTL_PROFILE"))
+    try:
+        _forward_to_daemon(client_obj, sub_command)
 
-    if _handle_reserved_commands(client_obj, cli, sub_command):
-        sys.exit(0)
+        # Connect lazily: invocations answered from cache never import podman
+        cli = client_obj.cli
+        if cli is None:
+            cli = client_obj.connect(lazy=True)
+
+        exec_argv = run(client_obj, cli, sub_command)
+    finally:
+        profile.finish()
+
+    if exec_argv:
+        tasks.exec_podman(exec_argv)
+
+def run(client_obj, cli, sub_command) -> Optional[List[str]]:
+    """
+    Run one invocation on a connected session; shared by main() and the daemon.
+
+    Returns:
+        Optional[List[str]]: In exec mode, the `podman run` argv for main()
+        to exec. Nothing runs after exec, so by then the startup phases and
+        the update check have finished and the notices are printed.
+    """
+    notify = not (sub_command and sub_command[0] in QUIET_COMMANDS)
+    check = _start_update_check(client_obj) if notify else None
+    exec_argv = None
 
     try:
-        _ensure_container_image(client_obj, cli)
-        _dispatch_subcommand(client_obj, cli, sub_command)
-    except SystemExit:
-        raise
-    except Exception as e:
-        print(f"CRITICAL ERROR: {e}")
-        import traceback
-        traceback.print_exc()
-        sys.exit(1)
+        if _handle_reserved_commands(client_obj, cli, sub_command):
+            sys.exit(0)
+
+        try:
+            with Pipeline() as stages:
+                image = stages.submit(_ensure_container_image, client_obj, cli)
+                exec_argv = _dispatch_subcommand(client_obj, cli, sub_command, stages, image)
+        except SystemExit:
+            raise
+        except Exception as e:
+            print(f"CRITICAL ERROR: {e}")
+            import traceback
+            traceback.print_exc()
+            sys.exit(1)
+    finally:
+        if exec_argv and check is not None:
+            # The check would die with the process, its result unrecorded
+            check.join()
+        if notify:
+            _notify_updates(client_obj, check)
+            _notify_gc(client_obj)
+    return exec_argv
@@ -19,7 +19,8 @@ def run_mcp_server(client_obj):
     available_cmds = rapidctl.cli.actions.get_container_subcommands(
         cli, 
         client_obj.container_version, 
-        client_obj.command_path
+        client_obj.command_path,
+        client_obj.state_manager
     )
 
     # Register each subcommand as a tool
@@ -72,5 +73,11 @@ def run_mcp_server(client_obj):
             description=description
         )
 
+    # The server runs until killed, so persist what discovery cached now
+    client_obj.state_manager.flush()
+
+    # Keep the image inventory current from Podman events while serving
+    cli.inventory.watch()
+
     # Run the server via stdio
     mcp.run()
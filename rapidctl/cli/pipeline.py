@@ -0,0 +1,101 @@
+"""
+Overlapping independent startup phases on a few worker threads.
+
+Each phase runs in a copy of the submitting context, so daemon output
+routing and profiling follow it onto the worker thread. Leaving the block
+with an error cancels phases that have not started and cleans up after
+speculative ones that already ran.
+"""
+
+import contextvars
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+# Startup only ever has a couple of phases in flight at once
+PIPELINE_WORKERS = 3
+
+
+class Pipeline:
+    """Context manager running startup phases concurrently."""
+
+    def __init__(self, max_workers: int = PIPELINE_WORKERS):
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._threads: List[threading.Thread] = []
+        self._futures: List[Future] = []
+        self._cleanups: Dict[Future, Callable[[Any], None]] = {}
+
+    def __enter__(self) -> "Pipeline":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            # Running phases cannot be interrupted. Their threads are daemon
+            # threads, unlike a ThreadPoolExecutor's, so an exiting process
+            # abandons them instead of waiting, e.g. for a slow image pull
+            for future in self._futures:
+                future.cancel()
+            self.abort()
+            return
+        for thread in self._threads:
+            thread.join()
+
+    def submit(self, fn: Callable, *args, cleanup: Optional[Callable[[Any], None]] = None,
+               **kwargs) -> Future:
+        """
+        Start a phase on a worker thread.
+
+        Args:
+            fn: The phase to run
+            cleanup: Called with the phase's result if the pipeline is aborted
+                before the result is taken, to undo speculative work
+
+        Returns:
+            Future: Resolves to the phase's result
+        """
+        future: Future = Future()
+        context = contextvars.copy_context()
+        thread = threading.Thread(
+            target=self._run, args=(future, context, fn, args, kwargs),
+            name=f"rapidctl_{len(self._threads)}", daemon=True
+        )
+        self._futures.append(future)
+        if cleanup is not None:
+            self._cleanups[future] = cleanup
+        self._threads.append(thread)
+        thread.start()
+        return future
+
+    def _run(self, future: Future, context: contextvars.Context, fn: Callable, args, kwargs) -> None:
+        """Run one phase once a worker slot is free, unless it was cancelled meanwhile."""
+        with self._slots:
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                result = context.run(fn, *args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def take(self, future: Future) -> Any:
+        """Wait for a phase and claim its result, so aborting no longer cleans it up."""
+        self._cleanups.pop(future, None)
+        return future.result()
+
+    def abort(self) -> None:
+        """Cancel phases that have not started and clean up the ones that have."""
+        for future, cleanup in self._cleanups.items():
+            if not future.cancel():
+                future.add_done_callback(lambda f, cleanup=cleanup: _run_cleanup(f, cleanup))
+        self._cleanups.clear()
+
+
+def _run_cleanup(future: Future, cleanup: Callable[[Any], None]) -> None:
+    """Undo a speculative phase that succeeded; failed phases left nothing behind."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    try:
+        cleanup(future.result())
+    except Exception:
+        pass # Best effort; the work is already abandoned
@@ -0,0 +1,257 @@
+import base64
+import json
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urljoin
+
+from rapidctl.errors import RegistryError
+
+logger = logging.getLogger(__name__)
+
+# Seconds a repository's tag pages and their validators are remembered
+REGISTRY_TAGS_CACHE_TTL = 7 * 86400
+# Default minimum seconds between tag-list checks against one registry
+REGISTRY_MIN_INTERVAL = 300
+# Tags asked for per page; registries may return fewer and link to the rest
+REGISTRY_PAGE_SIZE = 1000
+# Upper bound on pages followed in one check
+REGISTRY_MAX_PAGES = 100
+# Seconds to wait for a registry response
+REGISTRY_TIMEOUT = 10
+
+# Docker Hub is addressed as docker.io in image names but served from its own host
+_DOCKER_HUB_NAMES = ("docker.io", "index.docker.io")
+_DOCKER_HUB_HOST = "registry-1.docker.io"
+# Like podman, only registries on this machine are assumed to speak plain HTTP
+_LOCAL_HOSTS = ("localhost", "127.0.0.1", "[::1]")
+
+_LINK_NEXT_RE = re.compile(r'<([^>]*)>\s*;[^,]*\brel="?next"?')
+_CHALLENGE_PARAM_RE = re.compile(r'(\w+)="([^"]*)"')
+
+
+def split_repository(repo: str) -> Tuple[str, str]:
+    """
+    Split a repository into its registry and its path on that registry.
+
+    Args:
+        repo: Repository without a tag, e.g. 'quay.io/org/tool' or 'ubuntu'
+
+    Returns:
+        tuple: (registry, path), with Docker Hub's implicit 'library/'
+        namespace filled in
+    """
+    first, sep, rest = repo.partition("/")
+    if sep and ("." in first or ":" in first or first == "localhost"):
+        registry, path = first, rest
+    else:
+        registry, path = "docker.io", repo
+
+    if registry in _DOCKER_HUB_NAMES and "/" not in path:
+        path = f"library/{path}"
+    return registry, path
+
+
+def registry_base_url(registry: str) -> str:
+    """Base URL of a registry's HTTP API."""
+    host = _DOCKER_HUB_HOST if registry in _DOCKER_HUB_NAMES else registry
+    hostname = host.rsplit(":", 1)[0] if not host.endswith("]") else host
+    scheme = "http" if hostname in _LOCAL_HOSTS else "https"
+    return f"{scheme}://{host}"
+
+
+def next_page_url(link_header: Optional[str], page_url: str) -> Optional[str]:
+    """The absolute URL of the next page named by a Link header, if any."""
+    if not link_header:
+        return None
+    matches = _LINK_NEXT_RE.search(link_header)
+    return urljoin(page_url, matches.group(1)) if matches else None
+
+
+def _retry_after(headers) -> float:
+    try:
+        return max(float(headers.get("Retry-After", REGISTRY_MIN_INTERVAL)), 0)
+    except (TypeError, ValueError):
+        return REGISTRY_MIN_INTERVAL
+
+
+class RegistryClient:
+    """
+    Lists the tags of repositories in their remote registries.
+
+    Tag lists are read from the registry's /v2/<name>/tags/list endpoint,
+    following Link-header pagination. Each page is remembered in the state
+    manager together with its ETag and Last-Modified validators, and
+    re-requested conditionally, so an unchanged repository costs one small
+    304 response per page.
+
+    Checks against each registry are rate limited: within the minimum
+    interval, or while a 429 response's Retry-After lasts, the remembered
+    tags are returned without a request. Token (Bearer) and Basic
+    authentication use the credentials podman was logged in with.
+    """
+
+    def __init__(self, state_manager=None, auth_configs: Optional[Dict[str, Dict[str, str]]] = None,
+                 rate_limits: Optional[Dict[str, float]] = None):
+        """
+        Initialize the client.
+
+        Args:
+            state_manager: Optional StateManager remembering tag pages and rate limits
+            auth_configs: Credentials per registry, as cached by PodmanCLI.login()
+            rate_limits: Minimum seconds between checks per registry,
+                overriding REGISTRY_MIN_INTERVAL
+        """
+        self.state_manager = state_manager
+        self.auth_configs = auth_configs if auth_configs is not None else {}
+        self.rate_limits: Dict[str, float] = dict(rate_limits or {})
+        self._not_before: Dict[str, float] = {}
+        self._authorization: Dict[str, str] = {}
+
+    def list_tags(self, repo: str) -> List[str]:
+        """
+        List the tags of a repository in its registry.
+
+        Args:
+            repo: Repository without a tag, e.g. 'quay.io/org/tool'
+
+        Returns:
+            List[str]: Tags in the order the registry lists them; the
+            remembered tags (or none) while the registry is rate limited
+
+        Raises:
+            RegistryError: If the registry can't be reached or refuses the request
+        """
+        registry, path = split_repository(repo)
+        cache_key = f"registry_tags_{repo}"
+        known = self.state_manager.get_cache(cache_key, allow_stale=True) if self.state_manager else None
+        known_pages = known if isinstance(known, list) else []
+
+        if self._throttled(registry):
+            logger.debug(f"Registry {registry} is rate limited; using remembered tags for {repo}")
+            return [tag for page in known_pages for tag in page["tags"]]
+
+        pages = self._fetch_pages(registry, path, {page["url"]: page for page in known_pages})
+        # Only a completed check starts the interval; a failure may be retried
+        # next time, except after a 429, which _request holds off for itself
+        self._hold(registry, self.rate_limits.get(registry, REGISTRY_MIN_INTERVAL))
+        if self.state_manager and pages != known_pages:
+            self.state_manager.set_cache(cache_key, pages, ttl=REGISTRY_TAGS_CACHE_TTL)
+        return [tag for page in pages for tag in page["tags"]]
+
+    def _throttled(self, registry: str) -> bool:
+        if self._not_before.get(registry, 0) > time.time():
+            return True
+        return bool(self.state_manager and self.state_manager.get_cache(f"registry_hold_{registry}"))
+
+    def _hold(self, registry: str, seconds: float) -> None:
+        """Make no further requests to a registry for the given number of seconds."""
+        if seconds <= 0:
+            return
+        self._not_before[registry] = time.time() + seconds
+        if self.state_manager:
+            self.state_manager.set_cache(f"registry_hold_{registry}", True, ttl=seconds)
+
+    def _fetch_pages(self, registry: str, path: str, known: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Walk the tag list pages, reusing remembered pages the registry reports unchanged."""
+        url = f"{registry_base_url(registry)}/v2/{path}/tags/list?{urlencode({'n': REGISTRY_PAGE_SIZE})}"
+        pages = []
+        while url and len(pages) < REGISTRY_MAX_PAGES:
+            previous = known.get(url)
+            status, headers, body = self._request(registry, url, previous)
+            if status == 304 and previous:
+                pages.append(previous)
+                url = previous["next"]
+                continue
+
+            try:
+                tags = json.loads(body).get("tags") or []
+            except (ValueError, AttributeError) as e:
+                raise RegistryError(f"Unreadable tag list from {registry}: {str(e)}")
+            page = {
+                "url": url,
+                "tags": tags,
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                "next": next_page_url(headers.get("Link"), url),
+            }
+            pages.append(page)
+            url = page["next"]
+        return pages
+
+    def _request(self, registry: str, url: str, previous: Optional[Dict[str, Any]]):
+        """
+        GET a URL from the registry, authenticating once if challenged.
+
+        Returns:
+            tuple: (status, headers, body)
+        """
+        import urllib.error
+        import urllib.request
+
+        headers = {"Accept": "application/json"}
+        if previous and previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous and previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+        if registry in self._authorization:
+            headers["Authorization"] = self._authorization[registry]
+
+        for attempt in range(2):
+            try:
+                request = urllib.request.Request(url, headers=headers)
+                with urllib.request.urlopen(request, timeout=REGISTRY_TIMEOUT) as response:
+                    return response.status, response.headers, response.read()
+            except urllib.error.HTTPError as e:
+                if e.code == 304:
+                    return 304, e.headers, b""
+                if e.code == 401 and attempt == 0:
+                    headers["Authorization"] = self._authorize(registry, e.headers.get("WWW-Authenticate", ""))
+                    continue
+                if e.code == 429:
+                    self._hold(registry, _retry_after(e.headers))
+                raise RegistryError(f"Registry {registry} returned HTTP {e.code} for {url}")
+            except (urllib.error.URLError, OSError) as e:
+                raise RegistryError(f"Failed to reach registry {registry}: {str(e)}")
+
+    def _authorize(self, registry: str, challenge: str) -> str:
+        """Answer a WWW-Authenticate challenge, returning the Authorization header to send."""
+        import urllib.error
+        import urllib.request
+
+        scheme, _, params = challenge.partition(" ")
+        credentials = self.auth_configs.get(registry) or {}
+        basic = None
+        if credentials.get("username"):
+            pair = f"{credentials['username']}:{credentials.get('password', '')}"
+            basic = "Basic " + base64.b64encode(pair.encode()).decode()
+
+        if scheme.lower() == "basic":
+            if not basic:
+                raise RegistryError(f"Registry {registry} requires a login")
+            self._authorization[registry] = basic
+            return basic
+        if scheme.lower() != "bearer":
+            raise RegistryError(f"Unsupported authentication challenge from {registry}: {challenge!r}")
+
+        values = dict(_CHALLENGE_PARAM_RE.findall(params))
+        realm = values.pop("realm", None)
+        if not realm:
+            raise RegistryError(f"Registry {registry} sent a token challenge without a realm")
+        request = urllib.request.Request(f"{realm}?{urlencode(values)}")
+        if basic:
+            request.add_header("Authorization", basic)
+        try:
+            with urllib.request.urlopen(request, timeout=REGISTRY_TIMEOUT) as response:
+                grant = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise RegistryError(f"Token request to {registry} failed with HTTP {e.code}")
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            raise RegistryError(f"Token request to {registry} failed: {str(e)}")
+
+        token = grant.get("token") or grant.get("access_token")
+        if not token:
+            raise RegistryError(f"Registry {registry} issued no token")
+        self._authorization[registry] = f"Bearer {token}"
+        return self._authorization[registry]
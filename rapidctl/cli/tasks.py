@@ -1,52 +1,164 @@
 from typing import List, Optional
+import hashlib
+import io
 import json
 import os
 import re
+import shutil
+import subprocess
+import sys
+import time
 import logging
 from urllib.parse import urlparse
 from pathlib import Path
-from rapidctl.utils.version import VersionParser
+from rapidctl.utils.version import VersionConstraint, VersionIndex, VersionParser
+from rapidctl.cli.inventory import FINGERPRINTED_IMAGE_CACHE_TTL, IMAGE_CACHE_TTL, ImageInventory, summarize_image
+from rapidctl.cli.registry import RegistryClient
+from rapidctl.errors import RegistryError
+
+try:
+    import fcntl
+except ImportError: # Not available on Windows; background work then goes unlocked
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
+# Image IDs are content addressed, so subcommand metadata only goes stale
+# when the image is replaced; the TTL just bounds leftovers from old images
+SUBCOMMAND_CACHE_TTL = 30 * 86400
+
+# Labels identifying warm session containers and the image they run
+SESSION_LABEL = "io.rapidctl.session"
+SESSION_IMAGE_LABEL = "io.rapidctl.session.image"
+# Minimum gap between sweeps for idle session containers
+SESSION_SWEEP_INTERVAL = 60
+
+# Largest image whose export is streamed through Python to read its files;
+# past this, starting a container to look is quicker
+ARCHIVE_READ_MAX_BYTES = 200 * 1024 * 1024
+
+# Default seconds between background checks for a newer local version
+UPDATE_CHECK_INTERVAL = 3600
+
+# Niceness added to detached background processes: prefetches and image collection
+PREFETCH_NICENESS = 10
+# Hidden flag a background prefetch re-runs the tool with; a flag rather than
+# a command so it can't shadow a container subcommand named "prefetch"
+PREFETCH_FLAG = "--rapidctl-prefetch"
+# Likewise for starting and stopping the resident daemon
+DAEMON_FLAG = "--rapidctl-daemon"
+
+# Default image garbage collection policy: besides the pinned version, keep
+# the newest GC_KEEP_VERSIONS and any version used within GC_KEEP_DAYS
+GC_KEEP_VERSIONS = 3
+GC_KEEP_DAYS = 30
+# Minimum seconds between automatic collections of one repo
+GC_INTERVAL = 86400
+# A version's last use is rewritten at most this often, sparing a state write per run
+IMAGE_USE_RESOLUTION = 3600
+
+
+def get_image_inventory(podman_session) -> ImageInventory:
+    """
+    Task to get the image inventory shared by a podman session.
+
+    Sessions that do not carry their own inventory get a throwaway one,
+    which behaves like a direct list_images call.
+    """
+    inventory = getattr(podman_session, "inventory", None)
+    if isinstance(inventory, ImageInventory):
+        return inventory
+    return ImageInventory(podman_session)
+
+
+def get_registry_client(podman_session) -> RegistryClient:
+    """Task to get the registry client of a podman session, or a throwaway one."""
+    registry = getattr(podman_session, "registry", None)
+    if isinstance(registry, RegistryClient):
+        return registry
+    return RegistryClient(state_manager=getattr(podman_session, "state_manager", None))
+
 
 def local_search(podman_session, container):
-    local_images = podman_session.list_images()
-    for img in local_images:
-        if container in img.tags:
-            return img.id
-    return None
+    """Task to find the ID of a local image by its full tag."""
+    return get_image_inventory(podman_session).find(container)
+
 
 def cached_local_search(state_manager, podman_session, container) -> Optional[str]:
-    """Search for a local image utilizing caching to speed up the process."""
-    if state_manager:
-        cached = state_manager.get_cache("podman_images")
-        if cached:
-            for info in cached:
-                if container in info.get("tags", []):
-                    return info.get("id")
-                    
-    # Cache miss or no state manager
-    image_id = local_search(podman_session, container)
-    
-    if state_manager and image_id:
+    """
+    Search for a local image utilizing caching to speed up the process.
+
+    Sessions whose inventory persists to this state manager are simply
+    asked for the image; otherwise the persisted list is checked first.
+    """
+    inventory = get_image_inventory(podman_session)
+    if not state_manager or inventory.state_manager is state_manager:
+        return inventory.find(container)
+
+    cached = state_manager.get_cache("podman_images")
+    if isinstance(cached, list):
+        for info in cached:
+            if container in info.get("tags", []):
+                return info.get("id")
+
+    # Cache miss: look the image up, then keep the list for next time
+    image_id = inventory.find(container)
+    if image_id:
         cache_image_list(state_manager, podman_session.list_images())
-        
     return image_id
 
-def cache_image_list(state_manager, images, ttl=300) -> None:
-    """Cache the list of local images."""
+
+def cache_image_list(state_manager, images, ttl=IMAGE_CACHE_TTL) -> None:
+    """Cache the list of local images, in the image inventory's format."""
     if not state_manager:
         return
-        
-    save_data = []
-    for img in images:
-        save_data.append({
-            "id": img.id,
-            "short_id": getattr(img, 'short_id', img.id[:12] if img.id else ''),
-            "tags": getattr(img, 'tags', [])
-        })
-    state_manager.set_cache("podman_images", save_data, ttl=ttl)
+
+    state_manager.set_cache("podman_images", [summarize_image(img) for img in images], ttl=ttl)
+
+
+def get_cached_subcommands(state_manager, image_id: str, command_path: str) -> Optional[dict]:
+    """Task to read the cached subcommand map for an image, if present."""
+    if not state_manager or not image_id:
+        return None
+
+    cached = state_manager.get_cache(f"subcommands_{image_id}")
+    if isinstance(cached, dict) and cached.get("command_path") == command_path:
+        commands = cached.get("commands")
+        if isinstance(commands, dict):
+            return commands
+    return None
+
+
+def cache_subcommands(state_manager, image_id: str, command_path: str, commands: dict,
+                      ttl=SUBCOMMAND_CACHE_TTL) -> None:
+    """Task to cache the subcommand map for an image, keyed by its ID."""
+    if not state_manager or not image_id:
+        return
+
+    state_manager.set_cache(
+        f"subcommands_{image_id}",
+        {"command_path": command_path, "commands": commands},
+        ttl=ttl
+    )
+
+
+def get_cache_usage(state_manager) -> dict:
+    """Task to measure the persistent cache: entries, bytes and expired entries."""
+    return state_manager.cache_usage()
+
+
+def prune_cache(state_manager) -> dict:
+    """Task to remove expired cache entries and evict least recently used ones."""
+    return state_manager.prune_cache()
+
+
+def format_size(num_bytes: float) -> str:
+    """Task to format a byte count for display, e.g. '1.5 MB'."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(num_bytes) < 1024 or unit == "GB":
+            return f"{num_bytes:.0f} {unit}" if unit == "B" else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+
 
 def parse_version(version_string: str) -> dict:
     """Task to parse a version string using VersionParser."""
@@ -58,25 +170,68 @@ def compare_versions(version1: str, version2: str) -> int:
     return VersionParser.compare(version1, version2)
 
 
+def version_sort_key(version: str) -> tuple:
+    """Task to get the memoized sort key of a version, ordered like compare_versions."""
+    return VersionParser.sort_key(version)
+
+
 def get_local_image_tags(podman_session, repo: str) -> List[str]:
     """Task to get all local tags for a specific repository."""
-    local_images = podman_session.list_images()
-    tags = []
-    
-    for image in local_images:
-        if image.tags:
-            for tag in image.tags:
-                # Check if this tag belongs to our repo
-                if tag.startswith(repo + ":") or tag == repo:
-                    # Extract just the tag part if it's the full repo:tag
-                    tag_part = tag.split(':')[-1] if ':' in tag else "latest"
-                    if tag_part not in tags:
-                        tags.append(tag_part)
-                elif ":" not in tag and repo in tag:
-                    # Partial match if repo is in tag (like "ubuntu" in "docker.io/library/ubuntu")
-                    pass
-    
-    return tags
+    return get_image_inventory(podman_session).tags_for_repo(repo)
+
+
+def get_version_index(podman_session, repo: str) -> VersionIndex:
+    """Task to get the local tags of a repository, sorted by version."""
+    return get_image_inventory(podman_session).versions_for_repo(repo)
+
+
+def is_version_constraint(version: str) -> bool:
+    """Task to check whether a version is a constraint such as '^1.4' rather than a tag."""
+    return VersionConstraint.is_constraint(version)
+
+
+def parse_version_constraint(spec: str) -> VersionConstraint:
+    """Task to parse a version constraint; raises ValueError if it is invalid."""
+    return VersionConstraint(spec)
+
+
+def get_resolved_version(state_manager, repo: str, spec: str, fingerprint: Optional[str]) -> Optional[str]:
+    """Task to read the tag a constraint last resolved to, if the image store is unchanged since."""
+    if not state_manager:
+        return None
+    cached = state_manager.get_cache(f"resolved_version_{repo}_{spec}")
+    if isinstance(cached, dict) and cached.get("fingerprint") == fingerprint:
+        return cached.get("version")
+    return None
+
+
+def cache_resolved_version(state_manager, repo: str, spec: str, fingerprint: Optional[str], version: str,
+                           remote: bool = False) -> None:
+    """
+    Task to remember the tag a constraint resolved to against an image store fingerprint.
+    Without a fingerprint, or when registry tags took part, the result only lasts a short TTL.
+    """
+    if state_manager:
+        ttl = FINGERPRINTED_IMAGE_CACHE_TTL if fingerprint and not remote else IMAGE_CACHE_TTL
+        state_manager.set_cache(f"resolved_version_{repo}_{spec}",
+                                {"fingerprint": fingerprint, "version": version}, ttl=ttl)
+
+
+def get_remote_tags(podman_session, repo: str) -> List[str]:
+    """
+    Task to list a repository's tags in its registry.
+
+    The moving 'latest' tag is left out, as it says nothing about which
+    release is newer. Registry failures are logged and yield no tags, so
+    remote lookups never break a local update check.
+    """
+    try:
+        tags = get_registry_client(podman_session).list_tags(repo)
+    except RegistryError as e:
+        logger.debug(f"Remote tag lookup for {repo} failed: {e}")
+        return []
+    return [tag for tag in tags if tag != "latest"]
+
 
 def read_version_state(repo: str, state_manager=None) -> Optional[str]:
     """Task to read the persisted version tag for a repo."""
@@ -110,6 +265,317 @@ def run_command_capture(podman_session, image_name: str, command: List[str]) ->
     return [line.strip() for line in output.split('\n') if line.strip()]
 
 
+def get_image_size(podman_session, image_name: str) -> Optional[int]:
+    """Task to get the size in bytes of a local image, if known."""
+    entry = get_image_inventory(podman_session).entry(image_name)
+    return entry.get("size") if entry else None
+
+
+def read_image_paths(podman_session, image_name: str, file_path: str, dir_path: str):
+    """
+    Task to read a file and a directory listing straight from an image's filesystem.
+    Streams the image export instead of creating a container.
+
+    Returns:
+        tuple: (file bytes or None, directory entries or None); both None
+        without reading when the image is larger than ARCHIVE_READ_MAX_BYTES
+    """
+    from rapidctl.utils.archive import ChunkReader, read_image_archive
+
+    size = get_image_size(podman_session, image_name)
+    if isinstance(size, (int, float)) and size > ARCHIVE_READ_MAX_BYTES:
+        return None, None
+
+    stream = io.BufferedReader(ChunkReader(podman_session.export_image(image_name)))
+    return read_image_archive(stream, file_path, dir_path)
+
+
+def parse_commands_metadata(raw: str) -> dict:
+    """Task to map each command in a commands.json document to its summary."""
+    metadata = json.loads(raw)
+    return {cmd: info.get("summary", "") for cmd, info in metadata.items()}
+
+
+def build_container_command(command_path: str, args: List[str]) -> List[str]:
+    """Task to build the full in-container command line for a subcommand."""
+    # Subcommand is the first argument, remaining arguments are passed through
+    return [os.path.join(command_path, args[0])] + args[1:]
+
+
+def find_podman_binary() -> Optional[str]:
+    """Task to locate the podman binary on PATH."""
+    return shutil.which("podman")
+
+
+def build_podman_run_argv(podman_bin: str, image_ref: str, command: List[str]) -> List[str]:
+    """
+    Task to build the `podman run` argv for a one-off command.
+    A TTY is only requested when both stdin and stdout are terminals.
+    """
+    argv = [podman_bin]
+    socket_url = os.environ.get("PODMAN_SOCKET")
+    if socket_url:
+        argv += ["--url", socket_url]
+    argv += ["run", "--rm", "-i"]
+    if sys.stdin.isatty() and sys.stdout.isatty():
+        argv.append("-t")
+    argv.append(image_ref)
+    argv.extend(command)
+    return argv
+
+
+def exec_podman(argv: List[str]) -> None:
+    """Task to replace the current process with the podman binary; does not return."""
+    from rapidctl.bootstrap.state import flush_all
+
+    # Exit handlers never run after exec, so write buffered state first
+    flush_all()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.execvp(argv[0], argv)
+
+
+def session_container_name(image_name: str) -> str:
+    """Task to derive the per-user session container name for an image's repository."""
+    from rapidctl.cli.inventory import split_image_tag
+
+    repo, _ = split_image_tag(image_name)
+    slug = re.sub(r'[^a-zA-Z0-9_.-]', '-', repo.split('://')[-1]).strip('-')
+    user = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "user")
+    return f"rapidctl-session-{slug}-{user}"
+
+
+def get_session_last_used(state_manager, name: str) -> Optional[float]:
+    """Task to read when a session container last ran a command."""
+    if not state_manager:
+        return None
+    return state_manager.get_state(f"session_{name}")
+
+
+def touch_session(state_manager, name: str, flush: bool = False) -> None:
+    """
+    Task to record that a session container is running or just ran a command.
+    Pass flush=True to write it through at once, for other processes' sweeps.
+    """
+    if state_manager:
+        state_manager.set_state(f"session_{name}", time.time())
+        if flush:
+            state_manager.flush()
+
+
+def get_last_update_check(state_manager, repo: str) -> Optional[dict]:
+    """Task to read the last recorded update check for a repo."""
+    if not state_manager:
+        return None
+    last = state_manager.get_state(f"update_check_{repo}")
+    return last if isinstance(last, dict) else None
+
+
+def record_update_check(state_manager, repo: str, baseline: str, newer: Optional[str]) -> None:
+    """Task to record the result of an update check against a baseline version."""
+    if state_manager:
+        state_manager.set_state(f"update_check_{repo}", {
+            "timestamp": time.time(),
+            "baseline": baseline,
+            "newer": newer,
+        })
+
+
+def get_prefetch(state_manager, repo: str) -> Optional[dict]:
+    """Task to read the last recorded background pull for a repo."""
+    if not state_manager:
+        return None
+    record = state_manager.get_state(f"prefetch_{repo}")
+    return record if isinstance(record, dict) else None
+
+
+def record_prefetch(state_manager, repo: str, version: str, status: str, image_id: Optional[str] = None) -> None:
+    """Task to record the progress of a background pull: 'running', 'done' or 'failed'."""
+    if state_manager:
+        state_manager.set_state(f"prefetch_{repo}", {
+            "timestamp": time.time(),
+            "version": version,
+            "status": status,
+            "image_id": image_id,
+        })
+
+
+def get_image_usage(state_manager, repo: str) -> dict:
+    """
+    Task to read when each local version of a repo was last run.
+
+    Returns:
+        dict: {"since": when tracking began, "versions": {tag: timestamp}}
+    """
+    record = state_manager.get_state(f"image_usage_{repo}") if state_manager else None
+    if not isinstance(record, dict) or not isinstance(record.get("versions"), dict):
+        return {"since": time.time(), "versions": {}}
+    return record
+
+
+def record_image_use(state_manager, repo: str, version: str) -> None:
+    """Task to record that a version of a repo was just run."""
+    if not state_manager:
+        return
+    last = get_image_usage(state_manager, repo)["versions"].get(version)
+    if isinstance(last, (int, float)) and time.time() - last < IMAGE_USE_RESOLUTION:
+        return
+    # Other versions' uses may be recorded by parallel invocations meanwhile
+    with state_manager.transaction():
+        usage = get_image_usage(state_manager, repo)
+        usage["versions"][version] = time.time()
+        state_manager.set_state(f"image_usage_{repo}", usage)
+
+
+def select_gc_versions(versions: List[str], usage: dict, keep_versions: int, keep_days: float,
+                       protected=(), now: Optional[float] = None) -> List[str]:
+    """
+    Task to pick the versions of a repo that the retention policy lets go.
+
+    Args:
+        versions: Local tags of the repo, newest first
+        usage: Last use per version, as returned by get_image_usage()
+        keep_versions: How many of the newest versions to keep
+        keep_days: Keep any version run within this many days
+        protected: Tags that are always kept, such as the pinned version
+
+    Returns:
+        List[str]: Tags to remove, newest first
+    """
+    cutoff = (now if now is not None else time.time()) - keep_days * 86400
+    # Versions pulled before usage was tracked count as used when tracking began
+    since = usage.get("since", 0)
+    last_used = usage.get("versions", {})
+    return [
+        version for version in versions[max(keep_versions, 0):]
+        if version not in protected and last_used.get(version, since) < cutoff
+    ]
+
+
+def get_last_gc(state_manager, repo: str) -> Optional[dict]:
+    """Task to read the result of the last image garbage collection for a repo."""
+    if not state_manager:
+        return None
+    record = state_manager.get_state(f"gc_{repo}")
+    return record if isinstance(record, dict) else None
+
+
+def record_gc(state_manager, repo: str, removed: List[str], reclaimed: int, failed: List[str],
+              reported: bool = False) -> None:
+    """Task to record an image garbage collection, to be reported on a later run unless already reported."""
+    if state_manager:
+        state_manager.set_state(f"gc_{repo}", {
+            "timestamp": time.time(),
+            "removed": removed,
+            "bytes": reclaimed,
+            "failed": failed,
+            "reported": reported,
+        })
+
+
+def mark_gc_reported(state_manager, repo: str) -> None:
+    """Task to mark the last garbage collection's result as shown to the user."""
+    record = get_last_gc(state_manager, repo)
+    if record and not record.get("reported"):
+        state_manager.set_state(f"gc_{repo}", dict(record, reported=True))
+
+
+def remove_image(podman_session, image_name: str) -> None:
+    """Task to remove (or, if otherwise tagged, untag) a local image."""
+    podman_session.remove_image(image_name)
+
+
+def runtime_lock_path(repo: str, purpose: str) -> Path:
+    """Task to get a per-repo lock file held while background work of one kind runs."""
+    # Lives beside the daemon sockets, keyed by repo the same way
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    base = Path(runtime_dir) / "rapidctl" if runtime_dir else Path.home() / ".rapidctl" / "run"
+    digest = hashlib.sha256(repo.encode()).hexdigest()[:16]
+    return base / f"{digest}.{purpose}.lock"
+
+
+def prefetch_lock_path(repo: str) -> Path:
+    """Task to get the lock file held while a repo's newer version is pulled in the background."""
+    return runtime_lock_path(repo, "prefetch")
+
+
+def gc_lock_path(repo: str) -> Path:
+    """Task to get the lock file held while a repo's old versions are removed in the background."""
+    return runtime_lock_path(repo, "gc")
+
+
+def acquire_file_lock(path: Path) -> Optional[int]:
+    """
+    Task to take an exclusive lock on a file without waiting.
+
+    Returns:
+        Optional[int]: The open lock file descriptor, to be passed to
+        release_file_lock(), or None if another process holds the lock
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    if fcntl is None:
+        return fd
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def release_file_lock(fd: int) -> None:
+    """Task to release a lock taken with acquire_file_lock()."""
+    # Closing the descriptor drops the flock
+    os.close(fd)
+
+
+def build_background_argv(args: List[str]) -> Optional[List[str]]:
+    """
+    Task to build the argv re-running this tool as `<tool> <args...>` for
+    background work. Disk I/O runs in the idle class when ionice is available.
+
+    Returns:
+        Optional[List[str]]: The argv, or None if the tool wasn't started from a script
+    """
+    script = os.path.abspath(sys.argv[0]) if sys.argv and sys.argv[0] else ""
+    if not os.path.isfile(script):
+        return None
+    argv = [sys.executable, script] + list(args)
+    ionice = shutil.which("ionice")
+    return [ionice, "-c", "3"] + argv if ionice else argv
+
+
+def build_prefetch_argv(version: str) -> Optional[List[str]]:
+    """Task to build the argv re-running this tool as `<tool> --rapidctl-prefetch <version>`."""
+    return build_background_argv([PREFETCH_FLAG, version])
+
+
+def build_gc_argv() -> Optional[List[str]]:
+    """Task to build the argv re-running this tool as `<tool> gc --background`."""
+    return build_background_argv(["gc", "--background"])
+
+
+def spawn_detached(argv: List[str]) -> subprocess.Popen:
+    """Task to start a process in its own session, detached from the terminal and any daemon."""
+    return subprocess.Popen(
+        argv,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+        env=dict(os.environ, RAPIDCTL_NO_DAEMON="1"),
+    )
+
+
+def lower_priority() -> None:
+    """Task to lower the CPU priority of the current process for background work."""
+    try:
+        os.nice(PREFETCH_NICENESS)
+    except (AttributeError, OSError) as e:
+        logger.debug(f"Could not lower process priority: {e}")
+
+
 def extract_registry(image_name: str) -> str:
     """Task to extract the registry hostname from an image name."""
     registry = "docker.io"
@@ -9,3 +9,7 @@ class PodmanAuthError(PodmanAPIError):
 class PodmanActionError(Exception):
     """Exception raised when rapidctl action with Podman fail."""
     pass
+
+class RegistryError(Exception):
+    """Exception raised when a container registry request fails."""
+    pass
@@ -0,0 +1,147 @@
+import io
+import json
+import posixpath
+import tarfile
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+WHITEOUT_PREFIX = ".wh."
+OPAQUE_WHITEOUT = ".wh..wh..opq"
+
+
+class ChunkReader(io.RawIOBase):
+    """
+    Read-only file object over an iterator of byte chunks.
+    Lets tarfile consume a streamed image export without buffering it.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def _normalize(name: str) -> str:
+    """Normalize a tar member name to a relative posix path."""
+    name = posixpath.normpath(name.lstrip('/'))
+    return "" if name == "." else name
+
+
+def _ancestors(path: str) -> List[str]:
+    """Return the strict ancestor directories of a relative path."""
+    parts = path.split('/')[:-1]
+    return ['/'.join(parts[:i + 1]) for i in range(len(parts))]
+
+
+def _scan_layer(fileobj, file_path: str, dir_path: str) -> Dict[str, Any]:
+    """
+    Scan one layer tarball for a file and the direct entries of a directory.
+
+    Returns:
+        dict: The file bytes (if present) plus the entries, whiteouts and
+        opaque directories needed to resolve the layer against lower ones
+    """
+    found: Dict[str, Any] = {"file": None, "entries": set(), "whiteouts": set(), "opaque": set()}
+
+    with tarfile.open(fileobj=fileobj, mode="r|*") as layer:
+        for member in layer:
+            name = _normalize(member.name)
+            parent, base = posixpath.split(name)
+
+            if base == OPAQUE_WHITEOUT:
+                found["opaque"].add(parent)
+            elif base.startswith(WHITEOUT_PREFIX):
+                found["whiteouts"].add(posixpath.join(parent, base[len(WHITEOUT_PREFIX):]))
+            else:
+                if name == file_path and member.isfile():
+                    found["file"] = layer.extractfile(member).read()
+                if name.startswith(dir_path + '/'):
+                    # Deeper paths imply their top-level directory entry
+                    found["entries"].add(name[len(dir_path) + 1:].split('/')[0])
+    return found
+
+
+def _hides(layer: Dict[str, Any], path: str) -> bool:
+    """Whether a layer's whiteouts hide the given path in all lower layers."""
+    if path in layer["whiteouts"] or any(d in layer["whiteouts"] for d in _ancestors(path)):
+        return True
+    return any(d in layer["opaque"] for d in _ancestors(path))
+
+
+def read_image_archive(fileobj, file_path: str, dir_path: str) -> Tuple[Optional[bytes], Optional[List[str]]]:
+    """
+    Read one file and one directory listing from a docker-archive image export.
+
+    The archive is consumed as a stream: each layer is scanned once for the
+    two paths of interest, then the layers are resolved top-down using the
+    image manifest, honouring overlay whiteouts.
+
+    Args:
+        fileobj: File object positioned at the start of the archive
+        file_path: Absolute path of the file to read inside the image
+        dir_path: Absolute path of the directory to list inside the image
+
+    Returns:
+        tuple: (file contents or None, sorted directory entries or None)
+    """
+    file_path = _normalize(file_path)
+    dir_path = _normalize(dir_path)
+
+    layers: Dict[str, Dict[str, Any]] = {}
+    links: Dict[str, str] = {}
+    manifest = None
+
+    with tarfile.open(fileobj=fileobj, mode="r|") as archive:
+        for member in archive:
+            name = _normalize(member.name)
+            if name == "manifest.json":
+                manifest = json.load(archive.extractfile(member))
+            elif member.issym() and name.endswith(".tar"):
+                # Identical layers may be stored once and symlinked
+                links[name] = _normalize(posixpath.join(posixpath.dirname(name), member.linkname))
+            elif member.isfile() and name.endswith(".tar"):
+                layers[name] = _scan_layer(archive.extractfile(member), file_path, dir_path)
+
+    if not manifest:
+        raise ValueError("Image archive has no manifest.json")
+
+    top_down = []
+    for layer_name in reversed(manifest[0]["Layers"]):
+        layer_name = _normalize(layer_name)
+        layer = layers.get(links.get(layer_name, layer_name))
+        if layer is None:
+            raise ValueError(f"Image archive is missing layer {layer_name}")
+        top_down.append(layer)
+
+    contents = None
+    for layer in top_down:
+        if layer["file"] is not None:
+            contents = layer["file"]
+            break
+        if _hides(layer, file_path):
+            break
+
+    entries: Set[str] = set()
+    hidden: Set[str] = set()
+    dir_seen = False
+    for layer in top_down:
+        if layer["entries"]:
+            dir_seen = True
+        entries.update(e for e in layer["entries"] if e not in hidden)
+        hidden.update(posixpath.basename(w) for w in layer["whiteouts"] if posixpath.dirname(w) == dir_path)
+        if dir_path in layer["opaque"] or _hides(layer, dir_path):
+            break
+
+    return contents, (sorted(entries) if dir_seen else None)
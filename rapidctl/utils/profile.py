@@ -0,0 +1,138 @@
+"""
+Opt-in per-phase startup timing.
+
+Set RAPIDCTL_PROFILE to enable it for an invocation:
+    RAPIDCTL_PROFILE=1           breakdown printed to stderr
+    RAPIDCTL_PROFILE=/tmp/p.jsonl  one JSON line per phase appended to the file
+
+Timing is held in a context variable, so concurrent daemon requests keep
+separate breakdowns while work handed to a pipeline worker is recorded
+against the invocation that started it. When no profile is active, phase()
+hands back a shared no-op context manager and timed() adds a single
+lookup per call.
+"""
+
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+STDERR_TARGETS = ("1", "true", "yes", "stderr")
+
+_profile: contextvars.ContextVar = contextvars.ContextVar("rapidctl_profile", default=None)
+_NO_OP = contextlib.nullcontext()
+
+
+class _Profile:
+    """Timing records for one invocation."""
+
+    def __init__(self, target: str):
+        self.target = target
+        self.origin = time.perf_counter()
+        self.records: List[Dict[str, Any]] = []
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.origin) * 1000
+
+
+class _Phase:
+    """Context manager recording the duration of one phase."""
+
+    def __init__(self, profile: _Profile, name: str):
+        self._profile = profile
+        self._name = name
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = self._profile.elapsed_ms()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        end = self._profile.elapsed_ms()
+        self._profile.records.append({
+            "phase": self._name,
+            "start_ms": round(self._start, 3),
+            "duration_ms": round(end - self._start, 3),
+        })
+
+
+def _current() -> Optional[_Profile]:
+    return _profile.get()
+
+
+def start(target: Optional[str]) -> bool:
+    """
+    Start profiling the current invocation.
+
+    Args:
+        target: Value of RAPIDCTL_PROFILE; falsy disables profiling
+
+    Returns:
+        bool: Whether profiling is active
+    """
+    profile = _Profile(target) if target and target != "0" else None
+    _profile.set(profile)
+    return profile is not None
+
+
+def active() -> bool:
+    """Whether the current invocation is being profiled."""
+    return _current() is not None
+
+
+def phase(name: str):
+    """Context manager timing a named phase, or a no-op when profiling is off."""
+    profile = _current()
+    if profile is None:
+        return _NO_OP
+    return _Phase(profile, name)
+
+
+def mark(name: str) -> None:
+    """Record a point in time (e.g. first byte of output) without a duration."""
+    profile = _current()
+    if profile is not None:
+        profile.records.append({"phase": name, "start_ms": round(profile.elapsed_ms(), 3), "duration_ms": None})
+
+
+def timed(name: str) -> Callable:
+    """Decorator timing every call of a function as the named phase."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _profile.get() is None:
+                return fn(*args, **kwargs)
+            with phase(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def finish() -> None:
+    """Record the total, emit the breakdown and stop profiling the current invocation."""
+    profile = _current()
+    if profile is None:
+        return
+    _profile.set(None)
+
+    profile.records.append({"phase": "total", "start_ms": 0.0, "duration_ms": round(profile.elapsed_ms(), 3)})
+
+    if profile.target.lower() in STDERR_TARGETS:
+        print("--- rapidctl profile ---", file=sys.stderr)
+        for record in profile.records:
+            if record["duration_ms"] is None:
+                print(f"  {record['phase']:<28} @ {record['start_ms']:>9.1f} ms", file=sys.stderr)
+            else:
+                print(f"  {record['phase']:<28} {record['duration_ms']:>11.1f} ms", file=sys.stderr)
+        return
+
+    try:
+        with open(profile.target, 'a') as f:
+            for record in profile.records:
+                f.write(json.dumps({"pid": os.getpid(), **record}) + "\n")
+    except OSError as e:
+        print(f"Warning: Could not write profile to {profile.target}: {e}", file=sys.stderr)
@@ -1,18 +1,126 @@
 import re
-from typing import Any, Dict, List, Optional, Union
+from bisect import bisect_left, bisect_right, insort_left
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# Optional 'v' prefix, three numbers, then SemVer 2.0 pre-release and build parts
+_SEMVER_RE = re.compile(
+    r'^v?(\d+)\.(\d+)\.(\d+)'
+    r'(?:-([0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?'
+    r'(?:\+([0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?'
+)
+
+# A possibly partial version as written in a constraint, e.g. '1', 'v1.4' or '2.0.0-rc.1'
+_PARTIAL_RE = re.compile(r'v?(\d+)(?:\.(\d+))?(?:\.(\d+))?(?:-([0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?')
+_COMPARATOR_RE = re.compile(r'(>=|<=|>|<|==|=)\s*(\S+)')
+
+# Distinct version strings remembered by the parse cache
+PARSE_CACHE_SIZE = 16384
+
+# Ranks of each kind of version in the sort order; 'latest' is newer than anything
+_RANK_CUSTOM, _RANK_SEMVER, _RANK_TIMESTAMP, _RANK_LATEST = range(4)
+
+
+def _prerelease_key(identifiers: Tuple[str, ...]) -> Tuple[Tuple[int, int, str], ...]:
+    """Numeric identifiers compare numerically and sort before alphanumeric ones."""
+    return tuple((0, int(part), "") if part.isdigit() else (1, 0, part) for part in identifiers)
+
+
+class Version:
+    """
+    Immutable, comparable version value.
+
+    Ordering follows SemVer 2.0 precedence for semantic versions: a
+    pre-release sorts before its release, pre-release identifiers compare
+    numerically or lexically, and build metadata is ignored. Across kinds,
+    custom tags (equal to each other) sort before semantic versions, then
+    timestamps, then 'latest'.
+
+    The comparison key (a plain tuple, exposed as .key) and the hash are
+    computed once on construction. Use Version.parse() to share one
+    instance per version string.
+    """
+
+    __slots__ = ("value", "type", "components", "prerelease", "build", "key", "_hash")
+
+    def __init__(self, value: str):
+        self.value = value
+        self.prerelease: Tuple[str, ...] = ()
+        self.build: Optional[str] = None
+
+        matches = _SEMVER_RE.match(value)
+        if matches:
+            self.type = "semver"
+            self.components: Tuple[int, ...] = tuple(int(p) for p in matches.group(1, 2, 3))
+            if matches.group(4):
+                self.prerelease = tuple(matches.group(4).split("."))
+            self.build = matches.group(5)
+            rank = _RANK_SEMVER
+        elif value.isdigit():
+            self.type = "timestamp"
+            self.components = (int(value),)
+            rank = _RANK_TIMESTAMP
+        else:
+            self.type = "custom"
+            self.components = ()
+            rank = _RANK_LATEST if value == "latest" else _RANK_CUSTOM
+
+        # A release outranks any of its pre-releases
+        self.key = (rank, self.components, not self.prerelease, _prerelease_key(self.prerelease))
+        self._hash = hash(self.key)
+
+    @staticmethod
+    @lru_cache(maxsize=PARSE_CACHE_SIZE)
+    def parse(value: str) -> "Version":
+        """The shared Version for a version string, parsed once per process."""
+        return Version(value)
+
+    def __eq__(self, other):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.key == other.key
+
+    def __lt__(self, other):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.key < other.key
+
+    def __le__(self, other):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.key <= other.key
+
+    def __gt__(self, other):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.key > other.key
+
+    def __ge__(self, other):
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.key >= other.key
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return f"Version({self.value!r})"
+
+    def __str__(self):
+        return self.value
+
 
 class VersionParser:
     """
     Utility class for parsing and comparing version strings.
-    Supports semantic versioning (v1.2.3), timestamps (1746190043), 
+    Supports semantic versioning (v1.2.3, 1.2.3-rc.1), timestamps (1746190043),
     and custom tags (latest, stable).
     """
 
     @staticmethod
     def is_semver(version: str) -> bool:
         """Check if a version string follows semantic versioning."""
-        # Simple semver regex: optional 'v' prefix, 3 numbers separated by dots
-        return bool(re.match(r'^v?\d+\.\d+\.\d+', version))
+        return bool(_SEMVER_RE.match(version))
 
     @staticmethod
     def is_timestamp(version: str) -> bool:
@@ -23,83 +131,255 @@ class VersionParser:
     def parse(cls, version: str) -> Dict[str, Any]:
         """
         Parse a version string into a comparable format.
-        
+
         Returns a dict with:
             - type: 'semver', 'timestamp', or 'custom'
             - components: list of integers (for semver) or a single integer (for timestamp)
+            - prerelease: list of pre-release identifiers (semver only)
+            - build: build metadata, or None
             - value: the original string
         """
-        if cls.is_semver(version):
-            # Strip 'v' prefix and split by '.'
-            clean_v = version.lstrip('v')
-            # Extract only the numeric version parts (ignore suffixes for now)
-            matches = re.match(r'^(\d+)\.(\d+)\.(\d+)', clean_v)
-            if matches:
-                components = [int(p) for p in matches.groups()]
-                return {
-                    "type": "semver",
-                    "components": components,
-                    "value": version
-                }
-        
-        if cls.is_timestamp(version):
-            return {
-                "type": "timestamp",
-                "components": [int(version)],
-                "value": version
-            }
-            
+        parsed = Version.parse(version)
         return {
-            "type": "custom",
-            "components": [],
+            "type": parsed.type,
+            "components": list(parsed.components),
+            "prerelease": list(parsed.prerelease),
+            "build": parsed.build,
             "value": version
         }
 
+    @classmethod
+    def sort_key(cls, version: str) -> tuple:
+        """
+        Return a precomputed key that orders versions the same way as compare().
+
+        Keys are memoized per version string, so sorting with
+        key=VersionParser.sort_key parses each tag once rather than on
+        every comparison. The key is the Version's own tuple, which sorts
+        in C rather than through Version's comparison methods.
+        """
+        return Version.parse(version).key
+
     @classmethod
     def compare(cls, version1: str, version2: str) -> int:
         """
         Compare two versions.
-        
+
         Returns:
             -1 if version1 < version2
              0 if version1 == version2
              1 if version1 > version2
         """
-        v1_data = cls.parse(version1)
-        v2_data = cls.parse(version2)
-
-        # Exact match
         if version1 == version2:
             return 0
+        v1, v2 = Version.parse(version1), Version.parse(version2)
+        return (v1 > v2) - (v1 < v2)
+
+
+class VersionIndex:
+    """
+    Set of version strings kept sorted from oldest to newest.
+
+    Lookups and inserts bisect on VersionParser.sort_key, computing keys
+    only for the tags they probe, so an index restored from storage serves
+    newest() without parsing any tag. Equal versions (such as 1.0.0 and
+    v1.0.0) list newest first in the order they were added.
+
+    An index is never modified once built; updated() returns a new one.
+    """
+
+    __slots__ = ("_tags", "_members")
+
+    def __init__(self, tags: Iterable[str] = (), presorted: bool = False):
+        """
+        Build an index of version strings.
+
+        Args:
+            tags: Version strings; duplicates are dropped
+            presorted: The tags are already ordered oldest to newest, as
+                returned by iterating an index, and are taken as is
+        """
+        if presorted:
+            self._tags = list(tags)
+        else:
+            # Stable sort newest first, then reverse, so equal versions keep first-seen order
+            self._tags = sorted(dict.fromkeys(tags), key=VersionParser.sort_key, reverse=True)[::-1]
+        self._members = set(self._tags)
+
+    def __len__(self) -> int:
+        return len(self._tags)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._tags)
+
+    def __contains__(self, tag: str) -> bool:
+        return tag in self._members
+
+    def newest(self) -> Optional[str]:
+        """The newest version, or None if the index is empty."""
+        return self._tags[-1] if self._tags else None
+
+    def newer_than(self, version: str) -> List[str]:
+        """Versions strictly newer than version, newest first."""
+        start = bisect_right(self._tags, VersionParser.sort_key(version), key=VersionParser.sort_key)
+        return self._tags[:start - 1:-1] if start else self._tags[::-1]
+
+    def newest_between(self, low: tuple, high: tuple, low_inclusive: bool = True, high_inclusive: bool = False,
+                       accept: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+        """
+        Newest version whose sort key lies between two keys.
+
+        Args:
+            low: Lower bound, a sort key or a prefix of one such as (rank,)
+            high: Upper bound, likewise
+            low_inclusive: Whether a version keyed exactly low is included
+            high_inclusive: Whether a version keyed exactly high is included
+            accept: Optional further test; versions failing it are skipped
+
+        Returns:
+            Optional[str]: The newest matching version, or None
+        """
+        key = VersionParser.sort_key
+        start = (bisect_left if low_inclusive else bisect_right)(self._tags, low, key=key)
+        end = (bisect_right if high_inclusive else bisect_left)(self._tags, high, key=key)
+        for position in range(end - 1, start - 1, -1):
+            if accept is None or accept(self._tags[position]):
+                return self._tags[position]
+        return None
+
+    def descending(self) -> List[str]:
+        """Every version, newest first."""
+        return self._tags[::-1]
+
+    def updated(self, tags: Iterable[str]) -> "VersionIndex":
+        """
+        Index of tags, reusing this index's order.
+
+        Returns this index when the set of tags is unchanged. Otherwise the
+        added and removed tags are bisected into a copy, unless so many
+        changed that sorting from scratch is cheaper.
+        """
+        wanted = dict.fromkeys(tags)
+        if wanted.keys() == self._members:
+            return self
+
+        removed = self._members.difference(wanted)
+        added = [tag for tag in wanted if tag not in self._members]
+        # Past as many changes as there were tags, one sort beats shifting the list per insert
+        if len(removed) + len(added) > len(self._tags):
+            return VersionIndex(wanted)
+
+        index = VersionIndex(self._tags, presorted=True)
+        for tag in removed:
+            index._remove(tag)
+        for tag in added:
+            insort_left(index._tags, tag, key=VersionParser.sort_key)
+            index._members.add(tag)
+        return index
+
+    def _remove(self, tag: str) -> None:
+        key = VersionParser.sort_key(tag)
+        low = bisect_left(self._tags, key, key=VersionParser.sort_key)
+        high = bisect_right(self._tags, key, lo=low, key=VersionParser.sort_key)
+        del self._tags[self._tags.index(tag, low, high)]
+        self._members.discard(tag)
+
+
+class VersionConstraint:
+    """
+    A range of acceptable versions, resolved to the newest matching tag.
+
+    Supported forms:
+        ^1.4               compatible release: >=1.4.0,<2.0.0 (^0.4 is >=0.4.0,<0.5.0)
+        ~2.1.0             patch releases: >=2.1.0,<2.2.0 (~2 is >=2.0.0,<3.0.0)
+        >=1.2,<2           comma-separated comparators: >=, >, <=, <, =
+        latest-timestamp   the newest timestamp tag
+
+    Semantic version ranges only match semantic versions, and skip
+    pre-releases unless one of the bounds is itself a pre-release.
+    """
+
+    __slots__ = ("spec", "low", "low_inclusive", "high", "high_inclusive", "prereleases")
+
+    LATEST_TIMESTAMP = "latest-timestamp"
+
+    def __init__(self, spec: str):
+        """
+        Parse a constraint.
+
+        Raises:
+            ValueError: If spec is not a valid constraint
+        """
+        self.spec = spec.strip()
+        self.prereleases = False
+        if self.spec == self.LATEST_TIMESTAMP:
+            self.low, self.low_inclusive = (_RANK_TIMESTAMP,), True
+            self.high, self.high_inclusive = (_RANK_LATEST,), False
+            return
+
+        # Any semantic version, until narrowed by the comparators
+        self.low, self.low_inclusive = (_RANK_SEMVER,), True
+        self.high, self.high_inclusive = (_RANK_TIMESTAMP,), False
+        for op, version in self._comparators(self.spec):
+            bound = Version.parse(version)
+            self.prereleases = self.prereleases or bool(bound.prerelease)
+            # Keep the tighter bound; at equal keys an exclusive bound is the tighter one
+            if op in (">", ">=", "=", "==") and (bound.key, op == ">") > (self.low, not self.low_inclusive):
+                self.low, self.low_inclusive = bound.key, op != ">"
+            if op in ("<", "<=", "=", "==") and (bound.key, op != "<") < (self.high, self.high_inclusive):
+                self.high, self.high_inclusive = bound.key, op != "<"
+
+    @classmethod
+    def is_constraint(cls, spec: str) -> bool:
+        """Whether a version string is a constraint rather than an exact tag."""
+        return spec == cls.LATEST_TIMESTAMP or spec[:1] in ("^", "~", "<", ">", "=")
+
+    @staticmethod
+    def _partial(text: str) -> Tuple[List[int], int, Optional[str]]:
+        """Components padded to three, how many were given, and any pre-release part."""
+        matches = _PARTIAL_RE.fullmatch(text)
+        if not matches:
+            raise ValueError(f"Invalid version in constraint: {text!r}")
+        given = [int(part) for part in matches.group(1, 2, 3) if part is not None]
+        return given + [0] * (3 - len(given)), len(given), matches.group(4)
+
+    @classmethod
+    def _comparators(cls, spec: str) -> List[Tuple[str, str]]:
+        """Expand a constraint into (operator, full version) comparators."""
+        if spec[:1] in ("^", "~"):
+            parts, given, prerelease = cls._partial(spec[1:].strip())
+            if spec[0] == "^":
+                # Bump the first non-zero component given, or the last one given
+                bump = next((i for i, part in enumerate(parts[:given]) if part), given - 1)
+            else:
+                bump = 0 if given == 1 else 1
+            upper = parts[:bump] + [parts[bump] + 1] + [0] * (2 - bump)
+            lower = ".".join(map(str, parts)) + (f"-{prerelease}" if prerelease else "")
+            return [(">=", lower), ("<", ".".join(map(str, upper)))]
+
+        comparators = []
+        for clause in spec.split(","):
+            matches = _COMPARATOR_RE.fullmatch(clause.strip())
+            if not matches:
+                raise ValueError(f"Invalid version constraint: {spec!r}")
+            parts, _, prerelease = cls._partial(matches.group(2))
+            comparators.append((matches.group(1), ".".join(map(str, parts)) + (f"-{prerelease}" if prerelease else "")))
+        return comparators
+
+    def _accept(self, tag: str) -> bool:
+        return self.prereleases or not Version.parse(tag).prerelease
+
+    def matches(self, version: str) -> bool:
+        """Whether a version satisfies the constraint."""
+        key = Version.parse(version).key
+        above = key >= self.low if self.low_inclusive else key > self.low
+        below = key <= self.high if self.high_inclusive else key < self.high
+        return above and below and self._accept(version)
+
+    def resolve(self, index: VersionIndex) -> Optional[str]:
+        """The newest version in an index satisfying the constraint, or None."""
+        return index.newest_between(self.low, self.high, self.low_inclusive, self.high_inclusive,
+                                    accept=self._accept)
 
-        # Handle 'latest' tag - it's always considered newer than anything else
-        if version2 == "latest":
-            return -1 if version1 != "latest" else 0
-        if version1 == "latest":
-            return 1 if version2 != "latest" else 0
-
-        # Different types: generally incomparable, but we'll try to keep some order
-        # Timestamp vs Semver: let's treat timestamp as newer if compared directly
-        if v1_data["type"] != v2_data["type"]:
-            # If one is semver and other is timestamp, timestamp is newer (following examplectl pattern)
-            if v1_data["type"] == "semver" and v2_data["type"] == "timestamp":
-                return -1
-            if v1_data["type"] == "timestamp" and v2_data["type"] == "semver":
-                return 1
-            # Fallback to string comparison for completely mismatched types
-            return (version1 > version2) - (version1 < version2)
-
-        # Same type: perform numeric comparison
-        for v1_comp, v2_comp in zip(v1_data["components"], v2_data["components"]):
-            if v1_comp < v2_comp:
-                return -1
-            if v1_comp > v2_comp:
-                return 1
-
-        # If components match but lengths differ (like 1.2 vs 1.2.3, though our parse enforces 3)
-        if len(v1_data["components"]) < len(v2_data["components"]):
-            return -1
-        if len(v1_data["components"]) > len(v2_data["components"]):
-            return 1
-
-        return 0
+    def __repr__(self):
+        return f"VersionConstraint({self.spec!r})"
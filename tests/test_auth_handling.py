@@ -31,6 +31,10 @@ class TestAuthHandling(unittest.TestCase):
     def test_main_retry_on_auth_fail(self, mock_connect, mock_find, mock_pull, mock_auth):
         client_obj = MagicMock()
         client_obj.container_version = "private:latest"
+        client_obj.session_mode = False
+        client_obj.prefetch_updates = False
+        client_obj.auto_gc = False
+        client_obj.exec_mode = False
         
         mock_find.return_value = None
         # First pull fails with AuthError
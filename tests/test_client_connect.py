@@ -56,7 +56,7 @@ class TestClientConnect(unittest.TestCase):
         
         client = CtlClient()
         mock_connect = MagicMock()
-        def mock_connect_impl():
+        def mock_connect_impl(lazy=False):
             client.cli = "mocked_cli_session"
             return "mocked_cli_session"
             
@@ -73,7 +73,7 @@ class TestClientConnect(unittest.TestCase):
         
         # Verify it searched using the returned session
         mock_find_newer.assert_called_once_with(
-            "mocked_cli_session", "myrepo", "myrepo:1.0"
+            "mocked_cli_session", "myrepo", "myrepo:1.0", remote=False
         )
         self.assertEqual(result, "new_version:2.0")
 
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+"""Test suite for the resident daemon and its thin client."""
+
+import io
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rapidctl.cli import daemon
+from rapidctl.cli import main
+
+
+def fake_run(client_obj, cli, argv):
+    """Stand-in for main.run that echoes its arguments and exit code."""
+    print(f"ran {' '.join(argv)}")
+    print("warning", file=sys.stderr)
+    if argv and argv[0] == "fail":
+        sys.exit(3)
+    if argv and argv[0] == "login":
+        daemon.require_local_process("login to registry")
+
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        # Unix socket paths are length limited, so keep them short
+        self.temp_dir = tempfile.mkdtemp(prefix="rctl", dir="/tmp")
+        self.path = Path(self.temp_dir) / "d.sock"
+        self.client = MagicMock()
+        self.client.session_mode = False
+        self.client.exec_mode = False
+        self.client.prefetch_updates = False
+        self.client.auto_gc = False
+
+        patcher = patch('rapidctl.cli.main.run', side_effect=fake_run)
+        self.mock_run = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.thread = threading.Thread(target=daemon.run_daemon, args=(self.client, self.path), daemon=True)
+        self.thread.start()
+        for _ in range(100):
+            if self.path.exists():
+                break
+            time.sleep(0.01)
+
+    def tearDown(self):
+        daemon.stop(self.client, self.path)
+        self.thread.join(timeout=5)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def forward(self, argv):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with patch('sys.stdout', stdout), patch('sys.stderr', stderr):
+            code = daemon.forward(self.client, argv, self.path)
+        return code, stdout.getvalue(), stderr.getvalue()
+
+    def test_forward_relays_output_and_exit_code(self):
+        """Test the client streams the daemon's stdout/stderr and returns its exit code."""
+        code, out, err = self.forward(["build", "--fast"])
+
+        self.assertEqual(code, 0)
+        self.assertEqual(out, "ran build --fast\n")
+        self.assertEqual(err, "warning\n")
+
+    def test_forward_nonzero_exit(self):
+        """Test sys.exit inside the daemon becomes the client's exit code."""
+        code, out, _ = self.forward(["fail"])
+
+        self.assertEqual(code, 3)
+        self.assertEqual(out, "ran fail\n")
+
+    def test_daemon_reuses_session(self):
+        """Test every forwarded invocation runs on the daemon's single session."""
+        self.forward(["one"])
+        self.forward(["two"])
+
+        sessions = {call.args[1] for call in self.mock_run.call_args_list}
+        self.assertEqual(sessions, {self.client.cli})
+        self.client.connect.assert_not_called()
+
+    def send(self, env):
+        sock = daemon._connect(self.path)
+        with sock, sock.makefile('rwb') as stream:
+            daemon._send(stream, {"argv": ["build"], "env": env})
+            # Read to the end so the daemon never writes to a closed socket
+            return [json.loads(line) for line in stream]
+
+    def test_connection_env_mismatch_falls_back(self):
+        """Test requests targeting a different Podman socket run in-process."""
+        self.assertEqual(self.send({"PODMAN_SOCKET": "unix:///elsewhere.sock"}), [{"fallback": True}])
+        self.mock_run.assert_not_called()
+
+    def test_settings_mismatch_falls_back(self):
+        """Test requests with other RAPIDCTL_* settings run in-process, except per-request ones."""
+        with patch.dict(os.environ, {"RAPIDCTL_SESSION": "1"}):
+            self.assertEqual(self.send({}), [{"fallback": True}])
+            self.assertEqual(self.send({"RAPIDCTL_SESSION": "1", "RAPIDCTL_PROFILE": "1"})[-1], {"exit": 0})
+
+    def test_forwards_only_settings(self):
+        """Test the request carries the rapidctl settings, not the whole environment or cwd."""
+        env = {"RAPIDCTL_REMOTE_CHECK": "1", "PODMAN_SOCKET": "unix:///p.sock", "AWS_SECRET_ACCESS_KEY": "x"}
+        self.assertEqual(daemon.forwarded_env(env), {"RAPIDCTL_REMOTE_CHECK": "1", "PODMAN_SOCKET": "unix:///p.sock"})
+
+    def test_prompt_hands_request_back(self):
+        """Test a request that needs the terminal, e.g. a login prompt, is rerun by the client."""
+        code, out, _ = self.forward(["login"])
+
+        self.assertIsNone(code)
+        self.assertEqual(out, "ran login\n")
+
+    def test_rerun_after_handback_skips_shown_output(self):
+        """Test output the daemon already showed isn't shown again when the client reruns the request."""
+        # Canned daemon side, so the client's own stdout can be captured
+        client_end, daemon_end = socket.socketpair()
+        daemon_end.sendall(b'{"stream": "stdout", "data": "ran login\\n"}\n{"fallback": true}\n')
+        stdout = io.StringIO()
+        with daemon_end, patch('rapidctl.cli.daemon._connect', return_value=client_end), \
+                patch('sys.stdout', stdout), patch('sys.stderr', io.StringIO()):
+            self.assertIsNone(daemon.forward(self.client, ["login"], self.path))
+            print("ran login")
+            print("Username: ", end="")
+
+        self.assertEqual(stdout.getvalue(), "ran login\nUsername: ")
+
+    def test_skip_shown_writes_from_first_difference(self):
+        """Test a rerun diverging from the shown output is written from the point it differs."""
+        stream = io.StringIO()
+        skipper = daemon._SkipShown(stream, "Pulling...\n")
+
+        skipper.write("Pull")
+        skipper.write("ed from cache\n")
+        skipper.write("Pulling...\n")
+
+        self.assertEqual(stream.getvalue(), "ed from cache\nPulling...\n")
+
+    @patch('rapidctl.cli.daemon._stdin_has_input', return_value=True)
+    def test_piped_stdin_not_forwarded(self, mock_stdin):
+        """Test an invocation with input on stdin runs in-process, since the daemon can't read it."""
+        self.assertIsNone(self.forward(["build"])[0])
+        self.mock_run.assert_not_called()
+
+    def test_socket_owner_only(self):
+        """Test the socket is created inaccessible to other users."""
+        self.assertEqual(os.stat(self.path).st_mode & 0o077, 0)
+
+
+class TestDaemonClient(unittest.TestCase):
+    def test_no_daemon_returns_none(self):
+        """Test forwarding without a running daemon asks for the in-process path."""
+        self.assertIsNone(daemon.forward(MagicMock(), ["build"], Path("/tmp/rapidctl-missing.sock")))
+
+    @patch('rapidctl.cli.daemon.forward')
+    def test_main_exits_with_daemon_result(self, mock_forward):
+        """Test main() exits with the daemon's code without connecting to Podman."""
+        mock_forward.return_value = 0
+        client = MagicMock()
+
+        with patch('sys.argv', ['examplectl', 'build']), self.assertRaises(SystemExit) as ctx:
+            main.main(client)
+
+        self.assertEqual(ctx.exception.code, 0)
+        client.connect.assert_not_called()
+
+    @patch('rapidctl.cli.daemon.forward')
+    def test_local_only_commands_not_forwarded(self, mock_forward):
+        """Test daemon and mcp commands always run in the invoking process."""
+        with patch('rapidctl.cli.main.run', return_value=None):
+            with patch('sys.argv', ['examplectl', '--rapidctl-daemon']):
+                main.main(MagicMock())
+
+        mock_forward.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
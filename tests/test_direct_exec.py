@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""Test suite for the direct-exec fast path that hands off to the podman binary."""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, call, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import rapidctl.cli.actions as actions
+import rapidctl.cli.tasks as tasks
+from rapidctl.bootstrap.state import StateManager
+from rapidctl.cli import daemon, main
+
+
+class TestDirectExec(unittest.TestCase):
+    def setUp(self):
+        self.session = MagicMock()
+        patcher = patch('rapidctl.cli.tasks.local_search', return_value="sha256:abc123")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_command(self):
+        with patch('builtins.print'):
+            return actions.run_container_command(
+                self.session, "repo:1.0.0", "/opt/rapidctl/cmd/", ["build", "--fast"], exec_podman=True
+            )
+
+    @patch.dict(os.environ, {}, clear=False)
+    @patch('rapidctl.cli.tasks.os.execvp')
+    @patch('rapidctl.cli.tasks.shutil.which', return_value="/usr/bin/podman")
+    def test_execs_podman_with_image_id(self, mock_which, mock_execvp):
+        """Test the command is handed back as podman run against the resolved image ID, for the caller to exec."""
+        os.environ.pop("PODMAN_SOCKET", None)
+        with patch('sys.stdin.isatty', return_value=False):
+            argv = self.run_command()
+
+        self.assertEqual(argv, [
+            "/usr/bin/podman", "run", "--rm", "-i", "abc123", "/opt/rapidctl/cmd/build", "--fast"
+        ])
+        mock_execvp.assert_not_called()
+        self.session.run_container.assert_not_called()
+
+        tasks.exec_podman(argv)
+        mock_execvp.assert_called_once_with("/usr/bin/podman", argv)
+
+    @patch('rapidctl.cli.tasks.shutil.which', return_value="/usr/bin/podman")
+    def test_explicit_socket_passed_through(self, mock_which):
+        """Test a PODMAN_SOCKET override is handed to the podman binary."""
+        with patch.dict(os.environ, {"PODMAN_SOCKET": "unix:///run/custom.sock"}):
+            argv = self.run_command()
+
+        self.assertEqual(argv[1:3], ["--url", "unix:///run/custom.sock"])
+
+    @patch('rapidctl.cli.tasks.os.execvp')
+    @patch('rapidctl.cli.tasks.shutil.which', return_value=None)
+    def test_missing_binary_falls_back_to_api(self, mock_which, mock_execvp):
+        """Test the API path is used when podman is not on PATH."""
+        self.session.run_container.return_value = iter([b"ok\n"])
+
+        self.assertIsNone(self.run_command())
+
+        mock_execvp.assert_not_called()
+        self.session.run_container.assert_called_once_with(
+            "repo:1.0.0", ["/opt/rapidctl/cmd/build", "--fast"], stream=True
+        )
+
+    @patch('rapidctl.cli.tasks.os.execvp')
+    @patch('rapidctl.cli.tasks.shutil.which', return_value="/usr/bin/podman")
+    def test_never_execs_inside_daemon(self, mock_which, mock_execvp):
+        """Test a daemon serving a forwarded request keeps using the API path."""
+        self.session.run_container.return_value = iter([])
+        token = daemon._request.set(daemon._RequestContext({"argv": []}, sys.stdout, sys.stderr))
+        try:
+            self.assertIsNone(self.run_command())
+        finally:
+            daemon._request.reset(token)
+
+        mock_execvp.assert_not_called()
+        self.session.run_container.assert_called_once()
+
+    def test_tty_only_when_interactive(self):
+        """Test -t is only requested when stdin and stdout are terminals."""
+        with patch('sys.stdin.isatty', return_value=True), patch('sys.stdout.isatty', return_value=True):
+            argv = tasks.build_podman_run_argv("podman", "abc", ["/cmd/x"])
+        self.assertIn("-t", argv)
+
+        with patch('sys.stdin.isatty', return_value=True), patch('sys.stdout.isatty', return_value=False):
+            argv = tasks.build_podman_run_argv("podman", "abc", ["/cmd/x"])
+        self.assertNotIn("-t", argv)
+
+
+class TestExecAfterRun(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.client = MagicMock()
+        self.client.container_repo = "repo"
+        self.client.baseline_version = "1.0.0"
+        self.client.update_check_interval = 3600
+        self.client.exec_mode = True
+        self.client.session_mode = False
+        self.client.prefetch_updates = False
+        self.client.auto_gc = False
+        self.client.state_manager = StateManager(state_file=Path(self.temp_dir.name) / "state.json")
+        self.addCleanup(self.client.state_manager.flush)
+
+        def slow_check():
+            time.sleep(0.2)
+            return "2.0.0"
+        self.client.check_for_updates.side_effect = slow_check
+
+    @patch.dict(os.environ, {"RAPIDCTL_NO_DAEMON": "1"})
+    @patch('rapidctl.cli.main._ensure_container_image')
+    def test_notices_printed_before_exec(self, mock_ensure):
+        """Test exec waits for the update check and prints its notice before replacing the process."""
+        argv = ["/usr/bin/podman", "run", "--rm", "abc123", "/cmd/build"]
+        order = MagicMock()
+
+        with patch('sys.argv', ["tool", "build"]), \
+             patch('rapidctl.cli.main._dispatch_subcommand', return_value=argv), \
+             patch('builtins.print', order.print), \
+             patch('rapidctl.cli.tasks.exec_podman', order.exec_podman):
+            main.main(self.client)
+
+        self.assertEqual(order.mock_calls[-1], call.exec_podman(argv))
+        self.assertIn(call.print("--- Newer container version found: 2.0.0 (Current: 1.0.0) ---"),
+                      order.mock_calls[:-1])
+        self.assertEqual(tasks.get_last_update_check(self.client.state_manager, "repo")["newer"], "2.0.0")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+"""Test suite for removing old local versions under the retention policy."""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rapidctl.bootstrap.state import StateManager
+from rapidctl.cli import PodmanCLI, main
+from rapidctl.errors import PodmanAPIError
+import rapidctl.cli.actions as actions
+import rapidctl.cli.tasks as tasks
+
+REPO = "example.com/tool"
+DAY = 86400
+
+
+def image(image_id, tags, size):
+    mock_image = MagicMock()
+    mock_image.id = image_id
+    mock_image.short_id = image_id[:12]
+    mock_image.tags = tags
+    mock_image.attrs = {"Created": 1700000000, "Size": size}
+    return mock_image
+
+
+class GcTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        env = patch.dict(os.environ, {"XDG_RUNTIME_DIR": self.temp_dir.name})
+        env.start()
+        self.addCleanup(env.stop)
+        self.state_manager = StateManager(state_file=Path(self.temp_dir.name) / "state.json")
+        self.addCleanup(self.state_manager.flush)
+
+        self.images = [
+            image("sha256:v1", [f"{REPO}:1.0.0"], 100),
+            image("sha256:v2", [f"{REPO}:1.1.0"], 200),
+            # Also tagged elsewhere, so removing 1.2.0 only untags it
+            image("sha256:v3", [f"{REPO}:1.2.0", "example.com/other:1.0"], 300),
+            image("sha256:v4", [f"{REPO}:2.0.0"], 400),
+            image("sha256:v5", [f"{REPO}:2.1.0"], 500),
+        ]
+        self.cli = PodmanCLI(state_manager=self.state_manager)
+        self.cli.client = MagicMock()
+        self.cli.client.images.list.side_effect = lambda **kwargs: list(self.images)
+        self.cli.client.images.remove.side_effect = self.remove
+        self.cli.image_store_fingerprint = MagicMock(return_value=None)
+
+    def remove(self, name):
+        for img in self.images:
+            if name in img.tags:
+                img.tags = [tag for tag in img.tags if tag != name]
+                if not img.tags:
+                    self.images.remove(img)
+                return
+        raise RuntimeError(f"{name}: image not known")
+
+    def use(self, version, days_ago):
+        usage = tasks.get_image_usage(self.state_manager, REPO)
+        usage["since"] = time.time() - 365 * DAY
+        usage["versions"][version] = time.time() - days_ago * DAY
+        self.state_manager.set_state(f"image_usage_{REPO}", usage)
+
+
+class TestGcTasks(GcTestCase):
+    def test_selection_keeps_newest_recent_and_protected(self):
+        """Test only versions outside the newest N, unused for D days and unprotected are picked."""
+        now = time.time()
+        usage = {"since": now - 365 * DAY, "versions": {"1.2.0": now - 2 * DAY, "1.1.0": now - 90 * DAY}}
+        versions = ["2.1.0", "2.0.0", "1.2.0", "1.1.0", "1.0.0"]
+
+        self.assertEqual(tasks.select_gc_versions(versions, usage, 2, 30, now=now), ["1.1.0", "1.0.0"])
+        self.assertEqual(tasks.select_gc_versions(versions, usage, 2, 30, protected={"1.0.0"}, now=now),
+                         ["1.1.0"])
+        self.assertEqual(tasks.select_gc_versions(versions, usage, 2, 100, now=now), ["1.0.0"])
+
+    def test_untracked_versions_count_from_when_tracking_began(self):
+        """Test versions with no recorded use are kept until D days after tracking started."""
+        now = time.time()
+        versions = ["2.0.0", "1.0.0"]
+
+        self.assertEqual(tasks.select_gc_versions(versions, {"since": now - DAY, "versions": {}}, 1, 30,
+                                                  now=now), [])
+        self.assertEqual(tasks.select_gc_versions(versions, {"since": now - 31 * DAY, "versions": {}}, 1, 30,
+                                                  now=now), ["1.0.0"])
+
+    def test_use_recorded_at_coarse_resolution(self):
+        """Test a version's last use is only rewritten once per IMAGE_USE_RESOLUTION."""
+        self.state_manager.set_state = MagicMock(wraps=self.state_manager.set_state)
+
+        tasks.record_image_use(self.state_manager, REPO, "1.0.0")
+        tasks.record_image_use(self.state_manager, REPO, "1.0.0")
+
+        self.assertEqual(self.state_manager.set_state.call_count, 1)
+        self.assertIn("1.0.0", tasks.get_image_usage(self.state_manager, REPO)["versions"])
+
+    def test_use_recorded_without_losing_other_processes(self):
+        """Test recording a use re-reads the state, keeping versions another process recorded."""
+        tasks.record_image_use(self.state_manager, REPO, "1.0.0")
+        other = StateManager(state_file=self.state_manager.state_file)
+        other._store = type(other._store)(other.state_file)
+        tasks.record_image_use(other, REPO, "1.1.0")
+        other.flush()
+
+        tasks.record_image_use(self.state_manager, REPO, "1.2.0")
+
+        self.state_manager.reload()
+        self.assertEqual(set(tasks.get_image_usage(self.state_manager, REPO)["versions"]),
+                         {"1.0.0", "1.1.0", "1.2.0"})
+
+    def test_reclaimable_bytes_skips_images_keeping_a_tag(self):
+        """Test only images left with no tag count towards the space reclaimed."""
+        images = [{"tags": ["a:1"], "size": 10}, {"tags": ["a:2", "b:1"], "size": 20}, {"tags": [], "size": 5}]
+        self.assertEqual(actions.reclaimable_bytes(images, ["a:1", "a:2"]), 10)
+        self.assertEqual(actions.reclaimable_bytes(images, ["a:1", "a:2", "b:1"]), 30)
+
+
+class TestGcActions(GcTestCase):
+    def test_collect_removes_and_records(self):
+        """Test collection removes the planned versions and records the bytes reclaimed."""
+        self.use("1.1.0", 1)
+
+        record = actions.collect_garbage(self.cli, REPO, self.state_manager, 2, 30, protected={"1.0.0"})
+
+        self.assertEqual(record["removed"], ["1.2.0"])
+        self.assertEqual(record["bytes"], 0)
+        self.assertFalse(record["reported"])
+        self.assertEqual(actions.list_local_versions(self.cli, REPO), ["2.1.0", "2.0.0", "1.1.0", "1.0.0"])
+
+        record = actions.collect_garbage(self.cli, REPO, self.state_manager, 2, 0)
+        self.assertEqual(record["removed"], ["1.1.0", "1.0.0"])
+        self.assertEqual(record["bytes"], 300)
+
+    def test_version_in_use_is_kept(self):
+        """Test a version podman refuses to remove is reported as failed, not removed."""
+        self.use("2.0.0", 90)
+        self.cli.client.images.remove.side_effect = RuntimeError("image is in use by a container")
+
+        record = actions.collect_garbage(self.cli, REPO, self.state_manager, 4, 30)
+
+        self.assertEqual((record["removed"], record["failed"], record["bytes"]), ([], ["1.0.0"], 0))
+
+    def test_concurrent_collection_skipped(self):
+        """Test a second collection does nothing while the first holds the repo's gc lock."""
+        fd = tasks.acquire_file_lock(tasks.gc_lock_path(REPO))
+        self.addCleanup(tasks.release_file_lock, fd)
+
+        self.assertIsNone(actions.collect_garbage(self.cli, REPO, self.state_manager, 0, 0))
+        self.cli.client.images.remove.assert_not_called()
+
+    def test_remove_image_error(self):
+        """Test a failed removal surfaces as PodmanAPIError."""
+        with self.assertRaises(PodmanAPIError):
+            self.cli.remove_image(f"{REPO}:9.9.9")
+
+    @patch('rapidctl.cli.tasks.spawn_detached')
+    @patch('rapidctl.cli.tasks.build_gc_argv', return_value=["tool", "gc", "--background"])
+    def test_start_gc(self, mock_argv, mock_spawn):
+        """Test a background collection starts unless one is already running."""
+        self.assertTrue(actions.start_gc(self.cli, REPO))
+        mock_spawn.assert_called_once_with(["tool", "gc", "--background"])
+
+        fd = tasks.acquire_file_lock(tasks.gc_lock_path(REPO))
+        self.addCleanup(tasks.release_file_lock, fd)
+        self.assertFalse(actions.start_gc(self.cli, REPO))
+
+
+class TestGcCommands(GcTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = MagicMock()
+        self.client.container_repo = REPO
+        self.client.baseline_version = "^1.0"
+        self.client.resolved_version = "1.2.0"
+        self.client.gc_keep_versions = 1
+        self.client.gc_keep_days = 30
+        self.client.auto_gc = True
+        self.client.state_manager = self.state_manager
+        self.client.cli = self.cli
+        self.use("2.1.0", 90)
+
+    @patch('builtins.print')
+    def test_dry_run(self, mock_print):
+        """Test gc --dry-run lists what would go without removing anything."""
+        main._handle_reserved_commands(self.client, self.cli, ["gc", "--dry-run"])
+
+        mock_print.assert_called_once_with(
+            f"Would remove 3 old version(s) of {REPO}: 2.0.0, 1.1.0, 1.0.0 (up to 700 B)"
+        )
+        self.cli.client.images.remove.assert_not_called()
+
+    @patch('builtins.print')
+    @patch('rapidctl.cli.actions.start_gc', return_value=True)
+    def test_gc_runs_in_background(self, mock_start, mock_print):
+        """Test gc hands the removals to a background process."""
+        main._handle_reserved_commands(self.client, self.cli, ["gc"])
+
+        mock_start.assert_called_once_with(self.cli, REPO)
+        self.cli.client.images.remove.assert_not_called()
+
+    @patch('builtins.print')
+    @patch('rapidctl.cli.main._start_update_check')
+    @patch('rapidctl.cli.tasks.lower_priority')
+    def test_background_result_reported_once(self, mock_lower, mock_check, mock_print):
+        """Test the background collection's result is left for, and printed once after, the next command."""
+        with self.assertRaises(SystemExit):
+            main.run(self.client, self.cli, ["gc", "--background"])
+
+        mock_lower.assert_called_once()
+        mock_check.assert_not_called()
+        self.assertEqual(actions.list_local_versions(self.cli, REPO), ["2.1.0", "1.2.0"])
+        mock_print.assert_not_called()
+        self.assertFalse(tasks.get_last_gc(self.state_manager, REPO)["reported"])
+
+        main._notify_gc(self.client)
+        main._notify_gc(self.client)
+
+        mock_print.assert_called_once_with(f"--- Removed 3 old version(s) of {REPO}, reclaiming 700 B ---")
+
+    @patch('builtins.print')
+    def test_gc_wait(self, mock_print):
+        """Test gc --wait removes in the foreground and reports straight away."""
+        main._handle_reserved_commands(self.client, self.cli, ["gc", "--wait"])
+
+        mock_print.assert_called_with(f"✓ Removed 3 old version(s) of {REPO}, reclaiming 700 B.")
+        self.assertTrue(tasks.get_last_gc(self.state_manager, REPO)["reported"])
+
+    @patch('rapidctl.cli.actions.start_gc')
+    def test_automatic_gc_at_most_daily(self, mock_start):
+        """Test the automatic policy starts a collection only when the last is over GC_INTERVAL old."""
+        main._maybe_start_gc(self.client)
+        mock_start.assert_called_once_with(self.cli, REPO)
+
+        tasks.record_gc(self.state_manager, REPO, [], 0, [])
+        main._maybe_start_gc(self.client)
+        self.assertEqual(mock_start.call_count, 1)
+
+    def test_run_records_use(self):
+        """Test ensuring the image for a command records the version as used."""
+        self.client.container_version = f"{REPO}:1.2.0"
+        main._ensure_container_image(self.client, self.cli)
+
+        self.assertIn("1.2.0", tasks.get_image_usage(self.state_manager, REPO)["versions"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""Test suite for reading files from image exports without a container."""
+
+import io
+import json
+import sys
+import os
+import tarfile
+import unittest
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rapidctl.utils.archive import ChunkReader, read_image_archive
+import rapidctl.cli.actions as actions
+import rapidctl.cli.tasks as tasks
+
+
+def make_tar(files):
+    """Build an uncompressed tarball from a {name: bytes or None} mapping (None = directory)."""
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            if data is None:
+                info.type = tarfile.DIRTYPE
+                tar.addfile(info)
+            else:
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+def make_archive(layers):
+    """Build a docker-archive export from a bottom-to-top list of layer file mappings."""
+    names = [f"layer{i}.tar" for i in range(len(layers))]
+    files = {name: make_tar(layer) for name, layer in zip(names, layers)}
+    files["manifest.json"] = json.dumps([{"Config": "config.json", "Layers": names}]).encode()
+    return make_tar(files)
+
+
+def chunked(data, size=100):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestReadImageArchive(unittest.TestCase):
+    def read(self, layers):
+        stream = io.BufferedReader(ChunkReader(chunked(make_archive(layers))))
+        return read_image_archive(stream, "/opt/rapidctl/commands.json", "/opt/rapidctl/cmd/")
+
+    def test_reads_file_and_listing(self):
+        """Test the file and directory listing are read from a single layer."""
+        contents, listing = self.read([{
+            "opt/rapidctl/commands.json": b'{"build": {}}',
+            "opt/rapidctl/cmd/": None,
+            "opt/rapidctl/cmd/build": b"#!/bin/sh",
+            "opt/rapidctl/cmd/test": b"#!/bin/sh",
+            "opt/rapidctl/cmd/nested/deep": b"",
+        }])
+
+        self.assertEqual(contents, b'{"build": {}}')
+        self.assertEqual(listing, ["build", "nested", "test"])
+
+    def test_upper_layer_wins(self):
+        """Test a file in an upper layer overrides the lower copy."""
+        contents, listing = self.read([
+            {"opt/rapidctl/commands.json": b"old", "opt/rapidctl/cmd/build": b""},
+            {"./opt/rapidctl/commands.json": b"new", "opt/rapidctl/cmd/deploy": b""},
+        ])
+
+        self.assertEqual(contents, b"new")
+        self.assertEqual(listing, ["build", "deploy"])
+
+    def test_whiteouts(self):
+        """Test whiteouts and opaque directories hide lower layer entries."""
+        contents, listing = self.read([
+            {"opt/rapidctl/commands.json": b"old", "opt/rapidctl/cmd/build": b"", "opt/rapidctl/cmd/test": b""},
+            {"opt/rapidctl/.wh.commands.json": b"", "opt/rapidctl/cmd/.wh.test": b""},
+        ])
+        self.assertIsNone(contents)
+        self.assertEqual(listing, ["build"])
+
+        _, listing = self.read([
+            {"opt/rapidctl/cmd/build": b""},
+            {"opt/rapidctl/cmd/.wh..wh..opq": b"", "opt/rapidctl/cmd/deploy": b""},
+        ])
+        self.assertEqual(listing, ["deploy"])
+
+    def test_missing_paths(self):
+        """Test absent paths are reported as None."""
+        contents, listing = self.read([{"usr/bin/env": b""}])
+
+        self.assertIsNone(contents)
+        self.assertIsNone(listing)
+
+
+class TestDiscoverWithoutContainer(unittest.TestCase):
+    def test_discovery_reads_image_filesystem(self):
+        """Test subcommand discovery never starts a container when the export is readable."""
+        session = MagicMock()
+        session.export_image.return_value = chunked(make_archive([{
+            "opt/rapidctl/commands.json": b'{"build": {"summary": "Build it"}}',
+        }]))
+
+        commands = actions.discover_container_subcommands(session, "repo:1.0.0", "/opt/rapidctl/cmd/")
+
+        self.assertEqual(commands, {"build": "Build it"})
+        session.run_container.assert_not_called()
+
+    def test_discovery_falls_back_to_container(self):
+        """Test discovery uses a container when the image cannot be exported."""
+        session = MagicMock()
+        session.export_image.side_effect = Exception("export not supported")
+        session.run_container.return_value = b"build\ntest\n"
+
+        commands = actions.discover_container_subcommands(session, "repo:1.0.0", "/opt/rapidctl/cmd/")
+
+        self.assertEqual(commands, {"build": "", "test": ""})
+
+    def test_large_image_not_exported(self):
+        """Test discovery in a large image goes straight to a container instead of streaming the export."""
+        large = MagicMock(id="sha256:big", short_id="big", tags=["repo:1.0.0"],
+                          attrs={"Size": tasks.ARCHIVE_READ_MAX_BYTES + 1})
+        session = MagicMock()
+        session.list_images.return_value = [large]
+        session.run_container.return_value = b"build\n"
+
+        commands = actions.discover_container_subcommands(session, "repo:1.0.0", "/opt/rapidctl/cmd/")
+
+        self.assertEqual(commands, {"build": ""})
+        session.export_image.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
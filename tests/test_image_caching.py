@@ -1,15 +1,20 @@
 #!/usr/bin/env python
 """Test suite for image caching functions."""
 
+import json
 import sys
 import os
+import threading
+import time
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from rapidctl.cli import PodmanCLI
 from rapidctl.cli.tasks import cached_local_search, cache_image_list
 from rapidctl.bootstrap.state import StateManager
+import rapidctl.cli.actions as actions
 
 class TestImageCaching(unittest.TestCase):
     def setUp(self):
@@ -64,5 +69,209 @@ class TestImageCaching(unittest.TestCase):
         self.assertEqual(cached_data[0]["tags"], ["nginx:latest"])
         self.assertEqual(kwargs["ttl"], 600)
 
+
+class TestPersistentInventory(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        from pathlib import Path
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.state_manager = StateManager(state_file=Path(self.temp_dir.name) / "state.json")
+        self.fingerprint = "1000:42"
+
+        mock_image = MagicMock()
+        mock_image.id = "sha256:abcdef"
+        mock_image.short_id = "abcdef"
+        mock_image.tags = ["repo:1.0.0"]
+        mock_image.attrs = {"Created": 1700000000, "Size": 2048}
+        self.images = [mock_image]
+
+    def tearDown(self):
+        self.state_manager.flush()
+        self.temp_dir.cleanup()
+
+    def new_session(self):
+        """Simulate a fresh invocation sharing the same state file."""
+        cli = PodmanCLI(state_manager=self.state_manager)
+        cli.client = MagicMock()
+        cli.client.images.list.return_value = self.images
+        cli.image_store_fingerprint = MagicMock(side_effect=lambda: self.fingerprint)
+        cli.events_available = MagicMock(return_value=False)
+        return cli
+
+    def test_warm_invocation_skips_listing(self):
+        """Test a second invocation is served entirely from the persistent cache."""
+        cold = self.new_session()
+        self.assertEqual(actions.find_container(cold, "repo:1.0.0"), "sha256:abcdef")
+        self.assertEqual(cold.client.images.list.call_count, 1)
+
+        warm = self.new_session()
+        self.assertEqual(actions.find_container(warm, "repo:1.0.0"), "sha256:abcdef")
+        self.assertEqual(actions.find_newer_version(warm, "repo", "0.9.0"), "1.0.0")
+        warm.client.images.list.assert_not_called()
+
+    def test_persist_skips_state_file(self):
+        """Test persisting the image list neither reloads nor locks the state file."""
+        with patch.object(self.state_manager, "transaction") as transaction, \
+                patch.object(self.state_manager, "reload") as reload:
+            actions.find_container(self.new_session(), "repo:1.0.0")
+
+        transaction.assert_not_called()
+        reload.assert_not_called()
+        self.assertEqual(self.state_manager.get_cache("podman_images_fingerprint"), self.fingerprint)
+
+    def test_store_change_invalidates_cache(self):
+        """Test a changed store fingerprint forces a fresh listing."""
+        actions.find_container(self.new_session(), "repo:1.0.0")
+
+        self.fingerprint = "2000:84"
+        changed = self.new_session()
+        actions.find_container(changed, "repo:1.0.0")
+        self.assertEqual(changed.client.images.list.call_count, 1)
+
+    def test_unobservable_store_falls_back_to_ttl(self):
+        """Test the cache is still used within its TTL when no fingerprint is available."""
+        self.fingerprint = None
+        actions.find_container(self.new_session(), "repo:1.0.0")
+
+        warm = self.new_session()
+        actions.find_container(warm, "repo:1.0.0")
+        warm.client.images.list.assert_not_called()
+
+    def test_pull_marks_persistent_cache_outdated(self):
+        """Test pulling an image marks the persisted list outdated for the next lookup."""
+        cli = self.new_session()
+        actions.find_container(cli, "repo:1.0.0")
+        self.assertIsNotNone(self.state_manager.get_cache("podman_images_fingerprint"))
+
+        cli.client.images.pull.return_value = iter([])
+        with patch('builtins.print'):
+            actions.pull_container(cli, "repo:2.0.0")
+
+        self.assertIsNone(self.state_manager.get_cache("podman_images_fingerprint"))
+        # Without an events log the next invocation relists
+        after = self.new_session()
+        actions.find_container(after, "repo:1.0.0")
+        self.assertEqual(after.client.images.list.call_count, 1)
+
+    def test_negative_entry_skips_listing(self):
+        """Test later lookups for a missing image neither list images nor load the cached list."""
+        self.assertIsNone(actions.find_container(self.new_session(), "repo:2.0.0"))
+        self.assertEqual(self.state_manager.get_cache("image_absent_repo:2.0.0"), self.fingerprint)
+
+        warm = self.new_session()
+        with patch.object(self.state_manager, "get_cache", wraps=self.state_manager.get_cache) as get_cache:
+            self.assertIsNone(actions.find_container(warm, "repo:2.0.0"))
+            self.assertIsNone(actions.find_container(warm, "repo:2.0.0"))
+
+        self.assertNotIn("podman_images", [c.args[0] for c in get_cache.call_args_list])
+        warm.client.images.list.assert_not_called()
+
+    def test_negative_entry_voided_by_store_change(self):
+        """Test a missing image is looked for again once the image store changes."""
+        actions.find_container(self.new_session(), "repo:2.0.0")
+
+        self.fingerprint = "2000:84"
+        changed = self.new_session()
+        actions.find_container(changed, "repo:2.0.0")
+        self.assertEqual(changed.client.images.list.call_count, 1)
+
+        changed.inventory.invalidate()
+        after = self.new_session()
+        actions.find_container(after, "repo:2.0.0")
+        self.assertEqual(after.client.images.list.call_count, 1)
+
+    def test_pull_clears_negative_entry(self):
+        """Test pulling an image drops the record that it was missing."""
+        self.state_manager.set_cache("image_absent_repo:2.0.0", True, ttl=60)
+        cli = self.new_session()
+        cli.client.images.pull.return_value = iter([])
+        with patch('builtins.print'):
+            actions.pull_container(cli, "repo:2.0.0")
+
+        self.assertIsNone(self.state_manager.get_cache("image_absent_repo:2.0.0"))
+
+    def test_stale_list_served_while_refreshing(self):
+        """Test a list past its TTL is served at once and relisted in the background."""
+        self.fingerprint = None
+        actions.find_container(self.new_session(), "repo:1.0.0")
+        # Age the cached entries past their TTL but within the grace window
+        for key in ("podman_images", "podman_images_fingerprint"):
+            path = self.state_manager._store.cache.path_for(key)
+            payload = json.loads(path.read_text())
+            payload["fresh_until"] = time.time() - 1
+            path.write_text(json.dumps(payload))
+            os.utime(path, (time.time(), time.time() + 600))
+
+        warm = self.new_session()
+        release = threading.Event()
+        warm.client.images.list.side_effect = lambda *a, **k: release.wait(5) and self.images
+        self.assertEqual(actions.find_container(warm, "repo:1.0.0"), "sha256:abcdef")
+        release.set()
+
+        # Wait for the refresh to finish writing before the temp dir goes away
+        stats = self.state_manager._store.cache.stats
+        deadline = time.monotonic() + 5
+        while stats._refreshing and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(warm.client.images.list.call_count, 1)
+        self.assertIsNotNone(self.state_manager.get_cache("podman_images"))
+        self.assertGreaterEqual(self.state_manager.cache_stats()["stale"], 1)
+
+
+class TestSubcommandCache(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        from pathlib import Path
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.state_manager = StateManager(state_file=Path(self.temp_dir.name) / "state.json")
+
+        self.cli = PodmanCLI(state_manager=self.state_manager)
+        self.cli.client = MagicMock()
+        self.cli.image_store_fingerprint = MagicMock(return_value=None)
+        self.cli.events_available = MagicMock(return_value=False)
+        self.set_image("sha256:111111")
+        self.cli.run_container = MagicMock(return_value=b'{"build": {"summary": "Build it"}}')
+
+    def tearDown(self):
+        self.state_manager.flush()
+        self.temp_dir.cleanup()
+
+    def set_image(self, image_id):
+        mock_image = MagicMock()
+        mock_image.id = image_id
+        mock_image.short_id = image_id[7:19]
+        mock_image.tags = ["repo:1.0.0"]
+        self.cli.client.images.list.return_value = [mock_image]
+        self.cli.inventory.invalidate()
+
+    def test_subcommands_discovered_once_per_image(self):
+        """Test repeated lookups for the same image never start another container."""
+        first = actions.get_container_subcommands(self.cli, "repo:1.0.0", "/opt/rapidctl/cmd/", self.state_manager)
+        second = actions.get_container_subcommands(self.cli, "repo:1.0.0", "/opt/rapidctl/cmd/", self.state_manager)
+
+        self.assertEqual(first, {"build": "Build it"})
+        self.assertEqual(second, first)
+        self.cli.run_container.assert_called_once()
+
+    def test_new_image_rediscovers(self):
+        """Test a changed image ID bypasses the cached map."""
+        actions.get_container_subcommands(self.cli, "repo:1.0.0", "/opt/rapidctl/cmd/", self.state_manager)
+
+        self.set_image("sha256:222222")
+        self.cli.run_container.return_value = b'{"deploy": {"summary": "Deploy it"}}'
+        commands = actions.get_container_subcommands(self.cli, "repo:1.0.0", "/opt/rapidctl/cmd/", self.state_manager)
+
+        self.assertEqual(commands, {"deploy": "Deploy it"})
+        self.assertEqual(self.cli.run_container.call_count, 2)
+
+    def test_failed_discovery_not_cached(self):
+        """Test an empty result from failed discovery is retried next time."""
+        self.cli.run_container.side_effect = Exception("container failed")
+        with patch('builtins.print'):
+            self.assertEqual(actions.get_container_subcommands(self.cli, "repo:1.0.0", "/cmd/", self.state_manager), {})
+
+        self.assertIsNone(self.state_manager.get_cache("subcommands_sha256:111111"))
+
+
 if __name__ == "__main__":
     unittest.main()
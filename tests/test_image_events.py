@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+"""Test suite for keeping the image inventory current from Podman events."""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock
+from pathlib import Path
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rapidctl.bootstrap.state import StateManager
+from rapidctl.cli import PodmanCLI
+from rapidctl.cli.inventory import apply_image_events
+from rapidctl.errors import PodmanAPIError
+import rapidctl.cli.actions as actions
+
+
+def event(action, image_id, name=None, when=None):
+    """A decoded image event as the Podman events API reports it."""
+    return {
+        "Type": "image",
+        "Action": action,
+        "Actor": {"ID": image_id, "Attributes": {"name": name} if name else {}},
+        "time": when or int(time.time()),
+    }
+
+
+def image(image_id, tags):
+    mock_image = MagicMock()
+    mock_image.id = image_id
+    mock_image.short_id = image_id[:12]
+    mock_image.tags = tags
+    mock_image.attrs = {"Created": 1700000000, "Size": 1024}
+    return mock_image
+
+
+def entry(image_id, tags):
+    return {"id": image_id, "short_id": image_id[:12], "tags": tags, "created": 1700000000, "size": 1024}
+
+
+class TestApplyImageEvents(unittest.TestCase):
+    def setUp(self):
+        self.entries = [entry("aaa", ["repo:1.0.0", "repo:latest"]), entry("bbb", ["other:1.0"])]
+        self.lookup = MagicMock(side_effect=lambda ref: entry("ccc", ["repo:2.0.0", "repo:latest"]))
+
+    def test_pull_moves_tag_to_new_image(self):
+        """Test a pulled image is looked up once and takes over tags it now holds."""
+        result = apply_image_events(self.entries, [
+            event("pull", "ccc", "repo:2.0.0"),
+            event("tag", "ccc", "repo:latest"),
+        ], self.lookup)
+
+        by_id = {e["id"]: e["tags"] for e in result}
+        self.assertEqual(by_id, {"aaa": ["repo:1.0.0"], "bbb": ["other:1.0"], "ccc": ["repo:2.0.0", "repo:latest"]})
+        self.lookup.assert_called_once_with("ccc")
+        self.assertEqual(self.entries[0]["tags"], ["repo:1.0.0", "repo:latest"])
+
+    def test_untag_and_remove(self):
+        """Test untag and remove events are applied without any lookup."""
+        result = apply_image_events(self.entries, [
+            event("untag", "aaa", "repo:latest"),
+            event("remove", "sha256:bbb"),
+            event("push", "aaa", "repo:1.0.0"),
+        ], self.lookup)
+
+        self.assertEqual(result, [entry("aaa", ["repo:1.0.0"])])
+        self.lookup.assert_not_called()
+
+    def test_pulled_then_removed_needs_no_lookup(self):
+        """Test an image removed later in the same batch is never looked up."""
+        result = apply_image_events(self.entries, [event("pull", "ccc", "repo:2.0.0"), event("remove", "ccc")],
+                                    self.lookup)
+
+        self.assertEqual(len(result), 2)
+        self.lookup.assert_not_called()
+
+    def test_unappliable_events_force_full_listing(self):
+        """Test unknown actions or failed lookups return None."""
+        self.assertIsNone(apply_image_events(self.entries, [event("prune", "aaa")], self.lookup))
+        self.lookup.side_effect = lambda ref: None
+        self.assertIsNone(apply_image_events(self.entries, [event("pull", "ccc", "repo:2.0.0")], self.lookup))
+
+
+class TestEventCatchUp(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.state_manager = StateManager(state_file=Path(self.temp_dir.name) / "state.json")
+        self.addCleanup(self.state_manager.flush)
+        self.fingerprint = "1:1"
+        self.images = [image("aaa", ["repo:1.0.0"])]
+
+    def new_session(self):
+        cli = PodmanCLI(state_manager=self.state_manager)
+        cli.client = MagicMock()
+        cli.client.images.list.side_effect = lambda **kwargs: list(self.images)
+        cli.image_store_fingerprint = MagicMock(side_effect=lambda: self.fingerprint)
+        cli.events_available = MagicMock(return_value=True)
+        return cli
+
+    def test_store_change_caught_up_from_events(self):
+        """Test a changed store is brought up to date from events instead of relisted."""
+        actions.find_container(self.new_session(), "repo:1.0.0")
+
+        self.fingerprint = "2:2"
+        cli = self.new_session()
+        cli.client.events.return_value = iter([event("pull", "bbb", "repo:2.0.0")])
+        cli.client.images.get.return_value = image("bbb", ["repo:2.0.0"])
+
+        self.assertEqual(actions.find_container(cli, "repo:2.0.0"), "bbb")
+        self.assertEqual(actions.list_local_versions(cli, "repo"), ["2.0.0", "1.0.0"])
+        cli.client.images.list.assert_not_called()
+        self.assertEqual(cli.client.events.call_args.kwargs["filters"], {"type": "image"})
+        # A future 'until' would hold the stream open until it passes
+        self.assertLessEqual(cli.client.events.call_args.kwargs["until"], time.time())
+
+        # The caught-up list is persisted with the new fingerprint
+        warm = self.new_session()
+        self.assertEqual(actions.find_container(warm, "repo:2.0.0"), "bbb")
+        warm.client.events.assert_not_called()
+
+    def test_events_failure_falls_back_to_listing(self):
+        """Test an unreadable events log falls back to a full listing."""
+        actions.find_container(self.new_session(), "repo:1.0.0")
+
+        self.fingerprint = "2:2"
+        cli = self.new_session()
+        cli.image_events = MagicMock(side_effect=PodmanAPIError("no events"))
+        actions.find_container(cli, "repo:1.0.0")
+
+        cli.client.images.list.assert_called_once()
+
+    def test_version_index_persisted_and_updated(self):
+        """Test the sorted version index is reused across invocations and patched by catch-up."""
+        self.images.append(image("bbb", ["repo:1.2.0"]))
+        actions.find_container(self.new_session(), "repo:1.0.0")
+
+        with unittest.mock.patch("rapidctl.utils.version.sorted") as mock_sorted:
+            self.assertEqual(actions.find_newer_version(self.new_session(), "repo", "1.0.0"), "1.2.0")
+
+            self.fingerprint = "2:2"
+            cli = self.new_session()
+            cli.client.events.return_value = iter([event("pull", "ccc", "repo:1.1.0")])
+            cli.client.images.get.return_value = image("ccc", ["repo:1.1.0"])
+            self.assertEqual(actions.list_local_versions(cli, "repo"), ["1.2.0", "1.1.0", "1.0.0"])
+        mock_sorted.assert_not_called()
+
+        stored = self.state_manager.get_cache("podman_version_index")
+        self.assertEqual(stored["repos"], {"repo": ["1.0.0", "1.1.0", "1.2.0"]})
+
+    def test_watch_applies_live_events(self):
+        """Test the events listener updates the snapshot and persisted list as changes happen."""
+        cli = self.new_session()
+        release = threading.Event()
+
+        def stream(since):
+            yield event("remove", "aaa")
+            release.wait(5)
+
+        cli.stream_image_events = MagicMock(side_effect=stream)
+        cli.inventory.watch()
+        self.addCleanup(release.set)
+        self.addCleanup(cli.inventory.stop_watching)
+
+        deadline = time.monotonic() + 5
+        while self.state_manager.get_cache("podman_images") != [] and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertTrue(cli.inventory.watching)
+        self.assertIsNone(actions.find_container(cli, "repo:1.0.0"))
+        self.assertEqual(self.state_manager.get_cache("podman_images"), [])
+        cli.client.images.list.assert_called_once()
+
+
+class TestEventsAvailable(unittest.TestCase):
+    def test_event_logger_remembered_per_socket(self):
+        """Test Podman is asked about its event logger once and the answer is kept."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            state_manager = StateManager(state_file=Path(temp_dir) / "state.json")
+            cli = PodmanCLI(state_manager=state_manager)
+            cli.socket_path = "unix:///run/podman.sock"
+            cli.client = MagicMock()
+            cli.client.info.return_value = {
+                "store": {"graphRoot": temp_dir, "graphDriverName": "overlay"},
+                "host": {"eventLogger": "journald"},
+            }
+
+            self.assertTrue(cli.events_available())
+            self.assertTrue(cli.events_available())
+            cli.client.info.assert_called_once()
+
+            cli.client.info.return_value["host"]["eventLogger"] = "none"
+            cli.socket_path = "unix:///other.sock"
+            self.assertFalse(cli.events_available())
+
+
+if __name__ == "__main__":
+    unittest.main()
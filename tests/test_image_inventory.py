@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""Test suite for the invocation-scoped image inventory."""
+
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rapidctl.cli import PodmanCLI
+from rapidctl.cli.inventory import ImageInventory, split_image_tag
+import rapidctl.cli.actions as actions
+import rapidctl.cli.tasks as tasks
+
+
+def make_image(image_id, tags, created=0):
+    img = MagicMock()
+    img.id = image_id
+    img.short_id = image_id[:12]
+    img.tags = tags
+    img.attrs = {"Created": created, "Size": 1024}
+    return img
+
+
+class TestSplitImageTag(unittest.TestCase):
+    def test_split_with_tag(self):
+        self.assertEqual(split_image_tag("docker.io/org/tool:1.0.0"), ("docker.io/org/tool", "1.0.0"))
+
+    def test_split_registry_port(self):
+        self.assertEqual(split_image_tag("localhost:5000/tool:v2"), ("localhost:5000/tool", "v2"))
+        self.assertEqual(split_image_tag("localhost:5000/tool"), ("localhost:5000/tool", "latest"))
+
+    def test_split_without_tag(self):
+        self.assertEqual(split_image_tag("ubuntu"), ("ubuntu", "latest"))
+
+
+class TestImageInventory(unittest.TestCase):
+    def setUp(self):
+        self.cli = PodmanCLI()
+        self.cli.client = MagicMock()
+        self.cli.client.images.list.return_value = [
+            make_image("sha256:aaa111", ["repo:1.0.0", "repo:v1.0.0"], created=100),
+            make_image("sha256:bbb222", ["repo:1.2.0"], created=200),
+            make_image("sha256:ccc333", ["other:2.0.0"], created=300),
+        ]
+
+    def test_session_owns_inventory(self):
+        """Test the PodmanCLI session exposes a shared inventory."""
+        self.assertIsInstance(self.cli.inventory, ImageInventory)
+        self.assertIs(tasks.get_image_inventory(self.cli), self.cli.inventory)
+
+    def test_startup_phases_share_one_listing(self):
+        """Test every lookup in an invocation is served from a single list_images call."""
+        newer = actions.find_newer_version(self.cli, "repo", "1.0.0")
+        image_id = actions.find_container(self.cli, "repo:1.2.0")
+        versions = actions.list_local_versions(self.cli, "repo")
+        tags = tasks.get_local_image_tags(self.cli, "other")
+
+        self.assertEqual(newer, "1.2.0")
+        self.assertEqual(image_id, "sha256:bbb222")
+        self.assertEqual(versions, ["1.2.0", "1.0.0", "v1.0.0"])
+        self.assertEqual(tags, ["2.0.0"])
+        self.assertEqual(self.cli.client.images.list.call_count, 1)
+
+    def test_missing_image(self):
+        """Test lookups for unknown images return None without refetching."""
+        self.assertIsNone(actions.find_container(self.cli, "repo:9.9.9"))
+        self.assertIsNone(actions.find_container(self.cli, "missing:latest"))
+        self.assertEqual(self.cli.client.images.list.call_count, 1)
+
+    def test_pull_invalidates_inventory(self):
+        """Test pulling an image forces the next lookup to fetch a fresh listing."""
+        self.assertIsNone(actions.find_container(self.cli, "repo:2.0.0"))
+
+        self.cli.client.images.pull.return_value = iter([])
+        self.cli.client.images.get.return_value = make_image("sha256:ddd444", ["repo:2.0.0"])
+        self.cli.client.images.list.return_value.append(
+            make_image("sha256:ddd444", ["repo:2.0.0"], created=400)
+        )
+
+        with patch('builtins.print'):
+            actions.pull_container(self.cli, "repo:2.0.0")
+
+        self.assertFalse(self.cli.inventory.loaded)
+        self.assertEqual(actions.find_container(self.cli, "repo:2.0.0"), "sha256:ddd444")
+        self.assertEqual(self.cli.client.images.list.call_count, 2)
+
+    def test_sessions_without_inventory(self):
+        """Test sessions lacking an inventory still work through a throwaway snapshot."""
+        session = MagicMock(spec=["list_images"])
+        session.list_images.return_value = [make_image("sha256:eee555", ["repo:3.0.0"])]
+
+        self.assertEqual(tasks.local_search(session, "repo:3.0.0"), "sha256:eee555")
+
+
+if __name__ == "__main__":
+    unittest.main()
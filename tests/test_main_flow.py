@@ -3,12 +3,18 @@
 
 import sys
 import os
+import tempfile
+import threading
+import time
 import unittest
-from unittest.mock import patch, MagicMock
+from pathlib import Path
+from unittest.mock import patch, MagicMock, PropertyMock
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from rapidctl.bootstrap.state import StateManager
 from rapidctl.cli import main
+from rapidctl.errors import PodmanActionError
 
 class TestMainFlow(unittest.TestCase):
     def setUp(self):
@@ -18,13 +24,24 @@ class TestMainFlow(unittest.TestCase):
         self.mock_client.container_repo = "ubuntu"
         self.mock_client.baseline_version = "ubuntu:1.0"
         self.mock_client.command_path = "/cmd/"
+        self.mock_client.session_mode = False
+        self.mock_client.prefetch_updates = False
+        self.mock_client.auto_gc = False
+        self.mock_client.exec_mode = False
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
 
     @patch('builtins.print')
     def test_update_notification_shown(self, mock_print):
         """Test updates notification is shown if newer exists."""
         self.mock_client.check_for_updates.return_value = "ubuntu:2.0"
-        
-        main._check_and_notify_updates(self.mock_client)
+        self.mock_client.state_manager = StateManager(state_file=Path(self.temp_dir.name) / "state.json")
+        self.addCleanup(self.mock_client.state_manager.flush)
+        self.mock_client.update_check_interval = 3600
+
+        check = main._start_update_check(self.mock_client)
+        check.join()
+        main._notify_updates(self.mock_client, check)
         
         mock_print.assert_any_call("--- Newer container version found: ubuntu:2.0 (Current: ubuntu:1.0) ---")
 
@@ -38,6 +55,22 @@ class TestMainFlow(unittest.TestCase):
         mock_display.assert_called_once()
         mock_exit.assert_called_with(0)
 
+    @patch('builtins.print')
+    def test_unresolved_constraint_reported(self, mock_print):
+        """Test --version and apply-update report a constraint nothing matches instead of failing."""
+        self.mock_client.baseline_version = "^9"
+        unresolved = PodmanActionError("No version of ubuntu matches '^9'")
+        type(self.mock_client).container_version = PropertyMock(side_effect=unresolved)
+        type(self.mock_client).resolved_version = PropertyMock(side_effect=unresolved)
+
+        self.assertTrue(main._handle_reserved_commands(self.mock_client, self.mock_client.cli, ["--version"]))
+        mock_print.assert_called_with("Container version: ubuntu:^9 (unresolved)")
+
+        with self.assertRaises(SystemExit) as raised:
+            main._handle_reserved_commands(self.mock_client, self.mock_client.cli, ["apply-update"])
+        self.assertEqual(raised.exception.code, 1)
+        mock_print.assert_called_with("✗ Error: No version of ubuntu matches '^9'")
+
     @patch('rapidctl.cli.actions.get_container_subcommands')
     @patch('builtins.print')
     @patch('sys.exit')
@@ -61,5 +94,109 @@ class TestMainFlow(unittest.TestCase):
         self.assertIn("build                - builds things", out)
         self.assertIn("run", out)
 
+class TestCacheCommand(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.mock_client = MagicMock()
+        self.mock_client.state_manager = StateManager(state_file=Path(self.temp_dir.name) / "state.json")
+        self.mock_client.state_manager.set_cache("live", "x" * 2048, ttl=60)
+        self.mock_client.state_manager.set_cache("stale", "y", ttl=-1)
+
+    @patch('builtins.print')
+    def test_cache_stats(self, mock_print):
+        """Test `cache stats` reports entries, size and lookup counters."""
+        self.assertTrue(main._handle_reserved_commands(self.mock_client, None, ["cache", "stats"]))
+
+        mock_print.assert_any_call("Cache entries: 2 of 2000 (1 expired)")
+        output = " ".join(str(c.args[0]) for c in mock_print.call_args_list)
+        self.assertIn("Cache size: 2.1 KB of 64.0 MB", output)
+        self.assertIn("Lookups this process:", output)
+
+    @patch('builtins.print')
+    def test_cache_prune(self, mock_print):
+        """Test `cache prune` removes expired entries and reports what is left."""
+        self.assertTrue(main._handle_reserved_commands(self.mock_client, None, ["cache", "prune"]))
+
+        self.assertEqual(self.mock_client.state_manager.cache_usage()["entries"], 1)
+        self.assertIn("Removed 1 expired and 0 least recently used entries", mock_print.call_args.args[0])
+
+    @patch('builtins.print')
+    def test_unknown_cache_command(self, mock_print):
+        """Test an unknown cache subcommand exits with an error."""
+        with self.assertRaises(SystemExit) as raised:
+            main._handle_reserved_commands(self.mock_client, None, ["cache", "bogus"])
+        self.assertEqual(raised.exception.code, 1)
+
+
+class TestUpdateCheck(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.client = MagicMock()
+        self.client.container_repo = "ubuntu"
+        self.client.baseline_version = "1.0"
+        self.client.update_check_interval = 3600
+        self.client.check_for_updates.return_value = "2.0"
+        self.client.prefetch_updates = False
+        self.client.auto_gc = False
+        self.client.state_manager = StateManager(state_file=Path(self.temp_dir.name) / "state.json")
+        self.addCleanup(self.client.state_manager.flush)
+
+    def test_check_rate_limited(self):
+        """Test a fresh recorded result skips the check and still drives the notice."""
+        main._start_update_check(self.client).join()
+
+        self.assertIsNone(main._start_update_check(self.client))
+        self.client.check_for_updates.assert_called_once()
+
+        with patch('builtins.print') as mock_print:
+            main._notify_updates(self.client, None)
+        mock_print.assert_any_call("--- Newer container version found: 2.0 (Current: 1.0) ---")
+
+    def test_notice_shows_resolved_constraint(self):
+        """Test a constraint baseline is reported as the tag it resolved to, with the constraint."""
+        self.client.baseline_version = "^1.0"
+        self.client.resolved_version = "1.4.2"
+        main._start_update_check(self.client).join()
+
+        with patch('builtins.print') as mock_print:
+            main._notify_updates(self.client, None)
+        mock_print.assert_any_call("--- Newer container version found: 2.0 (Current: 1.4.2 (^1.0)) ---")
+
+    def test_check_due_after_interval_or_baseline_change(self):
+        """Test an expired result or a different baseline triggers a new check."""
+        self.client.state_manager.set_state("update_check_ubuntu", {
+            "timestamp": time.time() - 7200, "baseline": "1.0", "newer": None
+        })
+        main._start_update_check(self.client).join()
+        self.assertEqual(self.client.check_for_updates.call_count, 1)
+
+        self.client.baseline_version = "2.0"
+        check = main._start_update_check(self.client)
+        self.assertIsNotNone(check)
+        check.join()
+
+    def test_command_never_waits_on_check(self):
+        """Test the command runs while the check is blocked, and no notice is printed for it."""
+        release = threading.Event()
+        self.client.check_for_updates.side_effect = lambda: release.wait(5) and "2.0"
+
+        with patch('rapidctl.cli.main._handle_reserved_commands', return_value=False), \
+             patch('rapidctl.cli.main._ensure_container_image'), \
+             patch('rapidctl.cli.main._dispatch_subcommand', return_value=None) as mock_dispatch, \
+             patch('builtins.print') as mock_print:
+            main.run(self.client, self.client.cli, ["build"])
+
+        mock_dispatch.assert_called_once()
+        mock_print.assert_not_called()
+        release.set()
+        # Let the background check record its result before the temp dir goes away
+        for _ in range(500):
+            if self.client.state_manager.get_state("update_check_ubuntu"):
+                break
+            time.sleep(0.01)
+
+
 if __name__ == "__main__":
     unittest.main()
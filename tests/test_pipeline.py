@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""Test suite for overlapping startup phases."""
+
+import contextvars
+import os
+import subprocess
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rapidctl.cli import main
+from rapidctl.cli.pipeline import Pipeline
+from rapidctl.utils import profile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+marker = contextvars.ContextVar("marker", default=None)
+
+
+class TestPipeline(unittest.TestCase):
+    def tearDown(self):
+        profile.start(None)
+
+    def test_phases_overlap(self):
+        """Test independent phases run concurrently rather than back to back."""
+        started = time.perf_counter()
+        with Pipeline() as stages:
+            futures = [stages.submit(time.sleep, 0.2) for _ in range(3)]
+            for future in futures:
+                future.result()
+
+        self.assertLess(time.perf_counter() - started, 0.5)
+
+    def test_context_follows_phase(self):
+        """Test phases see the submitting context, e.g. daemon routing and profiling."""
+        marker.set("request-1")
+        profile.start("1")
+
+        def phase():
+            with profile.phase("worker"):
+                return marker.get()
+
+        with Pipeline() as stages:
+            self.assertEqual(stages.submit(phase).result(), "request-1")
+
+        self.assertEqual([r["phase"] for r in profile._current().records], ["worker"])
+
+    def test_abort_cleans_up_speculative_work(self):
+        """Test failing out of the block undoes phases whose results were never taken."""
+        cleaned = []
+
+        with self.assertRaises(SystemExit):
+            with Pipeline() as stages:
+                done = stages.submit(lambda: "container-1", cleanup=cleaned.append)
+                taken = stages.submit(lambda: "container-2", cleanup=cleaned.append)
+                stages.take(taken)
+                done.result()
+                sys.exit(1)
+
+        self.assertEqual(cleaned, ["container-1"])
+
+    def test_abort_cancels_pending_phases(self):
+        """Test phases queued behind a failure never start."""
+        release = threading.Event()
+        ran = []
+
+        with self.assertRaises(RuntimeError):
+            with Pipeline(max_workers=1) as stages:
+                stages.submit(release.wait, 5)
+                stages.submit(ran.append, "late", cleanup=lambda result: None)
+                release.set()
+                raise RuntimeError("image ensure failed")
+
+        self.assertEqual(ran, [])
+
+    def test_exit_abandons_running_phase(self):
+        """Test an exiting process doesn't wait for a phase still running, e.g. an image pull."""
+        code = (
+            "import sys, time\n"
+            "from rapidctl.cli.pipeline import Pipeline\n"
+            "with Pipeline() as stages:\n"
+            "    stages.submit(time.sleep, 60)\n"
+            "    sys.exit(2)\n"
+        )
+        started = time.monotonic()
+        result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, timeout=30)
+
+        self.assertEqual(result.returncode, 2)
+        self.assertLess(time.monotonic() - started, 15)
+
+
+class TestStartupOverlap(unittest.TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.container_version = "repo:1.0.0"
+        self.client.command_path = "/cmd/"
+        self.client.session_mode = False
+        self.client.prefetch_updates = False
+        self.client.auto_gc = False
+        self.client.exec_mode = False
+        self.cli = MagicMock()
+
+    @patch('rapidctl.cli.main._handle_reserved_commands', return_value=False)
+    @patch('rapidctl.cli.main._start_update_check', return_value=None)
+    @patch('rapidctl.cli.actions.run_container_command')
+    @patch('rapidctl.cli.actions.prepare_container_command')
+    @patch('rapidctl.cli.actions.get_cached_container_subcommands')
+    def test_validation_overlaps_image_check(self, mock_cached, mock_prepare, mock_run, *_):
+        """Test cached validation runs while the image check is still in flight."""
+        image_checked = threading.Event()
+        validated_early = []
+
+        def slow_ensure(client_obj, cli):
+            time.sleep(0.2)
+            image_checked.set()
+
+        def cached(*args):
+            validated_early.append(not image_checked.is_set())
+            return {"build": ""}
+
+        mock_cached.side_effect = cached
+        with patch('rapidctl.cli.main._ensure_container_image', side_effect=slow_ensure):
+            main.run(self.client, self.cli, ["build"])
+
+        self.assertEqual(validated_early, [True])
+        mock_run.assert_called_once_with(
+            self.cli, "repo:1.0.0", "/cmd/", ["build"], container=mock_prepare.return_value, exec_podman=False
+        )
+
+    @patch('rapidctl.cli.main._handle_reserved_commands', return_value=False)
+    @patch('rapidctl.cli.main._start_update_check', return_value=None)
+    @patch('rapidctl.cli.main._ensure_container_image')
+    @patch('rapidctl.cli.actions.discard_container')
+    @patch('rapidctl.cli.actions.prepare_container_command')
+    @patch('rapidctl.cli.actions.get_cached_container_subcommands')
+    def test_invalid_subcommand_discards_prepared_container(self, mock_cached, mock_prepare, mock_discard, *_):
+        """Test a container created ahead of validation is removed when validation fails."""
+        created = threading.Event()
+        container = MagicMock()
+        mock_prepare.side_effect = lambda *args: created.set() or container
+        # Hold validation until the container exists, so it is cleaned up rather than cancelled
+        mock_cached.side_effect = lambda *args: created.wait(5) and {"build": ""}
+
+        with patch('builtins.print'), self.assertRaises(SystemExit):
+            main.run(self.client, self.cli, ["biuld"])
+
+        for _ in range(100):
+            if mock_discard.called:
+                break
+            time.sleep(0.01)
+        mock_discard.assert_called_once_with(self.cli, container)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+"""Test suite for pre-pulling newer versions in a detached background process."""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rapidctl.bootstrap.state import StateManager
+from rapidctl.cli import main
+import rapidctl.cli.actions as actions
+import rapidctl.cli.tasks as tasks
+
+
+class PrefetchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        env = patch.dict(os.environ, {"XDG_RUNTIME_DIR": self.temp_dir.name})
+        env.start()
+        self.addCleanup(env.stop)
+        self.state_manager = StateManager(state_file=Path(self.temp_dir.name) / "state.json")
+        self.addCleanup(self.state_manager.flush)
+        self.lock_path = tasks.prefetch_lock_path("example.com/tool")
+
+    def hold_lock(self):
+        fd = tasks.acquire_file_lock(self.lock_path)
+        self.addCleanup(tasks.release_file_lock, fd)
+        return fd
+
+
+class TestPrefetchTasks(PrefetchTestCase):
+    def test_lock_is_exclusive(self):
+        """Test a held prefetch lock can't be taken again until released."""
+        fd = tasks.acquire_file_lock(self.lock_path)
+        self.assertIsNotNone(fd)
+        self.assertIsNone(tasks.acquire_file_lock(self.lock_path))
+
+        tasks.release_file_lock(fd)
+        fd = tasks.acquire_file_lock(self.lock_path)
+        self.assertIsNotNone(fd)
+        tasks.release_file_lock(fd)
+
+    @patch('rapidctl.cli.tasks.shutil.which', return_value="/usr/bin/ionice")
+    def test_argv_runs_tool_at_idle_io_priority(self, mock_which):
+        """Test the prefetch re-runs this tool's script under the idle I/O class."""
+        with patch.object(sys, "argv", [__file__]):
+            argv = tasks.build_prefetch_argv("2.0.0")
+
+        self.assertEqual(argv, ["/usr/bin/ionice", "-c", "3", sys.executable, os.path.abspath(__file__),
+                                "--rapidctl-prefetch", "2.0.0"])
+        with patch.object(sys, "argv", ["-c"]):
+            self.assertIsNone(tasks.build_prefetch_argv("2.0.0"))
+
+    def test_spawn_detached(self):
+        """Test the spawned process runs in its own session and bypasses the daemon."""
+        marker = Path(self.temp_dir.name) / "marker"
+        code = f"import os; open({str(marker)!r}, 'w').write(f\"{{os.getsid(0) == os.getpid()}} {{os.environ['RAPIDCTL_NO_DAEMON']}}\")"
+
+        tasks.spawn_detached([sys.executable, "-c", code]).wait(10)
+
+        self.assertEqual(marker.read_text(), "True 1")
+
+
+class TestPrefetchActions(PrefetchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cli = MagicMock()
+        self.cli.list_images.return_value = []
+        self.cli.pull_image.return_value = {"Id": "sha256:new"}
+
+    @patch('rapidctl.cli.tasks.spawn_detached')
+    @patch('rapidctl.cli.tasks.build_prefetch_argv', return_value=["tool", "--rapidctl-prefetch", "2.0.0"])
+    def test_start_prefetch(self, mock_argv, mock_spawn):
+        """Test a prefetch process starts unless the version is local or one is already running."""
+        self.assertTrue(actions.start_prefetch(self.cli, "example.com/tool", "2.0.0"))
+        mock_spawn.assert_called_once_with(["tool", "--rapidctl-prefetch", "2.0.0"])
+
+        self.hold_lock()
+        self.assertFalse(actions.start_prefetch(self.cli, "example.com/tool", "2.0.0"))
+
+        local = MagicMock(id="sha256:old", short_id="old", tags=["example.com/tool:2.0.0"], attrs={})
+        self.cli.list_images.return_value = [local]
+        self.assertFalse(actions.start_prefetch(self.cli, "example.com/tool", "2.0.0"))
+        self.assertEqual(mock_spawn.call_count, 1)
+
+    def test_prefetch_records_completion(self):
+        """Test the prefetch pulls the version and records it as done."""
+        with patch('builtins.print'):
+            self.assertTrue(actions.prefetch_version(self.cli, "example.com/tool", "2.0.0", self.state_manager))
+
+        self.cli.pull_image.assert_called_once_with("example.com/tool:2.0.0")
+        record = tasks.get_prefetch(self.state_manager, "example.com/tool")
+        self.assertEqual((record["version"], record["status"], record["image_id"]), ("2.0.0", "done", "sha256:new"))
+        self.assertIsNotNone(self.hold_lock())
+
+    def test_prefetch_failure_recorded(self):
+        """Test a failed pull is recorded so the next update check can retry."""
+        self.cli.pull_image.side_effect = RuntimeError("network down")
+        with patch('builtins.print'), self.assertRaises(RuntimeError):
+            actions.prefetch_version(self.cli, "example.com/tool", "2.0.0", self.state_manager)
+
+        self.assertEqual(tasks.get_prefetch(self.state_manager, "example.com/tool")["status"], "failed")
+
+    def test_duplicate_prefetch_skipped(self):
+        """Test a second prefetch for the same repo does nothing while the first holds the lock."""
+        self.hold_lock()
+
+        self.assertFalse(actions.prefetch_version(self.cli, "example.com/tool", "2.0.0", self.state_manager))
+        self.cli.pull_image.assert_not_called()
+        self.assertIsNone(tasks.get_prefetch(self.state_manager, "example.com/tool"))
+
+
+class TestPrefetchCommands(PrefetchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = MagicMock()
+        self.client.container_repo = "example.com/tool"
+        self.client.baseline_version = "1.0.0"
+        self.client.resolved_version = "1.0.0"
+        self.client.update_check_interval = 3600
+        self.client.prefetch_updates = True
+        self.client.auto_gc = False
+        self.client.remote_update_check = True
+        self.client.state_manager = self.state_manager
+
+    @patch('rapidctl.cli.actions.start_prefetch')
+    def test_update_check_starts_prefetch(self, mock_start):
+        """Test a newer version found by the update check is prefetched when enabled."""
+        self.client.check_for_updates.return_value = "2.0.0"
+        main._run_update_check(self.client)
+        mock_start.assert_called_once_with(self.client.cli, "example.com/tool", "2.0.0")
+
+        mock_start.reset_mock()
+        self.client.prefetch_updates = False
+        main._run_update_check(self.client)
+        mock_start.assert_not_called()
+
+    @patch('rapidctl.cli.tasks.lower_priority')
+    @patch('rapidctl.cli.actions.prefetch_version', return_value=True)
+    def test_prefetch_command(self, mock_prefetch, mock_lower):
+        """Test the hidden prefetch flag pulls at lowered priority and rejects bad versions."""
+        self.assertTrue(main._handle_reserved_commands(self.client, "cli", ["--rapidctl-prefetch", "2.0.0"]))
+        mock_lower.assert_called_once()
+        mock_prefetch.assert_called_once_with("cli", "example.com/tool", "2.0.0", self.state_manager)
+
+        with patch('builtins.print'), self.assertRaises(SystemExit) as exit_ctx:
+            main._handle_reserved_commands(self.client, "cli", ["--rapidctl-prefetch", "2.0;rm"])
+        self.assertEqual(exit_ctx.exception.code, 1)
+
+    @patch('rapidctl.cli.actions.prefetch_version')
+    def test_prefetch_subcommand_reaches_container(self, mock_prefetch):
+        """Test a container subcommand named prefetch isn't taken as the background prefetch."""
+        self.assertFalse(main._handle_reserved_commands(self.client, "cli", ["prefetch", "2.0.0"]))
+        mock_prefetch.assert_not_called()
+
+    @patch('builtins.print')
+    @patch('rapidctl.cli.actions.apply_latest_available', return_value="2.0.0")
+    def test_apply_update_after_prefetch(self, mock_apply, mock_print):
+        """Test apply-update reports a prefetched version needs no download."""
+        tasks.record_prefetch(self.state_manager, "example.com/tool", "2.0.0", "done", image_id="sha256:new")
+
+        main._handle_reserved_commands(self.client, "cli", ["apply-update"])
+
+        mock_apply.assert_called_once_with("cli", "example.com/tool", "1.0.0", remote=True,
+                                           state_manager=self.state_manager)
+        mock_print.assert_any_call(
+            "✓ Version 2.0.0 is now pinned as your default (already pulled in the background)."
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""Test suite for the opt-in per-phase timing surface."""
+
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rapidctl.errors import PodmanAPIError
+from rapidctl.utils import profile
+from rapidctl.cli import PodmanCLI, main
+
+
+class TestProfile(unittest.TestCase):
+    def tearDown(self):
+        profile.start(None)
+
+    def test_disabled_is_noop(self):
+        """Test phases and marks record nothing when profiling is off."""
+        self.assertFalse(profile.start(None))
+        self.assertFalse(profile.start("0"))
+
+        stderr = io.StringIO()
+        with patch('sys.stderr', stderr):
+            with profile.phase("connect"):
+                pass
+            profile.mark("first_byte")
+            profile.finish()
+
+        self.assertEqual(stderr.getvalue(), "")
+
+    def test_stderr_breakdown(self):
+        """Test RAPIDCTL_PROFILE=1 prints every phase and the total to stderr."""
+        self.assertTrue(profile.start("1"))
+        with profile.phase("podman.connect"):
+            pass
+        profile.mark("container.first_byte")
+
+        stderr = io.StringIO()
+        with patch('sys.stderr', stderr):
+            profile.finish()
+
+        output = stderr.getvalue()
+        self.assertIn("podman.connect", output)
+        self.assertIn("container.first_byte", output)
+        self.assertIn("total", output)
+        self.assertFalse(profile.active())
+
+    def test_file_target_writes_json_lines(self):
+        """Test a file path target appends one JSON record per phase."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "profile.jsonl")
+            profile.start(path)
+            with profile.phase("update_check"):
+                pass
+            profile.finish()
+
+            with open(path) as f:
+                records = [json.loads(line) for line in f]
+
+        self.assertEqual([r["phase"] for r in records], ["update_check", "total"])
+        self.assertEqual(records[0]["pid"], os.getpid())
+        self.assertGreaterEqual(records[0]["duration_ms"], 0)
+
+    def test_timed_decorator(self):
+        """Test timed() records a phase per call and preserves the return value."""
+        @profile.timed("subcommands")
+        def discover():
+            return {"build": ""}
+
+        profile.start("1")
+        self.assertEqual(discover(), {"build": ""})
+        records = profile._current().records
+        self.assertEqual(records[0]["phase"], "subcommands")
+
+    @patch('rapidctl.cli.main.run', return_value=None)
+    def test_main_emits_breakdown(self, mock_run):
+        """Test main() reports the breakdown when RAPIDCTL_PROFILE is set."""
+        stderr = io.StringIO()
+        env = {"RAPIDCTL_PROFILE": "1", "RAPIDCTL_NO_DAEMON": "1"}
+        with patch.dict(os.environ, env), patch('sys.argv', ['examplectl', 'build']), patch('sys.stderr', stderr):
+            main.main(MagicMock())
+
+        self.assertIn("--- rapidctl profile ---", stderr.getvalue())
+        self.assertIn("total", stderr.getvalue())
+
+
+class TestRunContainer(unittest.TestCase):
+    def setUp(self):
+        self.cli = PodmanCLI()
+        self.cli.client = MagicMock()
+        self.container = self.cli.client.containers.create.return_value
+        self.container.logs.return_value = iter([b"ok\n"])
+
+    def use_log_driver(self, log_type):
+        self.container.attrs = {"HostConfig": {"LogConfig": {"Type": log_type}}}
+
+    def test_streams_readable_logs(self):
+        """Test output is streamed from log drivers podman can read back."""
+        self.use_log_driver("k8s-file")
+        self.container.wait.return_value = 0
+
+        self.assertEqual(self.cli.run_container("repo:1.0.0", ["build"], stream=False), b"ok\n")
+        self.container.remove.assert_called_once()
+
+    def test_unreadable_logs_report_exit_code_only(self):
+        """Test a log driver with nothing to read back is waited on without asking for its logs."""
+        self.use_log_driver("none")
+        self.container.wait.return_value = 0
+
+        self.assertEqual(list(self.cli.run_container("repo:1.0.0", ["build"])), [])
+        self.container.logs.assert_not_called()
+
+        self.container.wait.return_value = 2
+        with self.assertRaises(PodmanAPIError):
+            self.cli.run_container("repo:1.0.0", ["build"])
+        self.container.logs.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
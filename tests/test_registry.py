@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+"""Test suite for remote tag discovery against a local stand-in registry."""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import MagicMock
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rapidctl.bootstrap.state import StateManager
+from rapidctl.cli import PodmanCLI
+from rapidctl.cli.registry import RegistryClient, next_page_url, registry_base_url, split_repository
+from rapidctl.errors import RegistryError
+import rapidctl.cli.actions as actions
+
+
+def image(image_id, tags):
+    mock_image = MagicMock()
+    mock_image.id = image_id
+    mock_image.short_id = image_id[:12]
+    mock_image.tags = tags
+    mock_image.attrs = {"Created": 1700000000, "Size": 1024}
+    return mock_image
+
+
+class StandInRegistry(BaseHTTPRequestHandler):
+    """Serves /v2/<name>/tags/list the way a distribution registry does."""
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        server.requests.append((url.path, dict(self.headers)))
+
+        if url.path == "/token":
+            return self._reply(200, {"token": "secret-token"})
+        if server.status:
+            return self._reply(server.status, {"errors": []}, {"Retry-After": "120"})
+        if server.token and self.headers.get("Authorization") != "Bearer secret-token":
+            realm = f"http://{self.headers['Host']}/token"
+            return self._reply(401, {"errors": []}, {
+                "WWW-Authenticate": f'Bearer realm="{realm}",service="registry",scope="repository:tool:pull"'
+            })
+
+        query = parse_qs(url.query)
+        size = min(int(query.get("n", ["100"])[0]), server.page_size)
+        tags = sorted(server.tags)
+        start = tags.index(query["last"][0]) + 1 if "last" in query else 0
+        page = tags[start:start + size]
+        etag = f'"{len(tags)}-{start}"'
+
+        if self.headers.get("If-None-Match") == etag:
+            return self._reply(304, None, {"ETag": etag})
+        headers = {"ETag": etag}
+        if start + size < len(tags):
+            headers["Link"] = f'<{url.path}?n={size}&last={page[-1]}>; rel="next"'
+        self._reply(200, {"name": "tool", "tags": page}, headers)
+
+    def _reply(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        payload = json.dumps(body).encode() if body is not None else b""
+        if payload:
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestRegistryNames(unittest.TestCase):
+    def test_split_repository(self):
+        self.assertEqual(split_repository("quay.io/org/tool"), ("quay.io", "org/tool"))
+        self.assertEqual(split_repository("localhost:5000/tool"), ("localhost:5000", "tool"))
+        self.assertEqual(split_repository("ubuntu"), ("docker.io", "library/ubuntu"))
+        self.assertEqual(split_repository("myorg/tool"), ("docker.io", "myorg/tool"))
+
+    def test_base_url(self):
+        self.assertEqual(registry_base_url("docker.io"), "https://registry-1.docker.io")
+        self.assertEqual(registry_base_url("127.0.0.1:5000"), "http://127.0.0.1:5000")
+        self.assertEqual(registry_base_url("ghcr.io"), "https://ghcr.io")
+
+    def test_next_page_url(self):
+        self.assertEqual(
+            next_page_url('</v2/tool/tags/list?n=2&last=b>; rel="next"', "http://r:5000/v2/tool/tags/list?n=2"),
+            "http://r:5000/v2/tool/tags/list?n=2&last=b"
+        )
+        self.assertIsNone(next_page_url(None, "http://r/"))
+
+
+class RegistryTestCase(unittest.TestCase):
+    """Starts a stand-in registry serving one repository, 'tool'."""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInRegistry)
+        self.server.tags = ["1.0.0", "1.1.0", "1.2.0", "2.0.0", "latest"]
+        self.server.page_size = 2
+        self.server.token = False
+        self.server.status = None
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.state_manager = StateManager(state_file=Path(self.temp_dir.name) / "state.json")
+        self.addCleanup(self.state_manager.flush)
+
+        self.registry = f"127.0.0.1:{self.server.server_address[1]}"
+        self.repo = f"{self.registry}/tool"
+        self.client = RegistryClient(state_manager=self.state_manager, rate_limits={self.registry: 0})
+
+
+class TestRegistryClient(RegistryTestCase):
+    def test_follows_pagination(self):
+        """Test every page linked from the first is fetched in order."""
+        self.assertEqual(self.client.list_tags(self.repo), ["1.0.0", "1.1.0", "1.2.0", "2.0.0", "latest"])
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_unchanged_pages_revalidated(self):
+        """Test a repeat check sends the cached ETags and reuses pages answered with 304."""
+        self.server.page_size = 10
+        self.client.list_tags(self.repo)
+        self.server.requests.clear()
+
+        again = RegistryClient(state_manager=self.state_manager, rate_limits={self.registry: 0})
+        self.assertEqual(again.list_tags(self.repo), ["1.0.0", "1.1.0", "1.2.0", "2.0.0", "latest"])
+
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.server.requests[0][1]["If-None-Match"], '"5-0"')
+
+        self.server.tags.append("2.1.0")
+        self.assertIn("2.1.0", again.list_tags(self.repo))
+
+    def test_bearer_token_flow(self):
+        """Test a 401 challenge is answered with a token that later requests reuse."""
+        self.server.token = True
+        self.server.page_size = 10
+
+        self.assertEqual(len(self.client.list_tags(self.repo)), 5)
+        self.client.list_tags(self.repo)
+
+        paths = [path for path, _ in self.server.requests]
+        self.assertEqual(paths, ["/v2/tool/tags/list", "/token", "/v2/tool/tags/list", "/v2/tool/tags/list"])
+
+    def test_rate_limited_per_registry(self):
+        """Test checks within a registry's interval reuse the remembered tags without a request."""
+        self.client.rate_limits[self.registry] = 300
+        first = self.client.list_tags(self.repo)
+        count = len(self.server.requests)
+
+        other = RegistryClient(state_manager=self.state_manager)
+        self.assertEqual(other.list_tags(self.repo), first)
+        self.assertEqual(len(self.server.requests), count)
+
+    def test_too_many_requests_holds_off(self):
+        """Test a 429 response raises and holds further checks off for its Retry-After."""
+        self.server.status = 429
+        with self.assertRaises(RegistryError):
+            self.client.list_tags(self.repo)
+
+        self.assertEqual(self.client.list_tags(self.repo), [])
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_error_response(self):
+        """Test registry errors surface as RegistryError."""
+        self.server.status = 500
+        with self.assertRaises(RegistryError):
+            self.client.list_tags(self.repo)
+
+    def test_failed_check_not_rate_limited(self):
+        """Test a failed check doesn't hold off the next one, which may then succeed."""
+        self.client.rate_limits[self.registry] = 300
+        self.server.status = 500
+        with self.assertRaises(RegistryError):
+            self.client.list_tags(self.repo)
+
+        self.server.status = None
+        self.assertEqual(self.client.list_tags(self.repo), ["1.0.0", "1.1.0", "1.2.0", "2.0.0", "latest"])
+
+
+class TestRemoteUpdateCheck(RegistryTestCase):
+    def test_remote_tags_merged_with_local(self):
+        """Test newer registry tags are found alongside local ones, ignoring 'latest'."""
+        cli = PodmanCLI(state_manager=self.state_manager)
+        cli.client = MagicMock()
+        cli.client.images.list.return_value = [image("sha256:aaa", [f"{self.repo}:1.1.0"])]
+        cli.image_store_fingerprint = MagicMock(return_value=None)
+        cli.registry.rate_limits[self.registry] = 0
+
+        self.assertIsNone(actions.find_newer_version(cli, self.repo, "1.1.0"))
+        self.assertEqual(actions.find_newer_version(cli, self.repo, "1.1.0", remote=True), "2.0.0")
+
+    def test_registry_failure_falls_back_to_local(self):
+        """Test a failing registry leaves the local answer in place."""
+        self.server.status = 500
+        cli = PodmanCLI()
+        cli.client = MagicMock()
+        cli.client.images.list.return_value = [image("sha256:aaa", [f"{self.repo}:1.3.0"])]
+
+        self.assertEqual(actions.find_newer_version(cli, self.repo, "1.1.0", remote=True), "1.3.0")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+"""Test suite for warm session containers with exec-based dispatch."""
+
+import sys
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import rapidctl.cli.actions as actions
+import rapidctl.cli.tasks as tasks
+from rapidctl.bootstrap.state import StateManager
+from rapidctl.cli import main
+from rapidctl.errors import PodmanAPIError
+
+
+def make_container(container_id, name, image_name, status="running"):
+    container = MagicMock()
+    container.id = container_id
+    container.name = name
+    container.status = status
+    container.labels = {tasks.SESSION_LABEL: "true", tasks.SESSION_IMAGE_LABEL: image_name}
+    return container
+
+
+class TestSessionContainer(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.state_manager = StateManager(state_file=Path(self.temp_dir.name) / "state.json")
+        self.session = MagicMock()
+        self.session.list_session_containers.return_value = []
+        self.session.start_exec.side_effect = lambda cid, cmd: ("exec-1", iter([b"hello\n"]))
+        self.session.exec_exit_code.return_value = 0
+        self.name = tasks.session_container_name("repo:1.0.0")
+
+    def tearDown(self):
+        self.state_manager.flush()
+        self.temp_dir.cleanup()
+
+    def run_command(self, image_name="repo:1.0.0"):
+        with patch('builtins.print'):
+            actions.run_session_command(
+                self.session, image_name, "/opt/rapidctl/cmd/", ["build", "--fast"], self.state_manager
+            )
+
+    def test_container_name_per_repo(self):
+        """Test session names ignore the tag so version changes reuse the slot."""
+        self.assertEqual(tasks.session_container_name("docker.io/org/tool:2.0.0"),
+                         tasks.session_container_name("docker.io/org/tool:1.0.0"))
+        self.assertTrue(self.name.startswith("rapidctl-session-repo-"))
+
+    def test_first_command_creates_container(self):
+        """Test the first command starts a session container and execs into it."""
+        self.session.get_container.return_value = None
+        self.session.create_session_container.return_value = make_container("c1", self.name, "repo:1.0.0")
+
+        self.run_command()
+
+        self.session.create_session_container.assert_called_once()
+        self.session.start_exec.assert_called_once_with("c1", ["/opt/rapidctl/cmd/build", "--fast"])
+        self.assertIsNotNone(tasks.get_session_last_used(self.state_manager, self.name))
+
+    def test_warm_container_reused(self):
+        """Test a running session container for the same image is reused via exec."""
+        self.session.get_container.return_value = make_container("c1", self.name, "repo:1.0.0")
+
+        self.run_command()
+        self.run_command()
+
+        self.session.create_session_container.assert_not_called()
+        self.session.remove_container.assert_not_called()
+        self.assertEqual(self.session.start_exec.call_count, 2)
+
+    def test_version_change_recreates_container(self):
+        """Test a session container on an old version is replaced."""
+        self.session.get_container.return_value = make_container("old", self.name, "repo:1.0.0")
+        self.session.create_session_container.return_value = make_container("new", self.name, "repo:2.0.0")
+
+        self.run_command("repo:2.0.0")
+
+        self.session.remove_container.assert_called_once_with("old")
+        self.session.start_exec.assert_called_once_with("new", ["/opt/rapidctl/cmd/build", "--fast"])
+
+    def test_nonzero_exit_raises(self):
+        """Test a failing exec surfaces as a PodmanAPIError."""
+        self.session.get_container.return_value = make_container("c1", self.name, "repo:1.0.0")
+        self.session.exec_exit_code.return_value = 3
+
+        with self.assertRaises(PodmanAPIError):
+            self.run_command()
+
+    def test_idle_sessions_reaped(self):
+        """Test containers idle past the timeout are removed during a sweep."""
+        idle = make_container("idle", "rapidctl-session-idle-0", "idle:1")
+        busy = make_container("busy", "rapidctl-session-busy-0", "busy:1")
+        self.session.list_session_containers.return_value = [idle, busy]
+        self.state_manager.set_state("session_rapidctl-session-idle-0", time.time() - 1000)
+        tasks.touch_session(self.state_manager, "rapidctl-session-busy-0")
+
+        reaped = actions.reap_idle_sessions(self.session, self.state_manager, idle_timeout=600)
+
+        self.assertEqual(reaped, ["rapidctl-session-idle-0"])
+        self.session.remove_container.assert_called_once_with("idle")
+
+        # A second sweep inside the sweep interval does not list containers again
+        actions.reap_idle_sessions(self.session, self.state_manager, idle_timeout=600)
+        self.session.list_session_containers.assert_called_once()
+
+
+    def test_running_session_not_reaped_by_other_invocation(self):
+        """Test a session is marked used on disk before its command starts, so another process's sweep keeps it."""
+        self.state_manager.set_state(f"session_{self.name}", time.time() - 1000)
+        self.state_manager.flush()
+        other = StateManager(state_file=Path(self.temp_dir.name) / "state.json")
+        other._store = type(other._store)(other.state_file)
+        other.get_state("session_sweep")  # Loaded while the session still looked idle
+
+        def start_exec(cid, cmd):
+            sweeper = MagicMock()
+            sweeper.list_session_containers.return_value = [make_container("c1", self.name, "repo:1.0.0")]
+            self.assertEqual(actions.reap_idle_sessions(sweeper, other, idle_timeout=600), [])
+            return "exec-1", iter([b"hello\n"])
+
+        self.session.get_container.return_value = make_container("c1", self.name, "repo:1.0.0")
+        self.session.start_exec.side_effect = start_exec
+        self.run_command()
+        self.session.remove_container.assert_not_called()
+
+
+class TestSessionDispatch(unittest.TestCase):
+    @patch('rapidctl.cli.actions.run_container_command')
+    @patch('rapidctl.cli.actions.run_session_command')
+    @patch('rapidctl.cli.actions.get_container_subcommands')
+    def test_session_mode_dispatches_via_exec(self, mock_get_cmds, mock_session, mock_run):
+        """Test session mode routes subcommands through the warm container."""
+        client = MagicMock()
+        client.container_version = "repo:1.0.0"
+        client.command_path = "/cmd/"
+        client.session_mode = True
+        client.session_idle_timeout = 120
+        mock_get_cmds.return_value = {"build": ""}
+
+        main._dispatch_subcommand(client, client.cli, ["build"])
+
+        mock_session.assert_called_once_with(
+            client.cli, "repo:1.0.0", "/cmd/", ["build"], client.state_manager, 120, container_id=None
+        )
+        mock_run.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
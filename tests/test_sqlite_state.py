@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+"""Test suite for the SQLite StateManager backend."""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rapidctl.bootstrap.client import CtlClient
+from rapidctl.bootstrap.sqlite_state import SqliteStateManager
+
+
+class TestSqliteStateManager(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.db_file = Path(self.temp_dir.name) / "state.db"
+        self.manager = SqliteStateManager(db_file=self.db_file)
+        self.addCleanup(self.manager.close)
+
+    def test_get_set_state(self):
+        """Test round-trip of setting and getting state."""
+        self.manager.set_state("my_key", {"nested": [1, 2]})
+        self.assertEqual(self.manager.get_state("my_key"), {"nested": [1, 2]})
+        self.assertIsNone(self.manager.get_state("missing_key"))
+
+        self.manager.delete_state("my_key")
+        self.assertIsNone(self.manager.get_state("my_key"))
+
+    def test_wal_mode(self):
+        """Test the database runs in WAL mode."""
+        self.manager.set_state("key", 1)
+        mode = self.manager._connection().execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+    def test_cache_ttl(self):
+        """Test cache entries are served within their TTL and missed after it."""
+        self.manager.set_cache("fresh", "data", ttl=60)
+        self.manager.set_cache("stale", "data", ttl=-1)
+
+        self.assertEqual(self.manager.get_cache("fresh"), "data")
+        self.assertIsNone(self.manager.get_cache("stale"))
+
+        self.manager.clear_cache("fresh")
+        self.assertIsNone(self.manager.get_cache("fresh"))
+
+    def test_stale_within_grace(self):
+        """Test a value past its TTL is served stale within its grace window and refreshed."""
+        self.manager.set_cache("key", "old", ttl=-10, grace=600)
+        refresh = unittest.mock.Mock(side_effect=lambda: self.manager.set_cache("key", "new"))
+
+        self.assertIsNone(self.manager.get_cache("key"))
+        self.assertEqual(self.manager.get_cache("key", refresh=refresh), "old")
+
+        deadline = time.monotonic() + 5
+        while self.manager.get_cache("key") != "new" and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.manager.get_cache("key"), "new")
+        self.assertEqual(self.manager.cache_stats()["refresh"], 1)
+
+    def test_prune_evicts_least_recently_used(self):
+        """Test pruning drops expired rows, then the least recently used past the bound."""
+        self.manager.cache_max_entries = 2
+        self.manager.set_state("durable", True)
+        for n in range(3):
+            self.manager.set_cache(f"key{n}", n, ttl=3600)
+        self.manager.set_cache("stale", "x", ttl=-1)
+        conn = self.manager._connection()
+        for n, age in enumerate([100, 300, 200]):
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (time.time() - age, f"key{n}"))
+
+        result = self.manager.prune_cache()
+
+        self.assertEqual(result, {"expired": 1, "evicted": 1, "entries": 2, "bytes": unittest.mock.ANY})
+        self.assertIsNone(self.manager.get_cache("key1"))
+        self.assertEqual(self.manager.get_cache("key0"), 0)
+        self.assertTrue(self.manager.get_state("durable"))
+        self.assertEqual(self.manager.cache_usage()["entries"], 2)
+
+    def test_expired_entries_purged_on_open(self):
+        """Test expired rows are deleted when the database is next opened."""
+        self.manager.prune_cache() # So the write below does not sweep first
+        self.manager.set_cache("stale", "data", ttl=-1)
+        self.manager.set_state("keep", "me")
+        self.manager.close()
+
+        reopened = SqliteStateManager(db_file=self.db_file)
+        self.addCleanup(reopened.close)
+        connection = reopened._connection()
+        self.assertEqual([row[0] for row in connection.execute("SELECT key FROM cache")], [])
+        self.assertEqual([row[0] for row in connection.execute("SELECT key FROM entries")], ["keep"])
+
+    def test_cache_apart_from_state(self):
+        """Test cache entries and sweep bookkeeping never show up as, or collide with, state keys."""
+        self.manager.set_state("cache_dir", "/tmp/cache")
+        self.manager.set_cache("dir", "cached")
+        self.manager.prune_cache()
+
+        self.assertEqual(self.manager.get_state("cache_dir"), "/tmp/cache")
+        self.assertEqual(self.manager.get_cache("dir"), "cached")
+        self.assertIsNone(self.manager.get_state("dir"))
+        keys = [row[0] for row in self.manager._connection().execute("SELECT key FROM entries")]
+        self.assertEqual(keys, ["cache_dir"])
+
+    def test_visible_across_connections(self):
+        """Test a second manager, as in another process, sees committed writes."""
+        other = SqliteStateManager(db_file=self.db_file)
+        self.addCleanup(other.close)
+
+        self.manager.set_state("version_repo", "2.0.0")
+        self.assertEqual(other.get_state("version_repo"), "2.0.0")
+
+    def test_transaction_rolls_back_on_error(self):
+        """Test a failing transaction leaves no partial changes behind."""
+        with self.manager.transaction():
+            self.manager.set_state("a", 1)
+            self.manager.set_state("b", 2)
+
+        with self.assertRaises(RuntimeError):
+            with self.manager.transaction():
+                self.manager.set_state("a", 10)
+                raise RuntimeError("boom")
+
+        self.assertEqual(self.manager.get_state("a"), 1)
+        self.assertEqual(self.manager.get_state("b"), 2)
+
+    def test_concurrent_threads(self):
+        """Test read-modify-write in transactions is safe across threads and connections."""
+        managers = [SqliteStateManager(db_file=self.db_file) for _ in range(4)]
+        for manager in managers:
+            self.addCleanup(manager.close)
+
+        def work(manager):
+            for _ in range(25):
+                with manager.transaction():
+                    manager.set_state("counter", (manager.get_state("counter") or 0) + 1)
+
+        threads = [threading.Thread(target=work, args=(m,)) for m in managers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.manager.get_state("counter"), 100)
+
+    def test_works_with_client(self):
+        """Test CtlClient can use the SQLite backend for pinned versions."""
+        self.manager.set_state("version_example.com/tool", "3.1.4")
+
+        client = CtlClient(state_manager=self.manager)
+        client.container_repo = "example.com/tool"
+        client._load_persisted_version()
+
+        self.assertEqual(client.baseline_version, "3.1.4")
+
+    @unittest.mock.patch('builtins.print')
+    @unittest.mock.patch('rapidctl.cli.actions.find_newer_version', return_value="3.2.0")
+    def test_apply_update_pins_in_backend(self, mock_newer, mock_print):
+        """Test apply-update pins the new version in the client's SQLite backend, not the default file."""
+        from rapidctl.cli import main
+
+        client = CtlClient(state_manager=self.manager)
+        client.container_repo = "example.com/tool"
+        client.baseline_version = "3.1.4"
+
+        with unittest.mock.patch.dict(os.environ, {"HOME": self.temp_dir.name}):
+            main._handle_reserved_commands(client, unittest.mock.MagicMock(), ["apply-update"])
+
+        self.assertEqual(self.manager.get_state("version_example.com/tool"), "3.2.0")
+        self.assertFalse((Path(self.temp_dir.name) / ".rapidctl").exists())
+
+
+class TestSqliteMigration(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.json_file = Path(self.temp_dir.name) / "state.json"
+        self.db_file = Path(self.temp_dir.name) / "state.db"
+
+    def test_migrates_existing_json_state(self):
+        """Test state and live cache entries are imported from state.json once."""
+        now = time.time()
+        with open(self.json_file, 'w') as f:
+            json.dump({
+                "version_repo": "1.2.3",
+                "cache_podman_images": {"timestamp": now, "ttl": 600, "data": [{"id": "abc"}]},
+                "cache_expired": {"timestamp": now - 1000, "ttl": 10, "data": "old"},
+            }, f)
+
+        manager = SqliteStateManager(db_file=self.db_file)
+        self.addCleanup(manager.close)
+
+        self.assertEqual(manager.get_state("version_repo"), "1.2.3")
+        self.assertEqual(manager.get_cache("podman_images"), [{"id": "abc"}])
+        self.assertIsNone(manager.get_cache("expired"))
+
+        # Later edits to the JSON file are not imported again
+        with open(self.json_file, 'w') as f:
+            json.dump({"version_repo": "9.9.9"}, f)
+        again = SqliteStateManager(db_file=self.db_file)
+        self.addCleanup(again.close)
+        self.assertEqual(again.get_state("version_repo"), "1.2.3")
+
+    def test_upgrades_version_one_schema(self):
+        """Test a database created before grace windows is upgraded in place."""
+        import sqlite3
+        conn = sqlite3.connect(self.db_file)
+        conn.execute("CREATE TABLE entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)")
+        conn.execute("INSERT INTO entries VALUES ('version_repo', '\"1.0.0\"', NULL)")
+        conn.execute("INSERT INTO entries VALUES ('cache_images', '[]', ?)", (time.time() + 60,))
+        conn.execute("PRAGMA user_version = 1")
+        conn.commit()
+        conn.close()
+
+        manager = SqliteStateManager(db_file=self.db_file)
+        self.addCleanup(manager.close)
+
+        self.assertEqual(manager.get_state("version_repo"), "1.0.0")
+        self.assertEqual(manager.get_cache("images"), [])
+        self.assertIsNone(manager.get_state("cache_images"))
+        manager.set_cache("images", [1], ttl=60, grace=60)
+        self.assertEqual(manager.get_cache("images"), [1])
+
+    def test_upgrade_moves_cache_rows_out_of_state(self):
+        """Test a version three database has its cache rows and sweep time moved to their own tables."""
+        import sqlite3
+        conn = sqlite3.connect(self.db_file)
+        conn.execute("CREATE TABLE entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, "
+                     "fresh_until REAL, accessed_at REAL)")
+        conn.execute("INSERT INTO entries VALUES ('cache_dir', '\"/tmp\"', NULL, NULL, NULL)")
+        conn.execute("INSERT INTO entries VALUES ('cache_images', '[]', ?, NULL, NULL)", (time.time() + 60,))
+        conn.execute("INSERT INTO entries VALUES ('_last_cache_sweep', ?, NULL, NULL, NULL)", (str(time.time()),))
+        conn.execute("PRAGMA user_version = 3")
+        conn.commit()
+        conn.close()
+
+        manager = SqliteStateManager(db_file=self.db_file)
+        self.addCleanup(manager.close)
+
+        self.assertEqual(manager.get_state("cache_dir"), "/tmp")
+        self.assertEqual(manager.get_cache("images"), [])
+        self.assertIsNone(manager.get_state("_last_cache_sweep"))
+        self.assertIsNotNone(manager._get("meta", "last_cache_sweep"))
+
+    def test_corrupt_json_not_fatal(self):
+        """Test an unreadable state.json is skipped rather than blocking startup."""
+        self.json_file.write_text("not valid json {")
+
+        manager = SqliteStateManager(db_file=self.db_file)
+        self.addCleanup(manager.close)
+        with self.assertLogs('rapidctl.bootstrap.sqlite_state', level='WARNING'):
+            manager.set_state("key", "value")
+
+        self.assertEqual(manager.get_state("key"), "value")
+
+
+if __name__ == "__main__":
+    unittest.main()
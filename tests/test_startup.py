@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""Test suite for startup cost: import-time budget and the no-Podman fast path."""
+
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+# Cumulative import time allowed for the CLI entry point, in microseconds.
+# Deliberately generous for slow CI machines; pulling in podman alone costs
+# several times this.
+IMPORT_BUDGET_US = 150_000
+
+# Modules that must only be imported when actually needed
+DEFERRED_MODULES = ("podman", "mcp", "difflib", "getpass", "requests")
+
+
+def run_python(code, env=None):
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=ROOT, env={**os.environ, **(env or {})}
+    )
+
+
+class TestImportBudget(unittest.TestCase):
+    def test_entry_point_import_budget(self):
+        """Test importing the CLI entry point stays within budget and defers heavy modules."""
+        result = run_python("import rapidctl.cli.main, rapidctl.bootstrap.client")
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+        cumulative = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, total, name = line.split("|")
+            if total.strip().isdigit():
+                cumulative[name.strip()] = int(total)
+
+        for module in DEFERRED_MODULES:
+            self.assertNotIn(module, cumulative, f"{module} imported at startup")
+        self.assertLess(cumulative["rapidctl.cli.main"], IMPORT_BUDGET_US)
+
+
+class TestCachedFastPath(unittest.TestCase):
+    def test_help_from_cache_never_imports_podman(self):
+        """Test a warm --help invocation is answered without importing podman."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = os.path.join(temp_dir, "images.json")
+            with open(store, "w") as f:
+                f.write("[]")
+            stat = os.stat(store)
+
+            code = textwrap.dedent(f"""
+                import sys
+                from pathlib import Path
+                from rapidctl.bootstrap.client import CtlClient
+                from rapidctl.bootstrap.state import StateManager
+                from rapidctl.cli.main import main
+
+                state = StateManager(state_file=Path({temp_dir!r}) / "state.json")
+                state.set_state("image_store", {{"socket": "unix:///nonexistent.sock", "path": {store!r}}})
+                state.set_cache("podman_images", [{{"id": "sha256:abc", "short_id": "abc",
+                                                    "tags": ["example.com/tool:1.0.0"]}}], ttl=600)
+                state.set_cache("podman_images_fingerprint", "{stat.st_mtime_ns}:{stat.st_size}", ttl=600)
+                state.set_cache("subcommands_sha256:abc", {{"command_path": "/opt/rapidctl/cmd/",
+                                                           "commands": {{"build": "Build it"}}}}, ttl=600)
+
+                client = CtlClient(state_manager=state)
+                client.container_repo = "example.com/tool"
+                sys.argv = ["tool", "--help"]
+                try:
+                    main(client)
+                except SystemExit as e:
+                    print("exit", e.code)
+                print("podman loaded:", "podman" in sys.modules)
+            """)
+            result = run_python(code, env={"PODMAN_SOCKET": "unix:///nonexistent.sock",
+                                           "RAPIDCTL_NO_DAEMON": "1"})
+
+        self.assertIn("build                - Build it", result.stdout, result.stderr)
+        self.assertIn("exit 0", result.stdout)
+        self.assertIn("podman loaded: False", result.stdout)
+
+
+if __name__ == "__main__":
+    unittest.main()
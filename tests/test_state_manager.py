@@ -4,15 +4,33 @@
 import json
 import sys
 import os
+import threading
 import time
 import unittest
+import unittest.mock
 from pathlib import Path
 
 # Ensure we can import rapidctl
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from rapidctl.bootstrap import state as state_module
 from rapidctl.bootstrap.state import StateManager
 
+STRESS_PROCESSES = 8
+STRESS_ITERATIONS = 40
+
+
+def _stress_worker(state_file, worker):
+    """Increment a shared counter and write a private key from a separate process."""
+    manager = StateManager(state_file=Path(state_file))
+    for i in range(STRESS_ITERATIONS):
+        with manager.transaction():
+            manager.set_state("counter", (manager.get_state("counter") or 0) + 1)
+        manager.set_state(f"worker_{worker}_{i}", i)
+        if i % 10 == 0:
+            manager.flush()
+    manager.flush()
+
 
 class TestStateManager(unittest.TestCase):
     def setUp(self):
@@ -24,6 +42,7 @@ class TestStateManager(unittest.TestCase):
         self.manager = StateManager(state_file=self.state_file)
 
     def tearDown(self):
+        self.manager.flush()
         self.temp_dir.cleanup()
 
     def test_get_set_state(self):
@@ -50,22 +69,28 @@ class TestStateManager(unittest.TestCase):
     def test_cache_expired(self):
         """Test cache data is ignored if TTL is exceeded."""
         self.manager.set_cache("my_cache", "expired_data", ttl=1)
-        # Manually manipulate the saved timestamp to simulate expiration
-        with open(self.state_file, 'r') as f:
-            data = json.load(f)
-        
-        data["cache_my_cache"]["timestamp"] = time.time() - 10
-        
-        with open(self.state_file, 'w') as f:
-            json.dump(data, f)
-            
+        # The entry's mtime is its expiry time; move it into the past
+        cache_path = self.manager._store.cache.path_for("my_cache")
+        expired = time.time() - 10
+        os.utime(cache_path, (expired, expired))
+
+        self.assertIsNone(self.manager.get_cache("my_cache"))
+
+    def test_clear_cache(self):
+        """Test a cleared cache entry is a miss and other state is kept."""
+        self.manager.set_state("keep", "me")
+        self.manager.set_cache("my_cache", "data", ttl=60)
+        self.manager.clear_cache("my_cache")
+
         self.assertIsNone(self.manager.get_cache("my_cache"))
+        self.assertEqual(self.manager.get_state("keep"), "me")
 
     def test_custom_state_file(self):
         """Test pluggable state file capability."""
         custom_path = Path(self.temp_dir.name) / "custom" / "path.json"
         mgr = StateManager(state_file=custom_path)
         mgr.set_state("custom", "val")
+        mgr.flush()
         
         self.assertTrue(custom_path.exists())
         self.assertEqual(mgr.get_state("custom"), "val")
@@ -83,5 +108,395 @@ class TestStateManager(unittest.TestCase):
         self.manager.set_state("new_key", "val")
         self.assertEqual(self.manager.get_state("new_key"), "val")
 
+
+class TestStateBuffering(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.state_file = Path(self.temp_dir.name) / "state.json"
+        self.manager = StateManager(state_file=self.state_file)
+        self.addCleanup(self.manager.flush)
+
+    def read_file(self):
+        with open(self.state_file, 'r') as f:
+            return json.load(f)
+
+    def test_file_parsed_once(self):
+        """Test repeated reads are served from memory after the first load."""
+        self.manager.set_state("key", "value")
+        self.manager.flush()
+        self.manager.reload()
+
+        with unittest.mock.patch('rapidctl.bootstrap.state.json.load', wraps=json.load) as mock_load:
+            for _ in range(5):
+                self.manager.get_state("key")
+                self.manager.get_cache("missing")
+        self.assertEqual(mock_load.call_count, 1)
+
+    def test_writes_buffered_until_flush(self):
+        """Test mutations only reach the file on flush."""
+        self.manager.set_state("a", 1)
+        self.manager.set_cache("b", 2, ttl=60)
+        self.assertFalse(self.state_file.exists())
+
+        self.manager.flush()
+        self.assertEqual(self.read_file()["a"], 1)
+
+    def test_transaction_single_write(self):
+        """Test a transaction batches its changes into one write at the end."""
+        with unittest.mock.patch.object(self.manager._store, '_write', wraps=self.manager._store._write) as mock_write:
+            with self.manager.transaction():
+                self.manager.set_state("a", 1)
+                with self.manager.transaction():
+                    self.manager.set_state("b", 2)
+                self.manager.delete_state("a")
+                self.assertFalse(self.state_file.exists())
+
+        mock_write.assert_called_once()
+        self.assertEqual(self.read_file(), {"b": 2})
+
+    def test_flush_merges_other_writers(self):
+        """Test a flush keeps keys written to the file since it was loaded."""
+        self.manager.get_state("anything")
+        with open(self.state_file, 'w') as f:
+            json.dump({"other_process": True}, f)
+
+        self.manager.set_state("mine", 1)
+        self.manager.flush()
+
+        self.assertEqual(self.read_file(), {"other_process": True, "mine": 1})
+        self.assertTrue(self.manager.get_state("other_process"))
+
+    def test_managers_share_a_path(self):
+        """Test managers on the same file see each other's buffered changes."""
+        other = StateManager(state_file=self.state_file)
+        self.manager.set_state("shared", "yes")
+        self.assertEqual(other.get_state("shared"), "yes")
+
+
+class TestCacheFiles(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.state_file = Path(self.temp_dir.name) / "state.json"
+        self.manager = StateManager(state_file=self.state_file)
+        self.addCleanup(self.manager.flush)
+
+    def test_sharded_file_per_key(self):
+        """Test each cache entry is its own file under a hashed shard directory."""
+        self.manager.set_cache("podman_images", [{"id": "abc"}], ttl=60)
+
+        path = self.manager._store.cache.path_for("podman_images")
+        self.assertEqual(self.manager.cache_dir, self.state_file.with_name("state.cache"))
+        self.assertEqual(path.parent.parent, self.manager.cache_dir)
+        self.assertEqual(path.parent.name, path.name[:2])
+        payload = json.loads(path.read_text())
+        self.assertEqual((payload["key"], payload["data"]), ("podman_images", [{"id": "abc"}]))
+        self.assertGreater(path.stat().st_mtime, time.time())
+
+    def test_cache_kept_out_of_state_file(self):
+        """Test caches are written immediately and never reach the durable state file."""
+        self.manager.set_state("version_repo", "1.0.0")
+        self.manager.set_cache("big", ["x"] * 1000, ttl=60)
+        self.manager.flush()
+
+        with open(self.state_file, 'r') as f:
+            self.assertEqual(json.load(f), {"version_repo": "1.0.0"})
+
+    def test_expired_entry_not_deserialized(self):
+        """Test an expired entry is detected from file metadata alone."""
+        self.manager.set_cache("stale", "data", ttl=-1)
+
+        with unittest.mock.patch('rapidctl.bootstrap.state.json.load') as mock_load:
+            self.assertIsNone(self.manager.get_cache("stale"))
+            self.assertIsNone(self.manager.get_cache("missing"))
+        mock_load.assert_not_called()
+
+    def test_entry_parsed_once_until_changed(self):
+        """Test a live entry is parsed once and re-read only after it is rewritten."""
+        self.manager.set_cache("key", 1, ttl=60)
+        with unittest.mock.patch('rapidctl.bootstrap.state.json.load', wraps=json.load) as mock_load:
+            self.assertEqual(self.manager.get_cache("key"), 1)
+            self.assertEqual(self.manager.get_cache("key"), 1)
+            self.assertEqual(mock_load.call_count, 1)
+
+            # Another process replacing the file is picked up
+            other = state_module._CacheStore(self.manager.cache_dir)
+            other.set("key", 2, ttl=120)
+            self.assertEqual(self.manager.get_cache("key"), 2)
+
+    def test_legacy_cache_keys_dropped(self):
+        """Test cache entries left in state.json by older versions are removed."""
+        with open(self.state_file, 'w') as f:
+            json.dump({
+                "version_repo": "1.2.3",
+                "cache_podman_images": {"timestamp": time.time(), "ttl": 600, "data": []},
+            }, f)
+
+        self.assertEqual(self.manager.get_state("version_repo"), "1.2.3")
+        self.assertIsNone(self.manager.get_state("cache_podman_images"))
+        self.manager.flush()
+
+        with open(self.state_file, 'r') as f:
+            self.assertEqual(json.load(f), {"version_repo": "1.2.3"})
+
+
+class TestCachePolicy(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.manager = StateManager(state_file=Path(self.temp_dir.name) / "state.json")
+
+    def age(self, key, seconds):
+        """Move an entry's TTL and grace window into the past by seconds."""
+        path = self.manager._store.cache.path_for(key)
+        payload = json.loads(path.read_text())
+        payload["fresh_until"] -= seconds
+        expires = path.stat().st_mtime - seconds
+        path.write_text(json.dumps(payload))
+        os.utime(path, (expires, expires))
+
+    def test_stale_value_needs_opt_in(self):
+        """Test a value past its TTL is a miss unless the caller accepts stale data."""
+        self.manager.set_cache("key", "old", ttl=60, grace=600)
+        self.age("key", 120)
+
+        self.assertIsNone(self.manager.get_cache("key"))
+        self.assertEqual(self.manager.get_cache("key", allow_stale=True), "old")
+
+    def test_stale_value_refreshed_in_background(self):
+        """Test serving a stale value starts a single background refresh."""
+        self.manager.set_cache("key", "old", ttl=60, grace=600)
+        self.age("key", 120)
+        release = threading.Event()
+        refresh = unittest.mock.Mock(side_effect=lambda: release.wait(5) and self.manager.set_cache("key", "new"))
+
+        self.assertEqual(self.manager.get_cache("key", refresh=refresh), "old")
+        self.assertEqual(self.manager.get_cache("key", refresh=refresh), "old")
+        release.set()
+
+        # Wait for the refresh to finish writing before the temp dir goes away
+        stats = self.manager._store.cache.stats
+        deadline = time.monotonic() + 5
+        while stats._refreshing and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.manager.get_cache("key"), "new")
+        refresh.assert_called_once()
+
+    def test_past_grace_is_a_miss(self):
+        """Test nothing is served once the grace window has also passed."""
+        self.manager.set_cache("key", "old", ttl=60, grace=60)
+        self.age("key", 300)
+        refresh = unittest.mock.Mock()
+
+        self.assertIsNone(self.manager.get_cache("key", refresh=refresh))
+        refresh.assert_not_called()
+
+    def test_per_key_ttl(self):
+        """Test configured TTLs override the caller's default, by key or prefix."""
+        self.manager.cache_ttls.update({"subcommands_": 10, "subcommands_special": 20})
+        now = time.time()
+        self.manager.set_cache("subcommands_abc", {}, ttl=1000)
+        self.manager.set_cache("subcommands_special", {}, ttl=1000)
+        self.manager.set_cache("other", {}, ttl=1000)
+
+        def expiry(key):
+            return self.manager._store.cache.path_for(key).stat().st_mtime - now
+
+        self.assertAlmostEqual(expiry("subcommands_abc"), 10, delta=2)
+        self.assertAlmostEqual(expiry("subcommands_special"), 20, delta=2)
+        self.assertAlmostEqual(expiry("other"), 1000, delta=2)
+
+    def test_counters(self):
+        """Test hits, misses and stale reads are counted."""
+        self.manager.set_cache("fresh", 1, ttl=60)
+        self.manager.set_cache("stale", 2, ttl=60, grace=600)
+        self.age("stale", 120)
+
+        before = self.manager.cache_stats()
+        self.manager.get_cache("fresh")
+        self.manager.get_cache("missing")
+        self.manager.get_cache("stale")
+        self.manager.get_cache("stale", allow_stale=True)
+        after = self.manager.cache_stats()
+
+        self.assertEqual({name: after[name] - before[name] for name in after},
+                         {"hit": 1, "miss": 2, "stale": 1, "refresh": 0})
+
+
+class TestCacheBounds(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.manager = StateManager(state_file=Path(self.temp_dir.name) / "state.json",
+                                    cache_max_entries=3)
+
+    def set_used(self, key, seconds_ago):
+        """Backdate an entry's last use, keeping its expiry."""
+        path = self.manager._store.cache.path_for(key)
+        os.utime(path, (time.time() - seconds_ago, path.stat().st_mtime))
+
+    def test_prune_evicts_least_recently_used(self):
+        """Test pruning keeps the most recently used entries within the entry bound."""
+        for n, age in enumerate([500, 100, 400, 300, 200]):
+            self.manager.set_cache(f"key{n}", n, ttl=3600)
+            self.set_used(f"key{n}", age)
+
+        result = self.manager.prune_cache()
+
+        self.assertEqual((result["evicted"], result["entries"]), (2, 3))
+        self.assertIsNone(self.manager.get_cache("key0"))
+        self.assertIsNone(self.manager.get_cache("key2"))
+        for n in (1, 3, 4):
+            self.assertEqual(self.manager.get_cache(f"key{n}"), n)
+
+    def test_prune_respects_byte_bound(self):
+        """Test pruning evicts until the cache fits in its byte bound."""
+        self.manager.cache_max_bytes = 1500
+        for n in range(3):
+            self.manager.set_cache(f"key{n}", "x" * 1000, ttl=3600)
+            self.set_used(f"key{n}", 100 - n)
+
+        result = self.manager.prune_cache()
+
+        self.assertEqual(result["entries"], 1)
+        self.assertLessEqual(result["bytes"], 1500)
+        self.assertIsNotNone(self.manager.get_cache("key2"))
+
+    def test_read_marks_entry_used(self):
+        """Test a read refreshes an entry's last use without moving its expiry."""
+        self.manager.set_cache("key", 1, ttl=3600)
+        path = self.manager._store.cache.path_for("key")
+        self.set_used("key", 600)
+        expiry = path.stat().st_mtime_ns
+
+        self.manager.get_cache("key")
+
+        self.assertGreater(path.stat().st_atime, time.time() - 60)
+        self.assertEqual(path.stat().st_mtime_ns, expiry)
+
+    def test_write_sweeps_expired_entries(self):
+        """Test a write sweeps expired entries once the sweep interval has passed."""
+        self.manager.set_cache("live", 2, ttl=60) # First write sweeps and starts the interval
+        self.manager.set_cache("stale", 1, ttl=-1)
+        self.assertEqual(self.manager.cache_usage()["expired"], 1)
+
+        marker = self.manager.cache_dir / ".last-sweep"
+        overdue = time.time() - state_module.CACHE_SWEEP_INTERVAL - 1
+        os.utime(marker, (overdue, overdue))
+        self.manager.set_cache("another", 3, ttl=60)
+
+        self.assertEqual(self.manager.cache_usage(), {"entries": 2, "bytes": unittest.mock.ANY, "expired": 0})
+        self.assertFalse(self.manager._store.cache.path_for("stale").exists())
+
+    def test_abandoned_temp_files_removed(self):
+        """Test temp files left by a crashed writer are cleaned up by a sweep."""
+        self.manager.set_cache("key", 1, ttl=60)
+        shard = self.manager._store.cache.path_for("key").parent
+        leftover = shard / ".abandoned.tmp"
+        leftover.write_text("{")
+        old = time.time() - state_module.CACHE_SWEEP_INTERVAL - 1
+        os.utime(leftover, (old, old))
+
+        self.manager.prune_cache()
+
+        self.assertFalse(leftover.exists())
+        self.assertEqual(self.manager.get_cache("key"), 1)
+
+
+@unittest.skipIf(state_module.fcntl is None, "fcntl locking not available on this platform")
+class TestStateConcurrency(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.state_file = Path(self.temp_dir.name) / "state.json"
+
+    def test_parallel_processes_lose_nothing(self):
+        """Test concurrent processes never corrupt the file or lose each other's writes."""
+        import multiprocessing
+
+        StateManager(state_file=self.state_file).set_state("pinned", "1.2.3")
+        StateManager(state_file=self.state_file).flush()
+
+        context = multiprocessing.get_context("spawn")
+        workers = [context.Process(target=_stress_worker, args=(str(self.state_file), n))
+                   for n in range(STRESS_PROCESSES)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=60)
+            self.assertEqual(worker.exitcode, 0)
+
+        with open(self.state_file, 'r') as f:
+            data = json.load(f)
+
+        self.assertEqual(data["pinned"], "1.2.3")
+        self.assertEqual(data["counter"], STRESS_PROCESSES * STRESS_ITERATIONS)
+        for n in range(STRESS_PROCESSES):
+            for i in range(STRESS_ITERATIONS):
+                self.assertEqual(data[f"worker_{n}_{i}"], i)
+
+    def test_lock_timeout_does_not_block_forever(self):
+        """Test a held lock delays a writer by at most the timeout, which keeps its changes for later."""
+        import fcntl
+
+        manager = StateManager(state_file=self.state_file)
+        lock_path = manager._store.file_lock.path
+        with open(lock_path, 'w') as holder:
+            fcntl.flock(holder, fcntl.LOCK_EX)
+            manager._store.file_lock.timeout = 0.2
+
+            started = time.monotonic()
+            with self.assertLogs('rapidctl.bootstrap.state', level='WARNING'):
+                manager.set_state("key", "value")
+                manager.flush()
+
+            self.assertLess(time.monotonic() - started, 2)
+            self.assertFalse(self.state_file.exists())
+            self.assertEqual(manager.get_state("key"), "value")
+
+        manager.flush()
+        with open(self.state_file, 'r') as f:
+            self.assertEqual(json.load(f), {"key": "value"})
+
+    def test_transaction_lock_timeout_buffers_changes(self):
+        """Test a transaction that can't get the lock runs, but leaves its changes buffered."""
+        import fcntl
+
+        manager = StateManager(state_file=self.state_file)
+        with open(manager._store.file_lock.path, 'w') as holder:
+            fcntl.flock(holder, fcntl.LOCK_EX)
+            manager._store.file_lock.timeout = 0.2
+
+            with self.assertLogs('rapidctl.bootstrap.state', level='WARNING'):
+                with manager.transaction():
+                    manager.set_state("counter", 1)
+
+            self.assertFalse(self.state_file.exists())
+
+        manager.flush()
+        with open(self.state_file, 'r') as f:
+            self.assertEqual(json.load(f), {"counter": 1})
+
+    def test_corrupt_file_quarantined(self):
+        """Test an unreadable file is moved aside rather than silently discarded."""
+        self.state_file.write_text("not valid json {")
+        manager = StateManager(state_file=self.state_file)
+
+        with self.assertLogs('rapidctl.bootstrap.state', level='WARNING'):
+            manager.set_state("key", "value")
+            manager.flush()
+
+        corrupt = self.state_file.with_name("state.json.corrupt")
+        self.assertEqual(corrupt.read_text(), "not valid json {")
+        with open(self.state_file, 'r') as f:
+            self.assertEqual(json.load(f), {"key": "value"})
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -4,12 +4,14 @@
 import sys
 import os
 import unittest
+import unittest.mock
 from unittest.mock import MagicMock
 
 # Ensure we can import rapidctl
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from rapidctl.utils.version import VersionParser
+from rapidctl.utils.version import Version, VersionConstraint, VersionIndex, VersionParser
+from rapidctl.errors import PodmanActionError
 import rapidctl.cli.tasks as tasks
 import rapidctl.cli.actions as actions
 from rapidctl.bootstrap.client import CtlClient
@@ -51,6 +53,143 @@ class TestVersionParser(unittest.TestCase):
         self.assertEqual(VersionParser.compare("1.0.0", "1746190043"), -1)
         self.assertEqual(VersionParser.compare("1746190043", "1.0.0"), 1)
 
+    def test_sort_key_matches_compare(self):
+        """Test ordering by sort_key agrees with compare for every pair of tags."""
+        tags = ["1.2.3", "v1.2.3", "1.10.0", "2.0.0", "1746190043", "1746190044",
+                "latest", "stable", "dev", "1.2.3-rc1", "0.0.1"]
+        for a in tags:
+            for b in tags:
+                key_order = (VersionParser.sort_key(a) > VersionParser.sort_key(b)) - \
+                            (VersionParser.sort_key(a) < VersionParser.sort_key(b))
+                if a != b:
+                    self.assertEqual(key_order, VersionParser.compare(a, b), (a, b))
+
+    def test_parse_memoized(self):
+        """Test each version string is parsed once however often it is compared."""
+        Version.parse.cache_clear()
+        for _ in range(10):
+            VersionParser.compare("9.8.7", "9.8.6")
+        self.assertEqual(Version.parse.cache_info().misses, 2)
+
+        # Callers get their own copy of the parsed result
+        VersionParser.parse("9.8.7")["components"].append(0)
+        self.assertEqual(VersionParser.parse("9.8.7")["components"], [9, 8, 7])
+
+
+class TestSemVerPrecedence(unittest.TestCase):
+    def test_spec_precedence(self):
+        """Test the SemVer 2.0 precedence example sorts in order."""
+        ordered = ["1.0.0-alpha", "1.0.0-alpha.1", "1.0.0-alpha.beta", "1.0.0-beta",
+                   "1.0.0-beta.2", "1.0.0-beta.11", "1.0.0-rc.1", "1.0.0", "1.0.1", "2.0.0"]
+        self.assertEqual(sorted(reversed(ordered), key=VersionParser.sort_key), ordered)
+        for older, newer in zip(ordered, ordered[1:]):
+            self.assertEqual(VersionParser.compare(older, newer), -1, (older, newer))
+
+    def test_prerelease_before_release(self):
+        """Test a release candidate no longer compares equal to its release."""
+        self.assertEqual(VersionParser.compare("1.2.3-rc1", "1.2.3"), -1)
+        self.assertEqual(VersionParser.compare("v1.2.3-rc1", "1.2.3-rc1"), 0)
+
+    def test_build_metadata_ignored(self):
+        """Test build metadata does not affect precedence or hashing."""
+        a, b = Version("1.2.3+build.1"), Version("1.2.3+build.2")
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertEqual(a.build, "build.1")
+        self.assertEqual(VersionParser.parse("1.2.3-rc.1+sha.5")["prerelease"], ["rc", "1"])
+
+    def test_version_value_type(self):
+        """Test Version is compact, shared per string and compares natively."""
+        self.assertFalse(hasattr(Version("1.0.0"), "__dict__"))
+        self.assertIs(Version.parse("4.5.6"), Version.parse("4.5.6"))
+        self.assertLess(Version("1.0.0"), Version("1746190043"))
+        self.assertLess(Version("1746190043"), Version("latest"))
+        self.assertEqual(len({Version("1.0.0"), Version("v1.0.0"), Version("1.0.1")}), 2)
+
+
+class TestVersionIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = VersionIndex(["1.0.0", "latest", "v1.0.0", "stable", "1.2.0", "1.1.0-rc1", "1.0.0"])
+
+    def test_sorted_lookups(self):
+        """Test the index orders tags by version and answers newest and newer-than lookups."""
+        self.assertEqual(self.index.descending(), ["latest", "1.2.0", "1.1.0-rc1", "1.0.0", "v1.0.0", "stable"])
+        self.assertEqual(self.index.newest(), "latest")
+        self.assertEqual(self.index.newer_than("1.0.0"), ["latest", "1.2.0", "1.1.0-rc1"])
+        self.assertEqual(self.index.newer_than("latest"), [])
+        self.assertIsNone(VersionIndex().newest())
+
+    def test_updated_bisects_changes(self):
+        """Test an update inserts and removes tags in place of a full sort, leaving the original intact."""
+        tags = list(self.index) + ["1.1.0"]
+        tags.remove("v1.0.0")
+
+        with unittest.mock.patch("rapidctl.utils.version.sorted") as mock_sorted:
+            updated = self.index.updated(tags)
+        mock_sorted.assert_not_called()
+
+        self.assertEqual(updated.descending(), ["latest", "1.2.0", "1.1.0", "1.1.0-rc1", "1.0.0", "stable"])
+        self.assertIn("v1.0.0", self.index)
+        self.assertIs(updated.updated(reversed(tags)), updated)
+
+    def test_presorted_index_not_parsed(self):
+        """Test an index restored in order serves the newest tag without parsing any."""
+        restored = VersionIndex(list(self.index), presorted=True)
+        with unittest.mock.patch.object(VersionParser, "sort_key") as mock_key:
+            self.assertEqual(restored.newest(), "latest")
+        mock_key.assert_not_called()
+
+
+class TestVersionConstraint(unittest.TestCase):
+    def setUp(self):
+        self.index = VersionIndex([
+            "0.4.1", "0.4.9", "0.5.0", "1.3.9", "1.4.0", "1.4.7", "v1.9.3", "1.10.0-beta", "2.0.0-rc.1",
+            "2.0.0", "2.1.0", "2.1.5", "2.2.0", "1746190043", "1746199999", "latest", "stable",
+        ])
+
+    def resolve(self, spec):
+        return VersionConstraint(spec).resolve(self.index)
+
+    def test_caret_and_tilde(self):
+        """Test ^ tracks a compatible release line and ~ a patch line."""
+        self.assertEqual(self.resolve("^1.4"), "v1.9.3")
+        self.assertEqual(self.resolve("^0.4"), "0.4.9")
+        self.assertIsNone(self.resolve("^0.0.3"))
+        self.assertEqual(self.resolve("~2.1.0"), "2.1.5")
+        self.assertEqual(self.resolve("~2"), "2.2.0")
+
+    def test_comparators(self):
+        """Test comma-separated comparators intersect, with exclusive and inclusive bounds."""
+        self.assertEqual(self.resolve(">=1.2,<2"), "v1.9.3")
+        self.assertEqual(self.resolve(">1.9.3,<=2.1.0"), "2.1.0")
+        self.assertEqual(self.resolve("=1.4"), "1.4.0")
+        self.assertIsNone(self.resolve(">=3"))
+
+    def test_prereleases_only_when_asked_for(self):
+        """Test ranges skip pre-releases unless a bound is a pre-release."""
+        self.assertFalse(VersionConstraint("<2.0.0").matches("2.0.0-rc.1"))
+        self.assertEqual(self.resolve(">=2.0.0-rc.1,<2.0.0"), "2.0.0-rc.1")
+
+    def test_latest_timestamp(self):
+        """Test latest-timestamp picks the newest timestamp tag, ignoring 'latest'."""
+        self.assertEqual(self.resolve("latest-timestamp"), "1746199999")
+
+    def test_constraint_detection(self):
+        """Test exact tags are told apart from constraints, and invalid constraints raise."""
+        self.assertTrue(VersionConstraint.is_constraint("^1.4"))
+        self.assertFalse(VersionConstraint.is_constraint("1.4.0"))
+        for spec in ("^x", ">=1.0,,<2", "1.0"):
+            with self.assertRaises(ValueError):
+                VersionConstraint(spec)
+
+    def test_resolve_bisects(self):
+        """Test resolving against a large index parses only the tags it probes."""
+        index = VersionIndex(list(VersionIndex(f"{major}.{minor}.0" for major in range(40) for minor in range(50))),
+                             presorted=True)
+        with unittest.mock.patch.object(VersionParser, "sort_key", wraps=VersionParser.sort_key) as mock_key:
+            self.assertEqual(VersionConstraint("^12.3").resolve(index), "12.49.0")
+        self.assertLess(mock_key.call_count, 40)
+
 
 class TestVersionTasks(unittest.TestCase):
     def test_get_local_image_tags(self):
@@ -81,6 +220,18 @@ class TestVersionActions(unittest.TestCase):
         versions = actions.list_local_versions(mock_podman, "repo")
         self.assertEqual(versions, ["1.2.0", "1.1.0", "1.0.0"])
 
+    def test_list_local_versions_mixed(self):
+        """Test mixed tags sort newest first without pairwise comparisons."""
+        mock_podman = MagicMock()
+        mock_img = MagicMock()
+        mock_img.tags = ["repo:1.10.0", "repo:latest", "repo:1746190043", "repo:1.9.0", "repo:stable"]
+        mock_podman.list_images.return_value = [mock_img]
+
+        with unittest.mock.patch.object(VersionParser, 'compare') as mock_compare:
+            versions = actions.list_local_versions(mock_podman, "repo")
+        mock_compare.assert_not_called()
+        self.assertEqual(versions, ["latest", "1746190043", "1.10.0", "1.9.0", "stable"])
+
     def test_find_newer_version(self):
         mock_podman = MagicMock()
         mock_img = MagicMock()
@@ -111,6 +262,7 @@ class TestVersionPersistence(unittest.TestCase):
         self.state_manager = StateManager(state_file=self.temp_path)
 
     def tearDown(self):
+        self.state_manager.flush()
         if self.temp_path.exists():
             os.unlink(self.temp_path)
 
@@ -141,5 +293,100 @@ class TestVersionPersistence(unittest.TestCase):
         self.assertEqual(client.get_version(), version)
 
 
+class TestClientVersionConstraint(unittest.TestCase):
+    def setUp(self):
+        from rapidctl.bootstrap.state import StateManager
+        from rapidctl.cli import PodmanCLI
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.state_manager = StateManager(state_file=Path(self.temp_dir.name) / "state.json")
+        self.addCleanup(self.state_manager.flush)
+        self.fingerprint = "1:1"
+
+        image = MagicMock(id="sha256:aaa", short_id="aaa", attrs={})
+        image.tags = ["repo:1.3.0", "repo:1.4.2", "repo:1.9.0", "repo:2.0.0"]
+        self.images = [image]
+
+        def make_cli(state_manager=None):
+            cli = PodmanCLI(state_manager=state_manager)
+            cli.client = MagicMock()
+            cli.client.images.list.side_effect = lambda **kwargs: list(self.images)
+            cli.image_store_fingerprint = MagicMock(side_effect=lambda: self.fingerprint)
+            cli.events_available = MagicMock(return_value=False)
+            cli.registry.list_tags = MagicMock(return_value=[])
+            return cli
+
+        patcher = unittest.mock.patch("rapidctl.cli.PodmanCLI", side_effect=make_cli)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_client(self, constraint):
+        client = CtlClient(state_manager=self.state_manager)
+        client.container_repo = "repo"
+        client.baseline_version = constraint
+        return client
+
+    def test_constraint_resolved_for_container_version(self):
+        """Test a constraint baseline runs the newest matching local tag."""
+        self.assertEqual(self.make_client("^1.4").container_version, "repo:1.9.0")
+        self.assertEqual(self.make_client("1.3.0").container_version, "repo:1.3.0")
+
+    def test_resolution_cached_until_store_changes(self):
+        """Test a resolved tag is reused across invocations until the image store changes."""
+        self.make_client("~1.4").container_version
+
+        cached = self.make_client("~1.4")
+        self.assertEqual(cached.container_version, "repo:1.4.2")
+        cached.cli.client.images.list.assert_not_called()
+
+        self.fingerprint = "2:2"
+        self.images[0].tags = self.images[0].tags + ["repo:1.4.5"]
+        self.assertEqual(self.make_client("~1.4").container_version, "repo:1.4.5")
+
+    def test_unmatched_constraint_checks_registry(self):
+        """Test a constraint nothing local matches falls back to the registry, then fails clearly."""
+        client = self.make_client("^3")
+        client.connect(lazy=True).registry.list_tags.return_value = ["3.0.1", "latest"]
+        self.assertEqual(client.container_version, "repo:3.0.1")
+
+        with self.assertRaises(PodmanActionError):
+            self.make_client("^4").container_version
+
+    def test_resolution_memoized_per_invocation(self):
+        """Test a constraint is resolved once per invocation, and again after set_version or connect."""
+        client = self.make_client("^5")
+        client.connect(lazy=True).registry.list_tags.return_value = ["5.0.0"]
+
+        with unittest.mock.patch('rapidctl.cli.actions.resolve_version_constraint',
+                   wraps=actions.resolve_version_constraint) as mock_resolve:
+            for _ in range(3):
+                self.assertEqual(client.container_version, "repo:5.0.0")
+            self.assertEqual(mock_resolve.call_count, 2)
+            self.assertEqual(client.cli.registry.list_tags.call_count, 1)
+
+            client.set_version("^1.4")
+            self.assertEqual(client.container_version, "repo:1.9.0")
+            client.container_version
+            self.assertEqual(mock_resolve.call_count, 3)
+
+            client.connect()
+            client.container_version
+            self.assertEqual(mock_resolve.call_count, 4)
+
+    def test_set_version_keeps_constraints(self):
+        """Test set_version keeps valid constraints as written and only sanitizes exact tags."""
+        client = self.make_client("1.3.0")
+
+        client.set_version(">=1.2, <2")
+        self.assertEqual(client.get_version(), ">=1.2, <2")
+        self.assertEqual(client.container_version, "repo:1.9.0")
+
+        client.set_version("^not-a-version")
+        self.assertEqual(client.get_version(), ">=1.2, <2")
+
+        client.set_version("1.4.2; rm -rf /")
+        self.assertEqual(client.get_version(), "1.4.2rm-rf")
+
+
 if __name__ == "__main__":
     unittest.main()